@@ -0,0 +1,98 @@
+"""
+Benchmark for the random-access throughput of the memory-mapped dataset format
+compared to the hdf5 files. If no dataset directory is given, a synthetic
+dataset with randomly embedded copies of a small graph is created.
+
+Usage:
+    python dataset_benchmark.py --dir path/to/hdf5/files --num_reads 10000
+"""
+import os
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+import jax.numpy as jnp
+import jax.random as jrand
+
+from alphagrad.vertexgame import (make_graph, embed, create, write, sparsify,
+                                GraphDataset, MemmapGraphDataset, convert_to_memmap)
+
+
+parser = argparse.ArgumentParser()
+
+parser.add_argument("--dir", type=str, default=None,
+                    help="Directory with hdf5 dataset files.")
+
+parser.add_argument("--shape", type=int, nargs=3, default=[20, 105, 20],
+                    help="Storage shape of the graphs.")
+
+parser.add_argument("--num_samples", type=int, default=20000,
+                    help="Size of the synthetic dataset.")
+
+parser.add_argument("--num_reads", type=int, default=5000,
+                    help="Number of random reads.")
+
+parser.add_argument("--batchsize", type=int, default=256,
+                    help="Batchsize for the batched reads.")
+
+args = parser.parse_args()
+
+
+def make_synthetic_dataset(path, num_samples, shape):
+    def Perceptron(x, W1, b1, W2, b2):
+        return jnp.sum(jnp.tanh(W2 @ jnp.tanh(W1 @ x + b1) + b2)**2)
+
+    xs = [jnp.ones(4), jnp.ones((8, 4)), jnp.ones(8), jnp.ones((4, 8)), jnp.ones(4)]
+    graph = make_graph(Perceptron, *xs)
+    keys = jrand.split(jrand.PRNGKey(42), 64)
+    samples = [("", *sparsify(embed(key, graph, shape))) for key in keys]
+
+    fname = os.path.join(path, "synthetic.hdf5")
+    create(fname, num_samples, shape)
+    for start in range(0, num_samples, len(samples)):
+        write(fname, samples[:num_samples-start])
+
+
+def measure(dataset, idxs, batchsize):
+    st = time.perf_counter()
+    for idx in idxs:
+        dataset[idx]
+    single = len(idxs) / (time.perf_counter() - st)
+
+    st = time.perf_counter()
+    for start in range(0, len(idxs), batchsize):
+        dataset.__getitems__(idxs[start:start+batchsize].tolist())
+    batched = len(idxs) / (time.perf_counter() - st)
+    return single, batched
+
+
+with tempfile.TemporaryDirectory() as tmpdir:
+    hdf5_dir = args.dir
+    if hdf5_dir is None:
+        hdf5_dir = os.path.join(tmpdir, "hdf5")
+        os.makedirs(hdf5_dir)
+        make_synthetic_dataset(hdf5_dir, args.num_samples, args.shape)
+
+    memmap_dir = os.path.join(tmpdir, "memmap")
+    os.makedirs(memmap_dir)
+    st = time.perf_counter()
+    for file in sorted(os.listdir(hdf5_dir)):
+        if file.endswith(".hdf5"):
+            name = os.path.splitext(file)[0] + ".graphs"
+            convert_to_memmap(os.path.join(hdf5_dir, file), os.path.join(memmap_dir, name))
+    print(f"Conversion took {time.perf_counter() - st:.2f}s")
+
+    datasets = {"hdf5": GraphDataset(hdf5_dir, shape=args.shape),
+                "memmap": MemmapGraphDataset(memmap_dir, shape=args.shape)}
+
+    rng = np.random.default_rng(0)
+    idxs = rng.integers(0, len(datasets["hdf5"]), args.num_reads)
+
+    print(f"{'format':<10}{'single [samples/s]':>22}{'batched [samples/s]':>22}")
+    for name, dataset in datasets.items():
+        single, batched = measure(dataset, idxs, args.batchsize)
+        print(f"{name:<10}{single:>22.0f}{batched:>22.0f}")
+        dataset.close()
+
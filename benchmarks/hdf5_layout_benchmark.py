@@ -0,0 +1,101 @@
+"""
+Benchmark for the size and read throughput of the different hdf5 storage
+layouts, i.e. contiguous, chunked, compressed and resizable datasets.
+If no dataset file is given, a synthetic dataset with randomly embedded copies
+of a small graph is created.
+
+Usage:
+    python hdf5_layout_benchmark.py --file path/to/file.hdf5 --batchsize 256
+"""
+import os
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+import jax.numpy as jnp
+import jax.random as jrand
+
+from alphagrad.vertexgame import (make_graph, embed, create, write, compact, 
+                                sparsify, GraphDataset)
+
+
+parser = argparse.ArgumentParser()
+
+parser.add_argument("--file", type=str, default=None,
+                    help="Dataset file that is converted into the layouts.")
+
+parser.add_argument("--shape", type=int, nargs=3, default=[20, 105, 20],
+                    help="Storage shape of the synthetic graphs.")
+
+parser.add_argument("--num_samples", type=int, default=20000,
+                    help="Size of the synthetic dataset.")
+
+parser.add_argument("--num_reads", type=int, default=5000,
+                    help="Number of random single reads.")
+
+parser.add_argument("--batchsize", type=int, default=256,
+                    help="Batchsize for the sequential reads and chunksize.")
+
+args = parser.parse_args()
+
+
+LAYOUTS = {"contiguous": {},
+            "chunked": {"chunksize": args.batchsize},
+            "chunked+lzf": {"chunksize": args.batchsize, "compression": "lzf"},
+            "chunked+gzip": {"chunksize": args.batchsize, "compression": "gzip"},
+            "chunked+lz4": {"chunksize": args.batchsize, "compression": "lz4"},
+            "resizable": {"chunksize": args.batchsize, "resizable": True}}
+
+
+def make_synthetic_dataset(fname, num_samples, shape):
+    def Perceptron(x, W1, b1, W2, b2):
+        return jnp.sum(jnp.tanh(W2 @ jnp.tanh(W1 @ x + b1) + b2)**2)
+
+    xs = [jnp.ones(4), jnp.ones((8, 4)), jnp.ones(8), jnp.ones((4, 8)), jnp.ones(4)]
+    graph = make_graph(Perceptron, *xs)
+    keys = jrand.split(jrand.PRNGKey(42), 64)
+    samples = [("", *sparsify(embed(key, graph, shape))) for key in keys]
+
+    create(fname, num_samples, shape)
+    for start in range(0, num_samples, len(samples)):
+        write(fname, samples[:num_samples-start])
+
+
+def measure(dataset, idxs, batchsize):
+    st = time.perf_counter()
+    for idx in idxs:
+        dataset[idx]
+    random = len(idxs) / (time.perf_counter() - st)
+
+    st = time.perf_counter()
+    for start in range(0, len(dataset), batchsize):
+        dataset.__getitems__(list(range(start, min(start+batchsize, len(dataset)))))
+    sequential = len(dataset) / (time.perf_counter() - st)
+    return random, sequential
+
+
+with tempfile.TemporaryDirectory() as tmpdir:
+    fname = args.file
+    if fname is None:
+        fname = os.path.join(tmpdir, "synthetic.hdf5")
+        make_synthetic_dataset(fname, args.num_samples, args.shape)
+
+    print(f"{'layout':<16}{'size [MB]':>12}{'random [samples/s]':>22}{'sequential [samples/s]':>26}")
+    for name, kwargs in LAYOUTS.items():
+        path = os.path.join(tmpdir, name)
+        os.makedirs(path)
+        try:
+            out_fname = compact(fname, os.path.join(path, "data.hdf5"), **kwargs)
+        except ImportError as e:
+            print(f"{name:<16} skipped: {e}")
+            continue
+
+        dataset = GraphDataset(path, shape=list(args.shape))
+        rng = np.random.default_rng(0)
+        idxs = rng.integers(0, len(dataset), args.num_reads)
+        random, sequential = measure(dataset, idxs, args.batchsize)
+        size = os.path.getsize(out_fname) / 2**20
+        print(f"{name:<16}{size:>12.1f}{random:>22.0f}{sequential:>26.0f}")
+        dataset.close()
@@ -0,0 +1,86 @@
+"""
+Microbenchmark for the per-elimination latency of `vertex_eliminate` with the
+table-based `sparsity_fmas_map` compared to the previous implementation that
+evaluates a `lax.cond` for every edge.
+
+Usage:
+    python sparsity_fmas_benchmark.py --tasks RoeFlux_1d Perceptron Encoder
+"""
+import time
+import argparse
+from functools import partial
+
+import jax
+import jax.lax as lax
+import jax.numpy as jnp
+
+import alphagrad.vertexgame.core as core
+from alphagrad import experiments
+from alphagrad.vertexgame.core import (cross_country, MUL_SPARSITY_MAP, 
+                                        CONTRACTION_MAP, OFFSET)
+
+
+parser = argparse.ArgumentParser()
+
+parser.add_argument("--tasks", type=str, nargs="+",
+                    default=["RoeFlux_1d", "RobotArm_6DOF", "HumanHeartDipole",
+                            "PropaneCombustion", "Perceptron", "Encoder",
+                            "BlackScholes_Jacobian", "f", "g"],
+                    help="Names of the tasks in `experiments.py` to benchmark.")
+
+parser.add_argument("--repeats", type=int,
+                    default=100, help="Number of timed elimination sweeps.")
+
+args = parser.parse_args()
+
+
+@partial(jax.vmap, in_axes=(1, None))
+def cond_sparsity_fmas_map(in_edge, out_edge):
+    # Previous implementation with a per-edge cond
+    i = in_edge[0].astype(jnp.int32) + OFFSET
+    j = out_edge[0].astype(jnp.int32) + OFFSET
+
+    new_sparsity_type = MUL_SPARSITY_MAP[i, j]
+    contraction_map = CONTRACTION_MAP[:, i, j]
+
+    factors = jnp.concatenate((out_edge[1:3], jnp.abs(out_edge[3:]), in_edge[3:]))
+    masked_factors = lax.cond(jnp.sum(contraction_map) > 0,
+                                lambda a: jnp.where(contraction_map > 0, a, 1),
+                                lambda a: jnp.zeros_like(a, dtype=jnp.int32),
+                                factors)
+    masked_factors = jnp.where(masked_factors >= 0, masked_factors, 1)
+    
+    fmas = jnp.prod(masked_factors)
+    fmas = lax.select(jnp.logical_and(jnp.abs(i) == 10+OFFSET, jnp.abs(j) == 10+OFFSET), 1, fmas)
+    return new_sparsity_type, fmas
+
+
+def measure(graph, repeats):
+    # Measures the mean latency of a single elimination within a jitted 
+    # forward-mode sweep, so that dispatch overhead does not dominate
+    num_v = graph.shape[-1]
+    order = jnp.arange(1, num_v+1)
+    eliminate = jax.jit(lambda o, g: cross_country(o, g)[1])
+    jax.block_until_ready(eliminate(order, graph))
+    
+    st = time.perf_counter()
+    for _ in range(repeats):
+        jax.block_until_ready(eliminate(order, graph))
+    return (time.perf_counter() - st) / (repeats*num_v) * 1e6
+
+
+table_sparsity_fmas_map = core.sparsity_fmas_map
+
+print(f"{'task':<24}{'num_v':>8}{'cond [us]':>12}{'table [us]':>12}{'speedup':>10}")
+for task in args.tasks:
+    graph, _, _ = getattr(experiments, "make_" + task)()
+    
+    core.sparsity_fmas_map = cond_sparsity_fmas_map
+    cond_latency = measure(graph, args.repeats)
+    
+    core.sparsity_fmas_map = table_sparsity_fmas_map
+    table_latency = measure(graph, args.repeats)
+    
+    print(f"{task:<24}{graph.shape[-1]:>8}{cond_latency:>12.1f}"
+        f"{table_latency:>12.1f}{cond_latency/table_latency:>10.2f}")
+
@@ -11,7 +11,7 @@ from chex import PyTreeDef
 import mctx
 import equinox as eqx
 
-from ..utils import symexp
+from ..utils import symexp, make_lookback_state
 
 
 # Preconfigured functions for tree search
@@ -21,7 +21,8 @@ def make_recurrent_fn(value_transform: Callable,
                     inverse_value_transform: Callable,
                     network: PyTreeDef,
                     step: Callable,
-                    get_masked_logits: Callable) -> Callable:
+                    get_masked_logits: Callable,
+                    lookback: int = 1) -> Callable:
     """Implementation of the recurrent function for tree searchas required by
     the MuZero algorithm. The recurrent function is used to expand the tree
     at the leaf node with a new node. The initial action probabilities will be
@@ -33,28 +34,28 @@ def make_recurrent_fn(value_transform: Callable,
         network (chex.PyTreeDef): Neural network model
         step (Callable): Environment dynamics function
         get_masked_logits (Callable): Function that masks logits for invalid actions
+        lookback (int): Number of past states that are stacked as network
+            input. The embedding of a tree node is only the current graph,
+            so only 1 is supported, see `make_lookback_state`.
 
     Returns:
         Callable: Recurrent function for tree search
     """
     @partial(jax.vmap, in_axes=(None, None, 0, 0))
     def recurrent_fn(params, rng_key, actions, states):
-        state = states[-5:]
-        next_state, reward, _ = step(state, actions) # Env dynamics function
-        states = jnp.roll(states, shift=-5, axis=1)
-        next_states = states.at[-5:].set(next_state)
+        next_states, reward, _ = step(states, actions) # Env dynamics function
         
         # Map parameters to prediction function, i.e. neural network
         model = jtu.tree_map(select_params, network, params)
 
         # Compute policy and value for leaf node with neural network model
         # Symexp for reward scaling since value head is trained on symlog(value)
-        output = model(next_states, rng_key)
+        output = model(make_lookback_state(next_states, lookback), rng_key)
         policy_logits = output[1:]
         value = inverse_value_transform(output[0])
         
         # Create mask for invalid actions, i.e. already eliminated vertices
-        masked_logits = get_masked_logits(policy_logits, state)
+        masked_logits = get_masked_logits(policy_logits, states)
 
         # Expand the tree at the leaf with a new node
         # The initial action probabilities will be biased with the prediction
@@ -77,6 +78,8 @@ def make_environment_interaction(value_transform: Callable,
                                 num_simulations: int,
                                 recurrent_fn: Callable,
                                 step: Callable,
+                                max_changed_columns: int = 0,
+                                lookback: int = 1,
                                 **kwargs) -> Callable:
     """Implementation of the environment interaction function for the MuZero
     algorithm. The environment interaction function is used to simulate the
@@ -93,12 +96,25 @@ def make_environment_interaction(value_transform: Callable,
         num_simulations (int): Number of simulations
         recurrent_fn (Callable): Recurrent function for tree search
         step (Callable): Environment dynamics function
+        max_changed_columns (int): Maximum number of graph columns that a 
+            step changes. If set, the embeddings of the root states are 
+            cached during the rollout and only the changed columns are
+            embedded again after every step. 0 disables the cache. The
+            cache embeds the current graph only and cannot be combined
+            with a lookback larger than 1.
+        lookback (int): Number of past states that are stacked as network
+            input. The carry only holds the current graphs of shape
+            (batchsize, 5, num_i+num_vo+1, num_vo), so only 1 is supported.
         **kwargs: Additional keyword arguments
     
     Returns:
         Callable: Environment interaction function for the MuZero algorithm
     """
+    if lookback > 1 and max_changed_columns > 0:
+        raise ValueError("The embedding cache only embeds the current graph "
+                        f"and cannot be used with a lookback of {lookback}!")
     qtransform = partial(mctx.qtransform_completed_by_mix_value, **kwargs)
+    use_embedding_cache = max_changed_columns > 0
     
     def environment_interaction(network, init_carry):
         batchsize = init_carry[1].shape[0]
@@ -106,16 +122,19 @@ def make_environment_interaction(value_transform: Callable,
         params = eqx.filter(network, eqx.is_inexact_array)
         
         def loop_fn(carry, _):
-            states, num_muls, key = carry
+            state, num_muls, key, embeddings = carry
             key, subkey = jrand.split(key, 2)
-            state = states[:, -5:] 
             
             # Create action mask
             mask = state.at[:, 1, 0, :].get()
 
             # Getting policy and value estimates
             keys = jrand.split(key, batchsize)
-            output = batched_network(states, keys)
+            states = jax.vmap(make_lookback_state, in_axes=(0, None))(state, lookback)
+            if use_embedding_cache:
+                output = batched_network(states, keys, embeddings)
+            else:
+                output = batched_network(states, keys)
             policy_logits = output[:, 1:]
             value = inverse_value_transform(output[:, 0])
 
@@ -123,7 +142,7 @@ def make_environment_interaction(value_transform: Callable,
             # jax.debug.print("policy_logits={policy_logits}", policy_logits=policy_logits[0])
             root = mctx.RootFnOutput(prior_logits=policy_logits, 
                                     value=value, 
-                                    embedding=states)
+                                    embedding=state)
                                     
             # Gumbel MuZero is so much better!
             # Smaller Gumbel noise helps improve performance, but too small kills learning
@@ -136,7 +155,7 @@ def make_environment_interaction(value_transform: Callable,
                                                     qtransform=qtransform,
                                                     gumbel_scale=gumbel_scale,
                                                     max_num_considered_actions=num_considered_actions)
-
+            
             # Tree search derived targets for policy and value function
             search_policy = policy_output.action_weights
             # jax.debug.print("search_policy={search_policy}", search_policy=search_policy[0])
@@ -150,15 +169,20 @@ def make_environment_interaction(value_transform: Callable,
 
             # Step the environment
             next_state, rewards, done = jax.vmap(step)(state, action)
-            states = jnp.roll(states, shift=-5, axis=1)
-            next_states = states.at[:, -5:].set(next_state)
+            
+            # Only the columns that the step changed are embedded again
+            if use_embedding_cache:
+                embeddings = jax.vmap(network.update_embeddings, in_axes=(0, 0, 0, None))(embeddings, 
+                                                                                        state,
+                                                                                        next_state,
+                                                                                        max_changed_columns)
             
             # Compute the number of multiplications
             num_muls += rewards
             
             # Package up everything for further processing
             state_flattened = state.reshape(batchsize, -1)
-            return (next_states, num_muls, key), jnp.concatenate([state_flattened,
+            return (next_state, num_muls, key, embeddings), jnp.concatenate([state_flattened,
                                                                 search_policy, 
                                                                 rewards[:, jnp.newaxis], 
                                                                 value[:, jnp.newaxis],
@@ -166,8 +190,11 @@ def make_environment_interaction(value_transform: Callable,
                                                                 done[:, jnp.newaxis]], 
                                                                 axis=1)
 
-        perf, output = lax.scan(loop_fn, init_carry, None, length=num_actions)
-        final_state = perf[0][:, -5:]
+        embeddings = None
+        if use_embedding_cache:
+            embeddings = jax.vmap(network.embed)(init_carry[0])
+        perf, output = lax.scan(loop_fn, (*init_carry, embeddings), None, length=num_actions)
+        final_state = perf[0]
         num_muls = perf[1]
         return final_state, num_muls, output.transpose(1, 0, 2)
     
@@ -19,8 +19,9 @@ from tqdm import tqdm
 
 from alphagrad.config import setup_experiment
 from alphagrad.experiments import make_benchmark_scores
-from alphagrad.vertexgame import step
-from alphagrad.utils import (A0_loss, get_masked_logits, symlog, symexp, 
+from alphagrad.compilation import enable_compilation_cache, warmup
+from alphagrad.vertexgame import step, get_max_degree
+from alphagrad.utils import (A0_loss, get_masked_logits, make_lookback_state, symlog, symexp, 
 							default_value_transform, default_inverse_value_transform)
 from alphagrad.alphazero.environment_interaction import (make_recurrent_fn,
 														make_environment_interaction)
@@ -61,6 +62,14 @@ parser.add_argument("--wandb", type=str,
 parser.add_argument("--L2", type=float,
                     default=None, help="L2 regularization weight.")
 
+parser.add_argument("--compilation_cache", type=str,
+                    default=os.environ.get("ALPHAGRAD_COMPILATION_CACHE"), 
+                    help="Directory of the persistent compilation cache.")
+
+parser.add_argument("--beam_width", type=int,
+                    default=None, help="Beam width of the beam search baseline. "
+                    "If not set, the beam search baseline is not computed.")
+
 args = parser.parse_args()
 
 os.environ["XLA_PYTHON_CLIENT_PREALLOCATE"] = "false"
@@ -72,7 +81,10 @@ print("GPU devices:", jax.devices("gpu"))
 
 
 config, graph, graph_shape, task_fn = setup_experiment(args.task, args.config_path)
-mM_order, scores = make_benchmark_scores(graph)
+if args.compilation_cache is not None:
+    enable_compilation_cache(args.compilation_cache, args.task, graph_shape)
+compile_times = {}
+mM_order, scores = make_benchmark_scores(graph, args.beam_width, compile_times=compile_times)
 print(graph.shape)
 
 parameters = config["hyperparameters"]
@@ -121,7 +133,8 @@ run_config = {"seed": args.seed,
                 "rollout_length": ROLLOUT_LENGTH, 
                 "fwd_fmas": scores[0], 
                 "rev_fmas": scores[1], 
-                "out_fmas": scores[2]}
+                "out_fmas": scores[2],
+                "beam_fmas": scores[3] if args.beam_width is not None else None}
 
 wandb.login(key="redacted", 
             host="redacted")
@@ -180,7 +193,8 @@ recurrent_fn = make_recurrent_fn(value_transform,
                                 inverse_value_transform, 
                                 model, 
                                 step, 
-                                get_masked_logits)
+                                get_masked_logits,
+                                lookback=LOOKBACK)
 env_interaction = make_environment_interaction(value_transform,
                                                	inverse_value_transform,
     											ROLLOUT_LENGTH, 
@@ -189,6 +203,8 @@ env_interaction = make_environment_interaction(value_transform,
                                             	NUM_SIMULATIONS,
                                                 recurrent_fn,
                                                 step,
+                                                max_changed_columns=get_max_degree(graph)+1,
+                                                lookback=LOOKBACK,
                                                 **QTRANSFORM_PARAMS)
 
 
@@ -197,7 +213,7 @@ loss_fn = partial(A0_loss, value_transform, inverse_value_transform)
 
 
 def make_init_carry(graph, key):
-    graphs = jnp.tile(graph[jnp.newaxis, ...], (PER_DEVICE_NUM_ENVS, LOOKBACK, 1, 1))
+    graphs = jnp.tile(graph[jnp.newaxis, ...], (PER_DEVICE_NUM_ENVS, 1, 1, 1))
     return (graphs, jnp.zeros(PER_DEVICE_NUM_ENVS), key)
 
 
@@ -235,7 +251,7 @@ replay_buffer = fbx.make_trajectory_buffer(max_length_time_axis=ROLLOUT_LENGTH,
 											min_length_time_axis=ROLLOUT_LENGTH, 
 											sample_batch_size=BATCHSIZE,
 											add_batch_size=NUM_ENVS,
-											sample_sequence_length=LOOKBACK,
+											sample_sequence_length=1,
 											period=1)
 
 item_prototype =jnp.zeros(value_idx+2, device=jax.devices("cpu")[0])
@@ -259,7 +275,7 @@ def fill_and_sample(data, buffer_states, key):
 	# Sample from replay buffer
 	samples = sample_fn(buffer_states, key)
 	samples = samples.experience
-	samples = samples.reshape(jax.device_count("gpu"), PER_DEVICE_BATCHSIZE, LOOKBACK, -1)
+	samples = samples.reshape(jax.device_count("gpu"), PER_DEVICE_BATCHSIZE, 1, -1)
 	return samples, buffer_states
 
 
@@ -298,7 +314,9 @@ parallel_mean = lambda x: lax.pmean(x, "num_devices")
         donate="all")
 def train_agent(data, model, opt_state, key):
 	state, search_policy, search_rewards, search_value, done, search_target = jnp.split(data, split_idxs, axis=-1)
-	state = state.reshape(PER_DEVICE_BATCHSIZE, 5*LOOKBACK, *state_shape[1:])
+	# Only the current graphs are stored, the history is rebuilt from them
+	state = state[:, -1].reshape(PER_DEVICE_BATCHSIZE, *state_shape)
+	state = jax.vmap(make_lookback_state, in_axes=(0, None))(state, LOOKBACK)
 
 	subkeys = jrand.split(key, PER_DEVICE_BATCHSIZE)
 	val, grads = eqx.filter_value_and_grad(loss_fn, has_aux=True)(model, 
@@ -319,6 +337,14 @@ def train_agent(data, model, opt_state, key):
 	return loss, aux, model, opt_state
 
 
+# Compile the tree search and the training step ahead of time
+warmup_keys = jrand.split(key, jax.device_count("gpu"))
+warmup_samples = jnp.zeros((jax.device_count("gpu"), PER_DEVICE_BATCHSIZE, 1, value_idx+2))
+compile_times.update(warmup({"tree_search": (pmap_tree_search, (graph, model, warmup_keys)),
+                            "train_agent": (train_agent, (warmup_samples, model, opt_state, warmup_keys))}))
+wandb.config.update({"compile_times": compile_times})
+
+
 # Training loop
 pbar = tqdm(range(EPISODES))
 test_key, key = jrand.split(key, 2)
@@ -326,7 +352,8 @@ test_key, key = jrand.split(key, 2)
 env_keys = jrand.split(key, BATCHSIZE)
 print("Scores:", scores)
 print("Minimal Markowitz Order:", [int(o) for o in mM_order])
-best_global_num_muls = jnp.max(-jnp.array(scores))
+# The beam search score is only logged for comparison
+best_global_num_muls = jnp.max(-jnp.array(scores[:3]))
 best_global_act_seq = None
 
 buffer_state = replay_buffer.init(item_prototype)
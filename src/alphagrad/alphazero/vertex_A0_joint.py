@@ -19,7 +19,7 @@ from tqdm import tqdm
 
 from alphagrad.config import setup_joint_experiment
 from alphagrad.vertexgame import step, embed
-from alphagrad.utils import A0_loss, get_masked_logits, symlog, symexp
+from alphagrad.utils import A0_loss, get_masked_logits, make_lookback_state, symlog, symexp
 from alphagrad.alphazero.environment_interaction import (make_recurrent_fn,
 														make_environment_interaction)
 from alphagrad.transformer.models import AlphaZeroModel
@@ -179,7 +179,8 @@ recurrent_fn = make_recurrent_fn(value_transform,
                                 inverse_value_transform, 
                                 model, 
                                 step, 
-                                get_masked_logits)
+                                get_masked_logits,
+                                lookback=LOOKBACK)
 env_interaction = make_environment_interaction(value_transform,
                                                	inverse_value_transform,
     											ROLLOUT_LENGTH, 
@@ -188,6 +189,7 @@ env_interaction = make_environment_interaction(value_transform,
                                             	NUM_SIMULATIONS,
                                                 recurrent_fn,
                                                 step,
+                                                lookback=LOOKBACK,
                                                 **QTRANSFORM_PARAMS)
 
 
@@ -246,7 +248,7 @@ replay_buffer = fbx.make_trajectory_buffer(max_length_time_axis=ROLLOUT_LENGTH,
 											min_length_time_axis=ROLLOUT_LENGTH, 
 											sample_batch_size=BATCHSIZE,
 											add_batch_size=NUM_ENVS,
-											sample_sequence_length=LOOKBACK,
+											sample_sequence_length=1,
 											period=1)
 
 item_prototype =jnp.zeros(value_idx+2, device=jax.devices("cpu")[0])
@@ -270,7 +272,7 @@ def fill_and_sample(data, buffer_states, key):
 	# Sample from replay buffer
 	samples = sample_fn(buffer_states, key)
 	samples = samples.experience
-	samples = samples.reshape(jax.device_count("gpu"), PER_DEVICE_BATCHSIZE, LOOKBACK, -1)
+	samples = samples.reshape(jax.device_count("gpu"), PER_DEVICE_BATCHSIZE, 1, -1)
 	return samples, buffer_states
 
 
@@ -338,7 +340,9 @@ parallel_mean = lambda x: lax.pmean(x, "num_devices")
         donate="all")
 def train_agent(data, model, opt_state, key):
 	state, search_policy, search_rewards, search_value, done, search_target = jnp.split(data, split_idxs, axis=-1)
-	state = state.reshape(PER_DEVICE_BATCHSIZE, 5*LOOKBACK, *state_shape[1:])
+	# Only the current graphs are stored, the history is rebuilt from them
+	state = state[:, -1].reshape(PER_DEVICE_BATCHSIZE, *state_shape)
+	state = jax.vmap(make_lookback_state, in_axes=(0, None))(state, LOOKBACK)
 
 	subkeys = jrand.split(key, PER_DEVICE_BATCHSIZE)
 	val, grads = eqx.filter_value_and_grad(loss_fn, has_aux=True)(model, 
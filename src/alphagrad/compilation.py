@@ -0,0 +1,74 @@
+"""
+Tools to reduce the startup time of the experiments, i.e. an opt-in persistent
+XLA compilation cache and an explicit warmup that compiles the hot functions
+ahead of time and reports how long each of them takes to compile.
+"""
+import os
+import time
+from typing import Any, Callable, Dict, Sequence, Tuple
+
+import jax
+from jax.experimental.compilation_cache import compilation_cache
+
+
+def enable_compilation_cache(cache_dir: str,
+                            task: str = None,
+                            graph_shape: Sequence[int] = None) -> str:
+    """
+    Enables the persistent XLA compilation cache. Every task and graph shape
+    gets its own subdirectory so that cache entries of different experiments
+    can be inspected and removed separately.
+
+    Arguments:
+        cache_dir (str): Root directory of the compilation cache.
+        task (str): Name of the task, e.g. `RoeFlux_1d`.
+        graph_shape (Sequence[int]): Shape of the computational graph.
+
+    Returns:
+        The directory that is used as compilation cache.
+    """
+    handle = [] if task is None else [task]
+    if graph_shape is not None:
+        handle.append("_".join([str(int(s)) for s in graph_shape]))
+    path = os.path.join(cache_dir, "_".join(handle)) if len(handle) > 0 else cache_dir
+    os.makedirs(path, exist_ok=True)
+
+    compilation_cache.set_cache_dir(path)
+    # Arrays created at import time already initialized the cache without a
+    # directory, so it has to be initialized again
+    compilation_cache.reset_cache()
+    # Cache every compiled function, not only the slow ones
+    jax.config.update("jax_persistent_cache_min_compile_time_secs", 0)
+    jax.config.update("jax_persistent_cache_min_entry_size_bytes", -1)
+    print("Using compilation cache", path)
+    return path
+
+
+def warmup(fns: Dict[str, Tuple[Callable, Sequence[Any]]],
+            verbose: bool = True) -> Dict[str, float]:
+    """
+    Lowers and compiles the given functions ahead of time for the given
+    example arguments. Afterwards, calling the functions with arguments of
+    the same shapes reuses the compiled executables. Works with `jax.jit`,
+    `eqx.filter_jit` and `eqx.filter_pmap`, other functions are wrapped
+    with `jax.jit`.
+
+    Arguments:
+        fns (Dict[str, Tuple[Callable, Sequence[Any]]]): Maps a name to a tuple
+                                of the function and its example arguments.
+        verbose (bool): Whether to print the compile times.
+
+    Returns:
+        A dictionary with the compile time of every function in seconds.
+    """
+    compile_times = {}
+    for name, (fn, args) in fns.items():
+        if not hasattr(fn, "lower"):
+            fn = jax.jit(fn)
+        start_time = time.time()
+        fn.lower(*args).compile()
+        compile_times[name] = time.time() - start_time
+        if verbose:
+            print(f"Compiled {name} in {compile_times[name]:.2f}s")
+    return compile_times
+
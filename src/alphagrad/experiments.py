@@ -2,14 +2,30 @@ import jax
 import jax.numpy as jnp
 import jax.random as jrand
 
-from .vertexgame import (make_graph, get_graph_shape, forward, 
-                        reverse, minimal_markowitz, cross_country)
+from .compilation import warmup
+from .vertexgame import (get_graph_shape, forward, 
+                        reverse, minimal_markowitz, cross_country, beam_search)
+from .vertexgame.interpreter import cached_make_graph, get_default_cache, get_graph_key
 from graphax.examples import (RoeFlux_1d, RoeFlux_3d, RobotArm_6DOF, f, g, Helmholtz,
                                 Perceptron, HumanHeartDipole, PropaneCombustion, Encoder,
                                 BlackScholes_Jacobian)
 
 
-def make_benchmark_scores(graph):
+def make_benchmark_scores(graph, beam_width: int = None, compile_times: dict = None):
+    # Baseline scores are deterministic, so they can be reused across runs.
+    # If `compile_times` is given, the functions are compiled ahead of time on
+    # a cache miss and their compile times are added to it
+    cache = get_default_cache()
+    if cache is not None:
+        key = get_graph_key(graph)
+        if beam_width is not None:
+            key += f"-beam{beam_width}"
+        entry = cache.load(key)
+        if entry is not None:
+            return jnp.asarray(entry["order"]), [jnp.asarray(s) for s in entry["scores"]]
+    
+    if compile_times is not None:
+        compile_times.update(warmup_benchmark_scores(graph))
     _, fwd_fmas = jax.jit(forward)(graph)
     _, rev_fmas = jax.jit(reverse)(graph)
     
@@ -17,11 +33,31 @@ def make_benchmark_scores(graph):
     _, mM_fmas = jax.jit(cross_country)(mM_order, graph)
     
     scores = [fwd_fmas, rev_fmas, mM_fmas]
+    # Optional beam search score as a stronger non-RL baseline
+    if beam_width is not None:
+        _, beam_fmas = beam_search(graph, beam_width)
+        scores.append(beam_fmas)
+    if cache is not None:
+        cache.store(key, order=mM_order, scores=jnp.stack(scores))
     return mM_order, scores
 
 
+def warmup_benchmark_scores(graph):
+    """
+    Compiles the functions used in `make_benchmark_scores` ahead of time and
+    returns their compile times.
+    """
+    num_v = int(graph.at[0, 0, 1].get())
+    order = [jnp.array(i, dtype=jnp.int32) for i in range(1, num_v+1)]
+    fns = {"forward": (forward, (graph,)),
+            "reverse": (reverse, (graph,)),
+            "minimal_markowitz": (jax.jit(minimal_markowitz, static_argnums=1), (graph, num_v)),
+            "cross_country": (cross_country, (order, graph))}
+    return warmup(fns)
+
+
 def make_fn(fn, *xs):
-    graph = make_graph(fn, *xs)
+    graph = cached_make_graph(fn, *xs)
     graph_shape = get_graph_shape(graph)
     return graph, graph_shape, fn
 
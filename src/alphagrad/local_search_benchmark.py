@@ -0,0 +1,73 @@
+"""
+Runs simulated annealing and the genetic algorithm seeded with the minimal
+Markowitz order on the benchmark tasks and compares the best orders with the
+baseline scores. The best orders and convergence traces are stored in a
+.npz file per task and method.
+
+Usage:
+    python -m alphagrad.local_search_benchmark --tasks RoeFlux_3d f --out_dir ./local_search
+"""
+import os
+import time
+import argparse
+
+import numpy as np
+
+import jax.random as jrand
+
+from . import experiments
+from .prewarm_graph_cache import get_tasks
+from .vertexgame import simulated_annealing, genetic_algorithm
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=str, nargs="+", default=get_tasks(),
+                        help="Tasks on which the local search is run.")
+    parser.add_argument("--methods", type=str, nargs="+", default=["annealing", "genetic"],
+                        choices=["annealing", "genetic"], help="Local search methods.")
+    parser.add_argument("--population_size", type=int, default=256,
+                        help="Number of annealing chains or size of the population.")
+    parser.add_argument("--num_iters", type=int, default=1000,
+                        help="Number of annealing iterations or generations.")
+    parser.add_argument("--chunk_size", type=int, default=256,
+                        help="Chunk size of the batched cross-country elimination.")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed.")
+    parser.add_argument("--out_dir", type=str, default=None,
+                        help="Directory where the orders and traces are stored.")
+    args = parser.parse_args()
+    if args.out_dir is not None:
+        os.makedirs(args.out_dir, exist_ok=True)
+
+    key = jrand.PRNGKey(args.seed)
+    for task in args.tasks:
+        graph, graph_shape, _ = getattr(experiments, "make_" + task)()
+        mM_order, scores = experiments.make_benchmark_scores(graph)
+        print(f"{task}: shape {graph_shape}, scores {[int(s) for s in scores]}")
+
+        for method in args.methods:
+            key, subkey = jrand.split(key)
+            start_time = time.time()
+            if method == "annealing":
+                order, fmas, trace = simulated_annealing(graph, subkey,
+                                                        num_chains=args.population_size,
+                                                        num_iters=args.num_iters,
+                                                        init_order=mM_order,
+                                                        chunk_size=args.chunk_size)
+            else:
+                order, fmas, trace = genetic_algorithm(graph, subkey,
+                                                        population_size=args.population_size,
+                                                        num_generations=args.num_iters,
+                                                        init_order=mM_order,
+                                                        chunk_size=args.chunk_size)
+            fmas.block_until_ready()
+            print(f"    {method}: {int(fmas)} fmas, {time.time() - start_time:.2f}s")
+
+            if args.out_dir is not None:
+                fname = os.path.join(args.out_dir, f"{task}_{method}.npz")
+                np.savez(fname, order=np.asarray(order), fmas=np.asarray(fmas),
+                        trace=np.asarray(trace), scores=np.asarray(scores))
+
+
+if __name__ == "__main__":
+    main()
@@ -25,7 +25,7 @@ from graphax.examples import RoeFlux_1d
 from alphagrad.utils import (entropy, explained_variance, symlog, symexp,
                             default_value_transform, default_inverse_value_transform)
 from alphagrad.vertexgame import forward, reverse, cross_country
-from alphagrad.vertexgame.runtime_game import RuntimeGame, _get_reward
+from alphagrad.vertexgame.runtime_game import RuntimeGame
 from alphagrad.vertexgame.transforms import minimal_markowitz
 from alphagrad.transformer.models import PolicyNet, ValueNet
 from alphagrad.config import setup_experiment
@@ -35,26 +35,14 @@ os.environ["CUDA_VISIBLE_DEVICES"] = str(2)
 
 key = jrand.PRNGKey(250197)
 NUM_MEASUREMENTS = 100
+NUM_WORKERS = 8 # Number of processes that compile and measure elimination orders
 DEVICE = jax.devices("cpu")[0] # Change this to create hardware-aware algorithm
 FUNCTION = RoeFlux_1d
 xs = [.01, .02, .02, .01, .03, .03]
 xs = [jax.device_put(jnp.ones(1)*x, device=DEVICE) for x in xs]
-env = RuntimeGame(NUM_MEASUREMENTS, FUNCTION, *xs)
+env = RuntimeGame(NUM_MEASUREMENTS, FUNCTION, *xs, num_workers=NUM_WORKERS)
 
 
-_, fwd_fmas = forward(env.graph)
-_, rev_fmas = reverse(env.graph)
-mM_order = minimal_markowitz(env.graph, int(env.graph.at[0, 0, 1].get()))
-print("mM_order", [int(i) for i in mM_order])
-out, _ = cross_country(mM_order, env.graph)
-print("number of operations:", fwd_fmas, rev_fmas, out[1])
-
-act_seq = [i-1 for i in mM_order]
-cc_time = _get_reward(NUM_MEASUREMENTS, FUNCTION, *xs, act_seq=act_seq)
-fwd_time = _get_reward(NUM_MEASUREMENTS, FUNCTION, *xs, act_seq="fwd")
-rev_time = _get_reward(NUM_MEASUREMENTS, FUNCTION, *xs, act_seq="rev")
-print("runtimes:", fwd_time, rev_time, cc_time)
-
 parser = argparse.ArgumentParser()
 
 parser.add_argument("--name", type=str, 
@@ -130,31 +118,6 @@ def init_weight(model, init_fn, key):
 policy_net = init_weight(policy_net, init_fn, p_init_key)
 value_net = init_weight(value_net, init_fn, v_init_key)
 
-    
-run_config = {"seed": args.seed,
-                "entropy_weight": ENTROPY_WEIGHT, 
-                "value_weight": VALUE_WEIGHT, 
-                "lr": LR,
-                "episodes": EPISODES, 
-                "batchsize": NUM_ENVS, 
-                "gae_lambda": GAE_LAMBDA, 
-                "eps": EPS, 
-                "minibatches": MINIBATCHES, 
-                "minibatchsize": MINIBATCHSIZE, 
-                "obs_shape": OBS_SHAPE, 
-                "num_actions": NUM_ACTIONS, 
-                "rollout_length": ROLLOUT_LENGTH, 
-                "fwd_runtime": fwd_time, 
-                "rev_runtime": rev_time, 
-                "cc_runtime": cc_time}
-
-wandb.login(key="redacted", 
-            host="redacted")
-wandb.init(entity="user", project="AlphaGrad", 
-            group="Runtime_" + args.task, config=run_config,
-            mode=args.wandb)
-wandb.run.name = "PPO_separate_networks_" + args.task + "_" + args.name
-
 
 # Value scaling functions
 def value_transform(x):
@@ -216,15 +179,17 @@ def get_advantages(trajectories):
     values = trajectories[:, 2*OBS_SHAPE+3]
     next_values = jnp.roll(values, -1, axis=0)
     discounts = trajectories[:, 2*OBS_SHAPE+NUM_ACTIONS+4]
-    inputs = jnp.stack([rewards, dones, values, next_values, discounts]).T
+    reward_vars = trajectories[:, 2*OBS_SHAPE+NUM_ACTIONS+5]
+    inputs = jnp.stack([rewards, dones, values, next_values, discounts, reward_vars]).T
     
     def loop_fn(carry, traj):
-        episodic_return, lastgaelam = carry
+        episodic_return, lastgaelam, return_var = carry
         reward = traj[0]
         done = traj[1]
         value = traj[2]
         next_value = traj[3]
         discount = traj[4]
+        reward_var = traj[5]
         # Simplest advantage estimate
         # The advantage estimate has to be done with the states and actions 
         # sampled from the old policy due to the importance sampling formulation
@@ -234,11 +199,13 @@ def get_advantages(trajectories):
         delta = reward + next_value*discount*done - value
         advantage = delta + discount*GAE_LAMBDA*lastgaelam*done
         estim_return = advantage + value
+        # Variance of the return due to the noise of the runtime measurements
+        return_var = reward_var + discount**2*return_var*done
         
-        next_carry = (episodic_return, advantage)
-        new_sample = jnp.array([episodic_return, estim_return, advantage])
+        next_carry = (episodic_return, advantage, return_var)
+        new_sample = jnp.array([episodic_return, estim_return, advantage, return_var])
         return next_carry, new_sample
-    _, output = lax.scan(loop_fn, (0., 0.), inputs[::-1])
+    _, output = lax.scan(loop_fn, (0., 0., 0.), inputs[::-1])
     return jnp.concatenate([trajectories, output[::-1]], axis=-1)
     
     
@@ -268,45 +235,12 @@ def scan(f, init, xs, length=None):
     return carry, jnp.stack(ys)
 
 
-from multiprocessing import Process, Manager
-
-def _step(i, state, action, return_dict):
-    return_dict[i] = env.step(state, action)
-
-# Multi-processing env_steps function for parallel compilation of different
-# vertex elimination orders
+# The rewards of all environments that terminate in this step are measured
+# in parallel by the worker processes of the environment
 def env_steps(states, actions):
     states = jax.device_put(states, jax.devices('cpu')[0])
     actions = jax.device_put(actions, jax.devices('cpu')[0])
-    next_obs, next_act_seqs, rewards, dones = [], [], [], []
-    _states = [(states[0][i], states[1][i]) for i in range(NUM_ENVS)]
-
-    out = {i: env.step(_states[i], actions[i]) for i in range(NUM_ENVS)}
-
-    # manager = Manager()
-    # out = manager.dict()
-    
-    # procs = []
-
-    # # instantiating process with arguments
-    # for i, (state, action) in enumerate(zip(_states, actions)):
-    #     print("starting")
-    #     proc = Process(target=_step, args=(i, state, action, out))
-    #     procs.append(proc)
-    #     proc.start()
-
-    # # complete the processes
-    # for proc in procs:
-    #     print("joining")
-    #     proc.join()
-    # print(out.values())
-    next_obs = [out[i][0][0] for i in range(NUM_ENVS)]
-    next_act_seqs = [out[i][0][1] for i in range(NUM_ENVS)]
-    rewards = [out[i][1] for i in range(NUM_ENVS)]
-    dones = [out[i][2] for i in range(NUM_ENVS)]
-    next_states = (jnp.stack(next_obs), jnp.stack(next_act_seqs))
-    
-    return next_states, jnp.array(rewards), jnp.array(dones)
+    return env.step_batch(states, actions)
 
 
 @eqx.filter_jit
@@ -337,7 +271,7 @@ def rollout_fn(networks, rollout_length, init_carry, key):
         keys = jrand.split(key, NUM_ENVS)
         actions, prob_dists = get_actions(policy_net, obs, keys)
         
-        next_states, rewards, dones = env_steps(states, actions)
+        next_states, rewards, dones, reward_vars, failed = env_steps(states, actions)
         next_obs, next_act_seqs = next_states
         discounts = 0.995*jnp.ones(NUM_ENVS) # TODO adjust this        
         
@@ -351,7 +285,9 @@ def rollout_fn(networks, rollout_length, init_carry, key):
                                     next_obs.reshape(NUM_ENVS, -1), 
                                     next_values[:, jnp.newaxis],
                                     prob_dists, 
-                                    discounts[:, jnp.newaxis]), axis=1) # (sars')
+                                    discounts[:, jnp.newaxis],
+                                    reward_vars[:, jnp.newaxis],
+                                    failed[:, jnp.newaxis]), axis=1) # (sars')
         return next_states, new_sample
     
     return scan(step_fn, init_carry, keys)
@@ -371,9 +307,10 @@ def loss(networks, trajectories, keys):
     
     old_prob_dist = trajectories[:, 2*OBS_SHAPE+4:2*OBS_SHAPE+NUM_ACTIONS+4]
     discounts = trajectories[:, 2*OBS_SHAPE+NUM_ACTIONS+4]
-    episodic_returns = trajectories[:, 2*OBS_SHAPE+NUM_ACTIONS+5]
-    returns = trajectories[:, 2*OBS_SHAPE+NUM_ACTIONS+6]
-    advantages = trajectories[:, 2*OBS_SHAPE+NUM_ACTIONS+7]
+    episodic_returns = trajectories[:, 2*OBS_SHAPE+NUM_ACTIONS+7]
+    returns = trajectories[:, 2*OBS_SHAPE+NUM_ACTIONS+8]
+    advantages = trajectories[:, 2*OBS_SHAPE+NUM_ACTIONS+9]
+    return_vars = trajectories[:, 2*OBS_SHAPE+NUM_ACTIONS+10]
     
     log_probs, prob_dist, values, entropies = get_log_probs_and_value(networks, state, actions, keys)
     next_values = jax.vmap(value_net)(next_state, keys)
@@ -389,7 +326,14 @@ def loss(networks, trajectories, keys):
     clipping_objective = jnp.minimum(ratio*norm_adv, jnp.clip(ratio, 1.-EPS, 1.+EPS)*norm_adv)
     ppo_loss = jnp.mean(-clipping_objective)
     entropy_loss = jnp.mean(entropies)
-    value_loss = .5*jnp.mean((values - value_transform(returns))**2)
+    # Returns with noisy runtime measurements are down-weighted as value targets.
+    # Non-finite variances get the weight of the noisiest finite return
+    finite = jnp.isfinite(return_vars)
+    return_vars = jnp.where(finite, return_vars, jnp.max(jnp.where(finite, return_vars, 0.)))
+    return_vars = jnp.clip(return_vars, 0.)
+    value_weights = 1. / (1. + return_vars / (jnp.mean(return_vars) + 1e-12))
+    value_weights = value_weights / jnp.mean(value_weights)
+    value_loss = .5*jnp.mean(value_weights*(values - value_transform(returns))**2)
     
     # Metrics
     dV = returns - rewards - discounts*inverse_value_transform(next_values) # assess fit quality
@@ -423,6 +367,43 @@ def test_agent(network, rollout_length, keys):
 
 
 if __name__ == '__main__':
+    # Baselines are measured here since the worker processes import this script
+    _, fwd_fmas = forward(env.graph)
+    _, rev_fmas = reverse(env.graph)
+    mM_order = minimal_markowitz(env.graph, int(env.graph.at[0, 0, 1].get()))
+    print("mM_order", [int(i) for i in mM_order])
+    out, _ = cross_country(mM_order, env.graph)
+    print("number of operations:", fwd_fmas, rev_fmas, out[1])
+
+    act_seq = [i-1 for i in mM_order]
+    cc_time, fwd_time, rev_time = env.get_rewards([act_seq, "fwd", "rev"])
+    print("runtimes:", fwd_time, rev_time, cc_time)
+    
+    run_config = {"seed": args.seed,
+                    "entropy_weight": ENTROPY_WEIGHT, 
+                    "value_weight": VALUE_WEIGHT, 
+                    "lr": LR,
+                    "episodes": EPISODES, 
+                    "batchsize": NUM_ENVS, 
+                    "gae_lambda": GAE_LAMBDA, 
+                    "eps": EPS, 
+                    "minibatches": MINIBATCHES, 
+                    "minibatchsize": MINIBATCHSIZE, 
+                    "obs_shape": OBS_SHAPE, 
+                    "num_actions": NUM_ACTIONS, 
+                    "rollout_length": ROLLOUT_LENGTH, 
+                    "fwd_runtime": fwd_time, 
+                    "rev_runtime": rev_time, 
+                    "cc_runtime": cc_time,
+                    "num_workers": NUM_WORKERS}
+
+    wandb.login(key="redacted", 
+                host="redacted")
+    wandb.init(entity="user", project="AlphaGrad", 
+                group="Runtime_" + args.task, config=run_config,
+                mode=args.wandb)
+    wandb.run.name = "PPO_separate_networks_" + args.task + "_" + args.name
+
     # Define optimizer
     # TODO test L2 norm and stationary ADAM for better stability
     model = (policy_net, value_net)
@@ -450,6 +431,8 @@ if __name__ == '__main__':
         env_carry = init_carry(keys)
         env_carry, trajectories = rollout_fn(model, ROLLOUT_LENGTH, env_carry, key)
         trajectories = jnp.swapaxes(trajectories, 0, 1)
+        # Orders whose measurement failed are rewarded with the failure penalty
+        num_failed = int(jnp.sum(trajectories[:, :, 2*OBS_SHAPE+NUM_ACTIONS+6]))
         trajectories = get_advantages(trajectories)
         batches = shuffle_and_batch(trajectories, subkey)
         
@@ -487,10 +470,12 @@ if __name__ == '__main__':
                     "value loss": value_loss,
                     "entropy loss": entropy_loss,
                     "total loss": total_loss,
-                    "clipping trigger ratio": clipping_trigger_ratio})
+                    "clipping trigger ratio": clipping_trigger_ratio,
+                    "failed measurements": num_failed,
+                    **env.cache.stats()})
             
         pbar.set_description(f"entropy: {policy_entropy:.4f}, best_return: {best_return}, mean_return: {jnp.mean(returns)}, fit_quality: {fit_quality:.2f}, expl_var: {explained_var:.4f}, kl_div: {kl_div:.4f}")
             
     vertex_elimination_order = [int(i) for i in best_act_seq]
     print(f"Best vertex elimination sequence after {EPISODES} episodes is {vertex_elimination_order} with {best_global_return} multiplications.")
-
+    env.close()
@@ -23,7 +23,7 @@ import equinox as eqx
 
 from alphagrad.config import setup_experiment
 from alphagrad.experiments import make_benchmark_scores
-from alphagrad.vertexgame import step
+from alphagrad.vertexgame import step, get_max_degree
 from alphagrad.utils import symlog, symexp, entropy, explained_variance
 from alphagrad.transformer.models import PolicyNet, ValueNet
 
@@ -92,6 +92,10 @@ parser.add_argument("--config_path", type=str,
 parser.add_argument("--wandb", type=str,
                     default="run", help="Wandb mode.")
 
+parser.add_argument("--beam_width", type=int,
+                    default=None, help="Beam width of the beam search baseline. "
+                    "If not set, the beam search baseline is not computed.")
+
 args = parser.parse_args()
 
 os.environ["XLA_PYTHON_CLIENT_PREALLOCATE"] = "false"
@@ -99,7 +103,7 @@ os.environ["CUDA_VISIBLE_DEVICES"] = str(args.gpus)
 key = jrand.PRNGKey(args.seed)
 
 config, graph, graph_shape, task_fn = setup_experiment(args.task, args.config_path)
-mM_order, scores = make_benchmark_scores(graph)
+mM_order, scores = make_benchmark_scores(graph, args.beam_width)
 
 parameters = config["hyperparameters"]
 ENTROPY_WEIGHT = parameters["entropy_weight"]
@@ -116,6 +120,8 @@ ROLLOUT_LENGTH = int(graph_shape[-2] - graph_shape[-1]) # parameters["ppo"]["rol
 OBS_SHAPE = reduce(lambda x, y: x*y, graph.shape)
 NUM_ACTIONS = graph.shape[-1] # ROLLOUT_LENGTH # TODO fix this
 MINIBATCHSIZE = NUM_ENVS*ROLLOUT_LENGTH//MINIBATCHES
+# Maximum number of graph columns that a single step changes
+MAX_CHANGED = get_max_degree(graph) + 1
 
 policy_key, value_key = jrand.split(key, 2)
 # Larger models seem to help
@@ -163,7 +169,8 @@ run_config = {"seed": args.seed,
                 "rollout_length": ROLLOUT_LENGTH, 
                 "fwd_fmas": scores[0], 
                 "rev_fmas": scores[1], 
-                "out_fmas": scores[2]}
+                "out_fmas": scores[2],
+                "beam_fmas": scores[3] if args.beam_width is not None else None}
 
 wandb.login(key="redacted", 
             host="redacted")
@@ -281,11 +288,13 @@ def rollout_fn(networks, rollout_length, init_carry, key):
     keys = jrand.split(key, rollout_length)
     policy_net, value_net = networks
     
-    def step_fn(state, key):
+    def step_fn(carry, key):
+        # Cached embeddings of the current state for both networks
+        state, policy_embeddings, value_embeddings = carry
         mask = 1. - state.at[1, 0, :].get()
         net_key, next_net_key, act_key = jrand.split(key, 3)
         
-        logits = policy_net(state, key=net_key)
+        logits = policy_net(state, key=net_key, embeddings=policy_embeddings)
         prob_dist = jnn.softmax(logits, axis=-1, where=mask, initial=mask.max())
         
         distribution = distrax.Categorical(probs=prob_dist)
@@ -293,7 +302,12 @@ def rollout_fn(networks, rollout_length, init_carry, key):
         
         next_state, reward, done = step(state, action)
         discount = 1.
-        next_value = value_net(next_state, key=next_net_key)
+        # Only the columns that the step changed are embedded again
+        policy_embeddings = policy_net.update_embeddings(policy_embeddings, state, 
+                                                        next_state, MAX_CHANGED)
+        value_embeddings = value_net.update_embeddings(value_embeddings, state, 
+                                                        next_state, MAX_CHANGED)
+        next_value = value_net(next_state, key=next_net_key, embeddings=value_embeddings)
         
         new_sample = jnp.concatenate((state.flatten(),
                                     jnp.array([action]), 
@@ -304,9 +318,11 @@ def rollout_fn(networks, rollout_length, init_carry, key):
                                     prob_dist, 
                                     jnp.array([discount]))) # (sars')
         
-        return next_state, new_sample
+        return (next_state, policy_embeddings, value_embeddings), new_sample
     
-    return lax.scan(step_fn, init_carry, keys)
+    init_carry = (init_carry, policy_net.embed(init_carry), value_net.embed(init_carry))
+    (final_state, _, _), trajectories = lax.scan(step_fn, init_carry, keys)
+    return final_state, trajectories
 
 
 def loss(networks, trajectories, keys):
@@ -390,7 +406,8 @@ samplecounts = 0
 
 env_keys = jrand.split(key, NUM_ENVS)
 env_carry = init_carry(env_keys)
-best_global_return = jnp.max(-jnp.array(scores))
+# The beam search score is only logged for comparison
+best_global_return = jnp.max(-jnp.array(scores[:3]))
 best_global_act_seq = None
 
 elim_order_table = wandb.Table(columns=["episode", "return", "elimination order"])
@@ -23,7 +23,8 @@ import equinox as eqx
 
 from alphagrad.config import setup_experiment
 from alphagrad.experiments import make_benchmark_scores
-from alphagrad.vertexgame import step
+from alphagrad.compilation import enable_compilation_cache, warmup
+from alphagrad.vertexgame import step, get_max_degree
 from alphagrad.utils import symlog, symexp, entropy, explained_variance
 from alphagrad.transformer.models import PPOModel
 
@@ -49,6 +50,14 @@ parser.add_argument("--config_path", type=str,
 parser.add_argument("--wandb", type=str,
                     default="run", help="Wandb mode.")
 
+parser.add_argument("--compilation_cache", type=str,
+                    default=os.environ.get("ALPHAGRAD_COMPILATION_CACHE"), 
+                    help="Directory of the persistent compilation cache.")
+
+parser.add_argument("--beam_width", type=int,
+                    default=None, help="Beam width of the beam search baseline. "
+                    "If not set, the beam search baseline is not computed.")
+
 args = parser.parse_args()
 
 os.environ["XLA_PYTHON_CLIENT_PREALLOCATE"] = "false"
@@ -58,7 +67,10 @@ model_key, init_key, key = jrand.split(key, 3)
 
 
 config, graph, graph_shape, task_fn = setup_experiment(args.task, args.config_path)
-mM_order, scores = make_benchmark_scores(graph)
+if args.compilation_cache is not None:
+    enable_compilation_cache(args.compilation_cache, args.task, graph_shape)
+compile_times = {}
+mM_order, scores = make_benchmark_scores(graph, args.beam_width, compile_times=compile_times)
 
 parameters = config["hyperparameters"]
 ENTROPY_WEIGHT = parameters["entropy_weight"]
@@ -75,6 +87,8 @@ ROLLOUT_LENGTH = parameters["ppo"]["rollout_length"]
 OBS_SHAPE = reduce(lambda x, y: x*y, graph.shape)
 NUM_ACTIONS = graph.shape[-1] # ROLLOUT_LENGTH # TODO fix this
 MINIBATCHSIZE = NUM_ENVS*ROLLOUT_LENGTH//MINIBATCHES
+# Maximum number of graph columns that a single step changes
+MAX_CHANGED = get_max_degree(graph) + 1
 
 model = PPOModel(graph_shape, 64, 6, 8,
                 ff_dim=256,
@@ -122,7 +136,8 @@ run_config = {"seed": args.seed,
                 "rollout_length": ROLLOUT_LENGTH, 
                 "fwd_fmas": scores[0], 
                 "rev_fmas": scores[1], 
-                "out_fmas": scores[2]}
+                "out_fmas": scores[2],
+                "beam_fmas": scores[3] if args.beam_width is not None else None}
 
 wandb.login(key="redacted", 
             host="redacted")
@@ -237,11 +252,12 @@ def init_carry(keys):
 @partial(jax.vmap, in_axes=(None, None, 0, 0))
 def rollout_fn(network, rollout_length, init_carry, key):
     keys = jrand.split(key, rollout_length)
-    def step_fn(state, key):
+    def step_fn(carry, key):
+        state, embeddings = carry
         net_key, next_net_key, act_key = jrand.split(key, 3)
         mask = 1. - state.at[1, 0, :].get()
         
-        output = network(state, key=net_key)
+        output = network(state, key=net_key, embeddings=embeddings)
         value = output[0]
         logits = output[1:]
         prob_dist = jnn.softmax(logits, axis=-1, where=mask, initial=mask.max())
@@ -251,7 +267,9 @@ def rollout_fn(network, rollout_length, init_carry, key):
         
         next_state, reward, done = step(state, action)
         discount = 1.
-        next_output = network(next_state, key=next_net_key)
+        # Only the columns that the step changed are embedded again
+        next_embeddings = network.update_embeddings(embeddings, state, next_state, MAX_CHANGED)
+        next_output = network(next_state, key=next_net_key, embeddings=next_embeddings)
         next_value = next_output[0]
         next_logits = next_output[1:]
         
@@ -264,9 +282,11 @@ def rollout_fn(network, rollout_length, init_carry, key):
                                     prob_dist, 
                                     jnp.array([discount]))) # (sars')
          
-        return next_state, new_sample
+        return (next_state, next_embeddings), new_sample
     
-    return lax.scan(step_fn, init_carry, keys)
+    init_carry = (init_carry, network.embed(init_carry))
+    (final_state, _), trajectories = lax.scan(step_fn, init_carry, keys)
+    return final_state, trajectories
 
 
 def loss(network, trajectories, keys):
@@ -340,6 +360,15 @@ optim = optax.chain(optax.adam(schedule, b1=.9, eps=1e-7),
 opt_state = optim.init(eqx.filter(model, eqx.is_inexact_array))
 
 
+# Compile the rollout, training and test functions ahead of time
+warmup_keys = jrand.split(key, NUM_ENVS)
+warmup_batch = jnp.zeros((MINIBATCHSIZE, 2*OBS_SHAPE+NUM_ACTIONS+8))
+compile_times.update(warmup({"rollout": (rollout_fn, (model, ROLLOUT_LENGTH, init_carry(warmup_keys), warmup_keys)),
+                            "train_agent": (train_agent, (model, opt_state, warmup_batch, jrand.split(key, MINIBATCHSIZE))),
+                            "test_agent": (test_agent, (model, 98, warmup_keys))}))
+wandb.config.update({"compile_times": compile_times})
+
+
 # Training loop
 pbar = tqdm(range(EPISODES))
 samplecounts = 0
@@ -347,7 +376,8 @@ samplecounts = 0
 env_keys = jrand.split(key, NUM_ENVS)
 env_carry = init_carry(env_keys)
 print("Scores:", scores)
-best_global_return = jnp.max(-jnp.array(scores))
+# The beam search score is only logged for comparison
+best_global_return = jnp.max(-jnp.array(scores[:3]))
 best_global_act_seq = None
 
 elim_order_table = wandb.Table(columns=["episode", "return", "elimination order"])
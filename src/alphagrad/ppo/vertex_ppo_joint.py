@@ -50,6 +50,10 @@ parser.add_argument("--config_path", type=str,
 parser.add_argument("--wandb", type=str,
                     default="run", help="Wandb mode.")
 
+parser.add_argument("--beam_width", type=int,
+                    default=None, help="Beam width of the beam search baseline. "
+                    "If not set, the beam search baseline is not computed.")
+
 args = parser.parse_args()
 
 # os.environ["XLA_PYTHON_CLIENT_PREALLOCATE"] = "false"
@@ -67,11 +71,12 @@ GRAPH_REPO = []
 orders_scores = {}
 for name, graph in zip(NAMES, graphs):
     key, subkey = jrand.split(key, 2)
-    mM_order, scs = make_benchmark_scores(graph)
+    mM_order, scs = make_benchmark_scores(graph, args.beam_width)
     orders_scores[name] = {"order": mM_order, 
                             "fwd_fmas":scs[0],
                             "rev_fmas":scs[1],
-                            "mM_fmas":scs[2]}
+                            "mM_fmas":scs[2],
+                            "beam_fmas":scs[3] if args.beam_width is not None else None}
     _graph = embed(subkey, graph, max_graph_shape)
     GRAPH_REPO.append(_graph)
     
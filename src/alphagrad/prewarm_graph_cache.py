@@ -0,0 +1,53 @@
+"""
+Fills the on-disk graph cache with the computational graphs and baseline
+scores of the benchmark tasks so that later experiments start without having
+to interpret the jaxprs and eliminate the baselines again.
+
+Usage:
+    python -m alphagrad.prewarm_graph_cache --cache_dir ~/.cache/alphagrad --tasks RoeFlux_1d f
+"""
+import os
+import time
+import argparse
+
+from . import experiments
+from .vertexgame.interpreter import GraphCache, DEFAULT_MAX_SIZE
+
+
+def get_tasks():
+    return [name[len("make_"):] for name in dir(experiments)
+            if name.startswith("make_") and name not in ("make_fn", "make_benchmark_scores")]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cache_dir", type=str,
+                        default=os.environ.get("ALPHAGRAD_GRAPH_CACHE"),
+                        help="Directory of the graph cache.")
+    parser.add_argument("--max_size", type=int,
+                        default=int(os.environ.get("ALPHAGRAD_GRAPH_CACHE_SIZE", DEFAULT_MAX_SIZE)),
+                        help="Maximum size of the graph cache in bytes.")
+    parser.add_argument("--tasks", type=str, nargs="+", default=get_tasks(),
+                        help="Tasks for which the graphs are cached.")
+    parser.add_argument("--beam_width", type=int, default=None,
+                        help="Also caches the beam search baseline with this beam width.")
+    args = parser.parse_args()
+    if args.cache_dir is None:
+        parser.error("No cache directory given, use --cache_dir or set ALPHAGRAD_GRAPH_CACHE.")
+
+    # `make_fn` and `make_benchmark_scores` look up the cache via the environment
+    os.environ["ALPHAGRAD_GRAPH_CACHE"] = args.cache_dir
+    os.environ["ALPHAGRAD_GRAPH_CACHE_SIZE"] = str(args.max_size)
+
+    for task in args.tasks:
+        start_time = time.time()
+        graph, graph_shape, _ = getattr(experiments, "make_" + task)()
+        _, scores = experiments.make_benchmark_scores(graph, args.beam_width)
+        print(f"{task}: shape {graph_shape}, scores {[int(s) for s in scores]}, "
+                f"{time.time() - start_time:.2f}s")
+    print(f"Cache size: {GraphCache(args.cache_dir, args.max_size).size()} bytes")
+
+
+if __name__ == "__main__":
+    main()
+
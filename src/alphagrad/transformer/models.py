@@ -2,6 +2,7 @@ from typing import Sequence
 
 import jax
 import jax.nn as jnn
+import jax.lax as lax
 import jax.numpy as jnp
 import jax.random as jrand
 
@@ -14,6 +15,68 @@ from alphagrad.transformer import Encoder
 from alphagrad.transformer import PositionalEncoder
 
 
+def embed_graph(embedding: eqx.nn.Conv2d, projection: Array, graph: Array) -> Array:
+    """
+    Computes the embeddings of the vertices of a graph, i.e. one token of
+    shape (embedding_dim,) per column of the graph.
+
+    Returns:
+        An array of shape (num_vo, embedding_dim).
+    """
+    # output_token_mask = jnp.where(graph.at[2, 0, :].get() > 0, self.output_token, 0.)
+    edges = graph.at[:, 1:, :].get() #  + output_token_mask[jnp.newaxis, :, :]
+    edges = edges.astype(jnp.float32)
+    
+    embeddings = embedding(edges.transpose(2, 0, 1)).squeeze()
+    return jax.vmap(jnp.matmul, in_axes=(0, None))(embeddings, projection)
+
+
+def update_graph_embedding(embedding: eqx.nn.Conv2d, 
+                            projection: Array, 
+                            embeddings: Array,
+                            graph: Array,
+                            next_graph: Array,
+                            max_changed: int) -> Array:
+    """
+    Incrementally updates the embeddings of `graph` to the ones of 
+    `next_graph` that differs in at most `max_changed` columns. The 
+    convolution and the projection are affine in the edges, so only the
+    difference of the changed columns has to be embedded. A vertex
+    elimination changes the column of the eliminated vertex and the columns of
+    its successors, so `max_changed` is bounded by the maximum out-degree of 
+    a vertex plus one, see `vertexgame.get_max_degree`.
+
+    Arguments:
+        embedding (eqx.nn.Conv2d): Convolution of the graph embedding.
+        projection (Array): Projection of the graph embedding.
+        embeddings (Array): Embeddings of `graph` of shape (num_vo, embedding_dim).
+        graph (Array): Graph before the step.
+        next_graph (Array): Graph after the step.
+        max_changed (int): Maximum number of columns that differ.
+
+    Returns:
+        The embeddings of `next_graph`.
+    """
+    num_vo = graph.shape[-1]
+    max_changed = min(max_changed, num_vo)
+    delta = next_graph.at[:, 1:, :].get() - graph.at[:, 1:, :].get()
+    delta = delta.astype(jnp.float32).transpose(2, 0, 1)
+    changed = jnp.any(delta != 0., axis=(1, 2))
+    # Padded indices point out of bounds and gather zeros
+    idxs = jnp.nonzero(changed, size=max_changed, fill_value=num_vo)[0]
+    delta = delta.at[idxs].get(mode="fill", fill_value=0.)
+    weight = embedding.weight.at[:, idxs].get(mode="fill", fill_value=0.)
+    
+    # Convolution of the changed input channels without bias
+    delta_embeddings = lax.conv_general_dilated(delta[jnp.newaxis], 
+                                                weight,
+                                                window_strides=embedding.stride,
+                                                padding=embedding.padding,
+                                                rhs_dilation=embedding.dilation)
+    delta_embeddings = delta_embeddings.reshape(num_vo, -1)
+    return embeddings + delta_embeddings @ projection
+
+
 class GraphEmbedding(eqx.Module):
     embedding: eqx.nn.Conv2d
     projection: Array
@@ -34,18 +97,24 @@ class GraphEmbedding(eqx.Module):
         self.projection = jrand.normal(proj_key, (conv_size, embedding_dim))
         # self.output_token = jrand.normal(token_key, (num_i+num_vo, 1))
     
-    def __call__(self, graph: Array, key: PRNGKey = None) -> Array:
+    def __call__(self, 
+                graph: Array, 
+                key: PRNGKey = None, 
+                embeddings: Array = None) -> Array:
         output_mask = graph.at[2, 0, :].get()
         vertex_mask = graph.at[1, 0, :].get() - output_mask
         attn_mask = jnp.logical_or(vertex_mask.reshape(1, -1), vertex_mask.reshape(-1, 1))
         
-        # output_token_mask = jnp.where(graph.at[2, 0, :].get() > 0, self.output_token, 0.)
-        edges = graph.at[:, 1:, :].get() #  + output_token_mask[jnp.newaxis, :, :]
-        edges = edges.astype(jnp.float32)
-        
-        embeddings = self.embedding(edges.transpose(2, 0, 1)).squeeze()
-        embeddings = jax.vmap(jnp.matmul, in_axes=(0, None))(embeddings, self.projection)
+        if embeddings is None:
+            embeddings = self.embed(graph)
         return embeddings.T, attn_mask.T
+    
+    def embed(self, graph: Array) -> Array:
+        return embed_graph(self.embedding, self.projection, graph)
+    
+    def update(self, embeddings: Array, graph: Array, next_graph: Array, max_changed: int) -> Array:
+        return update_graph_embedding(self.embedding, self.projection, embeddings, 
+                                    graph, next_graph, max_changed)
 
 
 class SequentialTransformer(eqx.Module):
@@ -149,19 +218,26 @@ class PPOModel(eqx.Module):
                                                 key=tf_key, 
                                                 **kwargs)
     
-    def __call__(self, xs: Array, key: PRNGKey = None) -> Array:
+    def __call__(self, 
+                xs: Array, 
+                key: PRNGKey = None, 
+                embeddings: Array = None) -> Array:
         output_mask = xs.at[2, 0, :].get()
         vertex_mask = xs.at[1, 0, :].get() - output_mask
         attn_mask = jnp.logical_or(vertex_mask.reshape(1, -1), vertex_mask.reshape(-1, 1))
         
-        # output_token_mask = jnp.where(xs.at[2, 0, :].get() > 0, self.output_token, 0.)
-        edges = xs.at[:, 1:, :].get() # + output_token_mask[jnp.newaxis, :, :]
-        edges = edges.astype(jnp.float32)
-        
-        embeddings = self.embedding(edges.transpose(2, 0, 1)).squeeze()
-        embeddings = jax.vmap(jnp.matmul, in_axes=(0, None))(embeddings, self.projection)
+        # Cached embeddings can be passed in to skip the graph embedding
+        if embeddings is None:
+            embeddings = self.embed(xs)
         return self.transformer(embeddings.T, mask=attn_mask, key=key)
     
+    def embed(self, xs: Array) -> Array:
+        return embed_graph(self.embedding, self.projection, xs)
+    
+    def update_embeddings(self, embeddings: Array, xs: Array, next_xs: Array, max_changed: int) -> Array:
+        return update_graph_embedding(self.embedding, self.projection, embeddings, 
+                                    xs, next_xs, max_changed)
+    
     
 class AlphaZeroModel(eqx.Module):
     embedding: eqx.nn.Conv2d
@@ -192,19 +268,26 @@ class AlphaZeroModel(eqx.Module):
                                                 key=tf_key, 
                                                 **kwargs)
     
-    def __call__(self, xs: Array, key: PRNGKey = None) -> Array:
+    def __call__(self, 
+                xs: Array, 
+                key: PRNGKey = None, 
+                embeddings: Array = None) -> Array:
         output_mask = xs.at[2, 0, :].get()
         vertex_mask = xs.at[1, 0, :].get() - output_mask
         attn_mask = jnp.logical_or(vertex_mask.reshape(1, -1), vertex_mask.reshape(-1, 1))
         
-        # output_token_mask = jnp.where(xs.at[2, 0, :].get() > 0, self.output_token, 0.)
-        edges = xs.at[:, 1:, :].get() #  + output_token_mask[jnp.newaxis, :, :]
-        edges = edges.astype(jnp.float32)
-        
-        embeddings = self.embedding(edges.transpose(2, 0, 1)).squeeze()
-        embeddings = jax.vmap(jnp.matmul, in_axes=(0, None))(embeddings, self.projection)
+        # Cached embeddings can be passed in to skip the graph embedding
+        if embeddings is None:
+            embeddings = self.embed(xs)
         return self.transformer(embeddings.T, mask=attn_mask, key=key)
     
+    def embed(self, xs: Array) -> Array:
+        return embed_graph(self.embedding, self.projection, xs)
+    
+    def update_embeddings(self, embeddings: Array, xs: Array, next_xs: Array, max_changed: int) -> Array:
+        return update_graph_embedding(self.embedding, self.projection, embeddings, 
+                                    xs, next_xs, max_changed)
+    
 
 class PolicyNet(eqx.Module):
     num_heads: int
@@ -238,9 +321,12 @@ class PolicyNet(eqx.Module):
 
         self.head = MLP(in_dim, 1, mlp_dims, key=key)
         
-    def __call__(self, graph: Array, key: PRNGKey = None) -> Array:  
-        # Embed the input graph
-        embeddings, mask = self.embedding(graph)
+    def __call__(self, 
+                graph: Array, 
+                key: PRNGKey = None, 
+                embeddings: Array = None) -> Array:
+        # Embed the input graph unless cached embeddings are given
+        embeddings, mask = self.embedding(graph, embeddings=embeddings)
         
         # Transpose inputs for equinox attention mechanism
         embeddings = self.pos_enc(embeddings).T
@@ -251,6 +337,12 @@ class PolicyNet(eqx.Module):
         
         policy = jax.vmap(self.head)(xs)
         return policy.squeeze()
+    
+    def embed(self, graph: Array) -> Array:
+        return self.embedding.embed(graph)
+    
+    def update_embeddings(self, embeddings: Array, graph: Array, next_graph: Array, max_changed: int) -> Array:
+        return self.embedding.update(embeddings, graph, next_graph, max_changed)
 
 
 class ValueNet(eqx.Module):
@@ -291,9 +383,12 @@ class ValueNet(eqx.Module):
         # self.global_token_mask_y = jnp.ones((1, num_vo+1))
         self.head = MLP(in_dim, 1, mlp_dims, key=key)
         
-    def __call__(self, graph: Array, key: PRNGKey = None) -> Array:
-        # Embed the input graph
-        embeddings, mask = self.embedding(graph)
+    def __call__(self, 
+                graph: Array, 
+                key: PRNGKey = None, 
+                embeddings: Array = None) -> Array:
+        # Embed the input graph unless cached embeddings are given
+        embeddings, mask = self.embedding(graph, embeddings=embeddings)
         
         # Add global token to input
         # embeddings = jnp.concatenate((self.global_token, embeddings), axis=-1)
@@ -310,6 +405,12 @@ class ValueNet(eqx.Module):
         
         return jnp.mean(values)
     
+    def embed(self, graph: Array) -> Array:
+        return self.embedding.embed(graph)
+    
+    def update_embeddings(self, embeddings: Array, graph: Array, next_graph: Array, max_changed: int) -> Array:
+        return self.embedding.update(embeddings, graph, next_graph, max_changed)
+    
     
 # TODO test ResNet
 
@@ -143,6 +143,24 @@ def postprocess_data(data: Array) -> Array:
 	return data.at[:, -3].set(values)
 
 
+def make_lookback_state(graph: Array, lookback: int) -> Array:
+	"""
+	Builds the network input from the current graph. The tree search state 
+	only holds the current graph, so the edges of earlier states are not 
+	available and stacking more than one state is not supported.
+
+	Args:
+		graph (Array): Current graph of shape (5, num_i+num_vo+1, num_vo).
+		lookback (int): Number of stacked states. Must be 1.
+	Returns:
+		Array: The network input of shape (5, num_i+num_vo+1, num_vo).
+	"""
+	if lookback > 1:
+		raise ValueError(f"A lookback of {lookback} is not supported since "
+						"the search state does not keep the edges of past states!")
+	return graph
+
+
 def make_init_state(graph: Array, key: PRNGKey) -> Tuple:
 	"""
 	Function that creates the initial state for the tree search.
@@ -1,14 +1,24 @@
 from .interpreter import make_graph
 from .transforms import safe_preeliminations, clean, compress, embed, minimal_markowitz
-from .core import forward, reverse, cross_country, vertex_eliminate, get_graph_shape
+from .core import (forward, reverse, cross_country, cross_country_batch, 
+                    vertex_eliminate, get_graph_shape)
+from .sparse_core import EdgeList, make_edge_list, get_max_degree
+from .wavefront import make_wavefronts, wavefront_eliminate, wavefront_cross_country
+from .runtime_cache import RuntimeCache, get_order_key
+from .cost_model import CostModel, get_cost_features, get_cost_features_batch
+from .bucketing import DEFAULT_BUCKETS, get_bucket, pad_to_bucket
 from .vertex_game import step
+from .search import beam_search, branch_and_bound
+from .local_search import simulated_annealing, genetic_algorithm
 from .codegeneration.llm.llm_sampler import LLMSampler
 from .codegeneration.random.random_sampler import RandomSampler, RandomDerivativeSampler
 from .codegeneration.random.random_codegenerator import make_random_code
-from .utils import (create, read, write, get_prompt_list, delete,
-                    check_graph_shape, read_graph, sparsify, densify)
+from .utils import (create, read, write, compact, get_prompt_list, delete,
+                    check_graph_shape, read_graph, read_layout, sparsify, 
+                    densify, to_columnar)
 from .make_dataset import Graph2File
-from .dataset import GraphDataset
+from .dataset import GraphDataset, GraphStream, BucketBatchSampler
+from .memmap_dataset import MemmapWriter, MemmapGraphDataset, convert_to_memmap
 from .codegeneration.tasks import make_task_dataset
 from .codegeneration.benchmark import make_benchmark_dataset
 from .integrity_checker import check_graphax_integrity
\ No newline at end of file
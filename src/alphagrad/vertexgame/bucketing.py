@@ -0,0 +1,149 @@
+"""
+Shape bucketing of computational graphs.
+
+Instead of padding every graph to a single global storage shape, graphs are
+routed to the smallest of several padded shapes, i.e. buckets, that fits them.
+Shapes and buckets use the same format as `storage_shape`, namely
+(num_inputs, num_intermediates + num_outputs, num_outputs).
+Since jitted functions are compiled once per input shape, every bucket gets
+its own executables and small graphs do not pay for the elimination of padding
+vertices.
+"""
+
+from typing import Sequence, Tuple
+
+import numpy as np
+
+from chex import Array
+
+from .core import get_shape
+
+
+DEFAULT_BUCKETS = [[10, 30, 10], [15, 60, 15], [20, 105, 20]]
+
+
+def get_effective_shape(graph: Array) -> Tuple[int, int, int]:
+    """
+    Computes the smallest shape that contains all inputs and vertices of a
+    padded graph. Padding inputs have no outgoing edges and padding vertices
+    are eliminated and unconnected, and both are appended at the end by `embed`.
+
+    Arguments:
+        graph (Array): Dense computational graph representation.
+
+    Returns:
+        A tuple (num_inputs, num_vertices, num_outputs).
+    """
+    graph = np.asarray(graph)
+    num_i, num_v = get_shape(graph)
+    adjacency = graph[0, 1:, :] != 0
+
+    used_inputs = np.nonzero(adjacency[:num_i].any(axis=1))[0]
+    is_active = np.logical_or(graph[1, 0, :] == 0, graph[2, 0, :] != 0)
+    is_active |= adjacency.any(axis=0) | adjacency[num_i:].any(axis=1)
+    active_vertices = np.nonzero(is_active)[0]
+
+    eff_num_i = int(used_inputs[-1]) + 1 if len(used_inputs) > 0 else 0
+    eff_num_v = int(active_vertices[-1]) + 1 if len(active_vertices) > 0 else 0
+    eff_num_o = int(np.sum(graph[2, 0, :eff_num_v] != 0))
+    return eff_num_i, eff_num_v, eff_num_o
+
+
+def get_sparse_effective_shape(header: Array, 
+                                sparse_graph: Array, 
+                                columnar: bool = False) -> Tuple[int, int, int]:
+    """
+    Same as `get_effective_shape` but works directly on the header and the 
+    sparse edges as returned by `sparsify`. Only the row and column indices of 
+    the edges are used, so the graph does not have to be densified.
+
+    Arguments:
+        header (Array): Header row of the graph.
+        sparse_graph (Array): Flat sparse edges of the graph.
+        columnar (bool): Layout of the sparse edges, see `sparsify`.
+
+    Returns:
+        A tuple (num_inputs, num_vertices, num_outputs).
+    """
+    header = np.asarray(header)
+    sparse_graph = np.asarray(sparse_graph)
+    num_i = int(header[0, 0])
+    num_edges = len(sparse_graph) // 7
+    if columnar:
+        i, j = sparse_graph[:num_edges], sparse_graph[num_edges:2*num_edges]
+    else:
+        i, j = sparse_graph[0::7], sparse_graph[1::7]
+
+    is_input = i < num_i
+    is_active = np.logical_or(header[1] == 0, header[2] != 0)
+    active_vertices = np.nonzero(is_active)[0]
+
+    eff_num_i = int(i[is_input].max()) + 1 if is_input.any() else 0
+    eff_num_v = int(active_vertices[-1]) + 1 if len(active_vertices) > 0 else 0
+    if num_edges > 0:
+        eff_num_v = max(eff_num_v, int(j.max()) + 1)
+    if not is_input.all():
+        eff_num_v = max(eff_num_v, int(i[~is_input].max()) - num_i + 1)
+    eff_num_o = int(np.sum(header[2, :eff_num_v] != 0))
+    return eff_num_i, eff_num_v, eff_num_o
+
+
+def get_bucket(shape: Sequence[int],
+                buckets: Sequence[Sequence[int]] = DEFAULT_BUCKETS) -> Tuple[int, int, int]:
+    """
+    Returns the smallest bucket that fits a graph of the given shape.
+    Buckets are compared by the number of vertices first.
+
+    Arguments:
+        shape (Sequence[int]): Shape of the graph, e.g. from `get_effective_shape`.
+        buckets (Sequence[Sequence[int]]): Available bucket shapes.
+
+    Returns:
+        The bucket shape as a tuple.
+    """
+    fitting = [tuple(int(b) for b in bucket) for bucket in buckets
+                if all(s <= b for s, b in zip(shape, bucket))]
+    if len(fitting) == 0:
+        raise ValueError(f"Graph of shape {tuple(shape)} does not fit into any "
+                        f"of the buckets {buckets}!")
+    return min(fitting, key=lambda b: (b[1], b[0], b[2]))
+
+
+def pad_to_bucket(graph: Array,
+                    buckets: Sequence[Sequence[int]] = DEFAULT_BUCKETS,
+                    bucket: Sequence[int] = None) -> np.ndarray:
+    """
+    Crops away the padding of a graph and pads it again to the smallest
+    fitting bucket. Like `embed`, padding inputs are inserted after the
+    existing inputs and padding vertices are appended as eliminated vertices.
+    Since the data is kept on the host, this uses numpy.
+
+    Arguments:
+        graph (Array): Dense computational graph representation.
+        buckets (Sequence[Sequence[int]]): Available bucket shapes.
+        bucket (Sequence[int]): Explicit target bucket. Overrides `buckets`.
+
+    Returns:
+        The graph padded to the shape of the bucket.
+    """
+    graph = np.asarray(graph)
+    num_i, _ = get_shape(graph)
+    eff_num_i, eff_num_v, eff_num_o = get_effective_shape(graph)
+    if bucket is None:
+        bucket = get_bucket((eff_num_i, eff_num_v, eff_num_o), buckets)
+    new_num_i, new_num_v, new_num_o = bucket
+    if eff_num_i > new_num_i or eff_num_v > new_num_v or eff_num_o > new_num_o:
+        raise ValueError(f"Graph of shape {(eff_num_i, eff_num_v, eff_num_o)} "
+                        f"too large to be embedded in shape {tuple(bucket)}!")
+
+    new_graph = np.zeros((5, new_num_i+new_num_v+1, new_num_v), dtype=graph.dtype)
+    new_graph[:, 0, :eff_num_v] = graph[:, 0, :eff_num_v]
+    new_graph[1, 0, eff_num_v:] = 1
+    new_graph[:, 1:eff_num_i+1, :eff_num_v] = graph[:, 1:eff_num_i+1, :eff_num_v]
+    new_graph[:, new_num_i+1:new_num_i+eff_num_v+1, :eff_num_v] = \
+        graph[:, num_i+1:num_i+eff_num_v+1, :eff_num_v]
+
+    # Update edge state size to new size
+    new_graph[0, 0, :] = 0
+    new_graph[0, 0, 0:3] = [new_num_i, new_num_v-new_num_o, new_num_o]
+    return new_graph
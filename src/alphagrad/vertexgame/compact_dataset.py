@@ -0,0 +1,43 @@
+import os
+import argparse
+
+from .utils import compact
+
+
+parser = argparse.ArgumentParser()
+
+parser.add_argument("files", type=str, nargs="+",
+                    help="Dataset files or directories with dataset files.")
+
+parser.add_argument("--out_dir", type=str,
+                    default=None, help="Directory of the compacted files. "
+                                        "Replaces the files if not given.")
+
+parser.add_argument("--chunksize", type=int,
+                    default=None, help="Number of samples per chunk.")
+
+parser.add_argument("--compression", type=str,
+                    default=None, help="Compression filter, i.e. gzip, lzf or lz4.")
+
+parser.add_argument("--resizable", action="store_true",
+                    help="Create resizable datasets that can be appended to.")
+
+args = parser.parse_args()
+
+
+fnames = []
+for path in args.files:
+    if os.path.isdir(path):
+        fnames.extend(sorted([os.path.join(path, f) for f in os.listdir(path) if f.endswith(".hdf5")]))
+    else:
+        fnames.append(path)
+
+for fname in fnames:
+    out_fname = None
+    if args.out_dir is not None:
+        os.makedirs(args.out_dir, exist_ok=True)
+        out_fname = os.path.join(args.out_dir, os.path.basename(fname))
+    size = os.path.getsize(fname)
+    out_fname = compact(fname, out_fname, chunksize=args.chunksize, 
+                        compression=args.compression, resizable=args.resizable)
+    print(f"{fname}: {size/2**20:.1f}MB -> {os.path.getsize(out_fname)/2**20:.1f}MB")
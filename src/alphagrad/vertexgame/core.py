@@ -281,6 +281,26 @@ ADD_SPARSITY_MAP = jnp.array([[-10,  7,  1,  7,  1,  5,  4,  1,  1,-10,-10,  1,
                               [  1,  1,  1,  1,  1,  1,  1,  1,  1, 11, 11,  1,  1,  1,  1,  1,  1,  1,  1,  1,  1, 11]]) #  11
 
 
+def _make_sparsity_fmas_table() -> Array:
+    # Fuses MUL_SPARSITY_MAP and CONTRACTION_MAP into a single table such that
+    # the fmas of an edge pair can be computed with a single gather and no cond.
+    # Entry [i, j, 0] is the resulting sparsity type, entries [i, j, 1:7] are
+    # the bitmask that selects the factors and entry [i, j, 7] is 0 for pairs
+    # that do not require any fmas.
+    factor_mask = jnp.moveaxis(CONTRACTION_MAP > 0, 0, -1)
+    has_fmas = jnp.sum(CONTRACTION_MAP, axis=0) > 0
+    # The product of two constant multiples of the Kronecker symbol is a single fma
+    factor_mask = factor_mask.at[10+OFFSET, 10+OFFSET].set(False)
+    has_fmas = has_fmas.at[10+OFFSET, 10+OFFSET].set(True)
+    return jnp.concatenate((MUL_SPARSITY_MAP[..., jnp.newaxis], 
+                            factor_mask, 
+                            has_fmas[..., jnp.newaxis]), axis=-1).astype(jnp.int32)
+
+
+NUM_FACTORS = CONTRACTION_MAP.shape[0]
+SPARSITY_FMAS_TABLE = _make_sparsity_fmas_table()
+
+
 Edge = Tuple[int, int]
 
 
@@ -330,26 +350,21 @@ def sparsity_where(in_edge, out_edge):
 @partial(jax.vmap, in_axes=(1, None))
 def sparsity_fmas_map(in_edge, out_edge):
     """
-    TODO add documentation here!
+    Computes the resulting sparsity type and the number of fmas for the 
+    multiplication of the Jacobians associated with an ingoing and an outgoing
+    edge. Both are looked up with a single gather from `SPARSITY_FMAS_TABLE`.
     """
     # Get the sparsity type of the ingoing and outgoing edge
     i = in_edge[0].astype(jnp.int32) + OFFSET
     j = out_edge[0].astype(jnp.int32) + OFFSET
 
-    new_sparsity_type = MUL_SPARSITY_MAP[i, j]                                                              
-    contraction_map = CONTRACTION_MAP[:, i, j]
+    entry = SPARSITY_FMAS_TABLE[i, j]
+    new_sparsity_type = entry[0]
 
     factors = jnp.concatenate((out_edge[1:3], jnp.abs(out_edge[3:]), in_edge[3:]))
-    masked_factors = lax.cond(jnp.sum(contraction_map) > 0,
-                                lambda a: jnp.where(contraction_map > 0, a, 1), # 1 enables factors, 0 disables factors
-                                lambda a: jnp.zeros_like(a, dtype=jnp.int32),
-                                factors)
-    # Here we deal with replicating dimensions
-    masked_factors = jnp.where(masked_factors >= 0, masked_factors, 1)
-    
-    fmas = jnp.prod(masked_factors)
-    fmas = lax.select(jnp.logical_and(jnp.abs(i) == 10+OFFSET, jnp.abs(j) == 10+OFFSET), 1, fmas)
-    # jax.debug.print("{out_edge} : {in_edge} : {nst} : {fmas}", out_edge=out_edge, in_edge=in_edge, nst=new_sparsity_type, fmas=fmas)
+    # Negative factors are replicating dimensions and do not contribute
+    mask = jnp.logical_and(entry[1:NUM_FACTORS+1] > 0, factors >= 0)
+    fmas = entry[NUM_FACTORS+1] * jnp.prod(jnp.where(mask, factors, 1))
     return new_sparsity_type, fmas
 
 
@@ -432,19 +447,7 @@ def vertex_eliminate(vertex: int, graph: Array) -> Tuple[Array, float]:
     return graph, fmas
 
 
-def cross_country(order: Sequence[int], edges: Array) -> Array:
-    """
-    Fully JIT-compilable function that implements cross-country elimination 
-    according to the given order.
-
-    Arguments:
-        edges (Array): Matrix that describes the connectivity of the 
-                        computational graph.
-
-    Returns:
-        A tuple that contains the new edge representation of the computational
-        graph and the number of fmas (fused multiplication-addition ops).
-    """
+def _cross_country(order: Sequence[int], edges: Array) -> Tuple[Tuple[Array, int], Array]:
     def cc_fn(carry, vertex):
         _edges, fmas = carry
         not_masked = jnp.logical_not(_edges.at[1, 0, vertex-1].get() > 0)
@@ -458,10 +461,72 @@ def cross_country(order: Sequence[int], edges: Array) -> Array:
         carry = (_edges, fmas)
         return carry, _fmas
     vertices = jnp.array(order)
-    output, _ = lax.scan(cc_fn, (edges, 0), vertices)
+    return lax.scan(cc_fn, (edges, 0), vertices)
+
+
+def cross_country(order: Sequence[int], edges: Array) -> Array:
+    """
+    Fully JIT-compilable function that implements cross-country elimination 
+    according to the given order.
+
+    Arguments:
+        edges (Array): Matrix that describes the connectivity of the 
+                        computational graph.
+
+    Returns:
+        A tuple that contains the new edge representation of the computational
+        graph and the number of fmas (fused multiplication-addition ops).
+    """
+    output, _ = _cross_country(order, edges)
     return output
 
 
+@partial(jax.jit, static_argnames=("chunk_size", "return_trace"))
+def cross_country_batch(orders: Array, 
+                        edges: Array, 
+                        chunk_size: int = 256, 
+                        return_trace: bool = False):
+    """
+    Fully JIT-compilable function that evaluates many elimination orders on
+    the same computational graph. The orders are split into chunks of size
+    `chunk_size` which are vectorized with `vmap` and evaluated one after
+    another to bound the memory consumption.
+
+    Arguments:
+        orders (Array): Matrix of shape (N, num_v) where every row is an 
+                        elimination order.
+        edges (Array): Matrix that describes the connectivity of the 
+                        computational graph.
+        chunk_size (int): Number of orders that are evaluated in parallel.
+        return_trace (bool): Whether to also return the fmas of every 
+                            elimination step.
+
+    Returns:
+        An array of shape (N,) that contains the number of fmas for every 
+        order. If `return_trace` is set, also returns an array of shape 
+        (N, num_v) with the fmas of the individual elimination steps.
+    """
+    orders = jnp.asarray(orders)
+    num_orders, order_len = orders.shape
+    chunk_size = min(chunk_size, num_orders)
+    num_chunks = -(-num_orders // chunk_size)
+    
+    # Pad with copies of the last order so that all chunks have the same size
+    padding = num_chunks*chunk_size - num_orders
+    orders = jnp.pad(orders, ((0, padding), (0, 0)), mode="edge")
+    orders = orders.reshape(num_chunks, chunk_size, order_len)
+    
+    def chunk_fn(_orders):
+        (_, fmas), trace = jax.vmap(_cross_country, in_axes=(0, None))(_orders, edges)
+        return fmas, trace
+    
+    fmas, trace = lax.map(chunk_fn, orders)
+    fmas = fmas.reshape(-1)[:num_orders]
+    if return_trace:
+        return fmas, trace.reshape(-1, order_len)[:num_orders]
+    return fmas
+
+
 def forward(edges: Array):
     """
     Fully JIT-compilable function that implements forward-mode AD by 
@@ -0,0 +1,230 @@
+"""
+Cost model that predicts the runtime of the Jacobian computed with an
+elimination order without compiling or executing it.
+
+The runtime is modelled as a linear function of features of the elimination
+that are computed with the same dynamics as `cross_country`:
+- the number of fmas,
+- the number of Jacobian products, i.e. pairs of ingoing and outgoing edges
+  of the eliminated vertices, which roughly corresponds to the number of
+  kernels,
+- the memory traffic, i.e. the number of Jacobian elements that are read and
+  written by the products. The number of stored elements of a Jacobian
+  follows from its shape and sparsity type, e.g. a diagonal Jacobian only
+  stores one of the two coupled dimensions and a Kronecker symbol none,
+- the number of dense, diagonal and Kronecker Jacobians of the final graph and
+  the number of elements of the final Jacobians.
+The weights of the features are calibrated by regression against a set of
+measured runtimes.
+"""
+from typing import Sequence
+
+import numpy as np
+
+import jax
+import jax.lax as lax
+import jax.numpy as jnp
+
+from chex import Array
+
+from .core import vertex_eliminate, get_shape, OFFSET
+
+
+# Dimensions (out_dim1, out_dim2, primal_dim1, primal_dim2) that are stored for
+# every sparsity type from -10 to 11. Of two dimensions that are coupled by a
+# diagonal only the first one is stored and dimensions that are coupled by a
+# Kronecker symbol are not stored at all.
+SIZE_MASK = jnp.array([[0, 0, 0, 0],  # -10
+                        [1, 0, 0, 0],  # -9
+                        [1, 0, 0, 0],  # -8
+                        [0, 0, 0, 0],  # -7
+                        [0, 0, 0, 0],  # -6
+                        [1, 0, 0, 1],  # -5
+                        [0, 1, 1, 0],  # -4
+                        [1, 0, 1, 0],  # -3
+                        [0, 1, 0, 1],  # -2
+                        [1, 1, 1, 1],  # -1
+                        [0, 0, 0, 0],  #  0
+                        [1, 1, 1, 1],  #  1
+                        [1, 1, 0, 1],  #  2
+                        [1, 1, 1, 0],  #  3
+                        [1, 1, 1, 0],  #  4
+                        [1, 1, 0, 1],  #  5
+                        [1, 1, 0, 0],  #  6
+                        [1, 1, 0, 0],  #  7
+                        [0, 1, 0, 0],  #  8
+                        [0, 1, 0, 0],  #  9
+                        [0, 0, 0, 0],  # 10
+                        [1, 1, 1, 1]]) # 11
+
+# Class of every sparsity type from -10 to 11:
+# 0 no edge, 1 dense, 2 diagonal and 3 Kronecker symbol
+SPARSITY_CLASS = jnp.array([3, 2, 2, 3, 3, 3, 3, 3, 3, 1, 0,
+                            1, 2, 2, 2, 2, 2, 2, 2, 2, 3, 1])
+
+FEATURE_NAMES = ("fmas", "jacobian products", "memory traffic", "final dense edges",
+                "final diagonal edges", "final kronecker edges", "final jacobian size", "bias")
+NUM_FEATURES = len(FEATURE_NAMES)
+
+
+def get_jacobian_sizes(edges: Array) -> Array:
+    """
+    Computes the number of stored elements of the Jacobians of all edges.
+
+    Arguments:
+        edges (Array): Edges of the computational graph without the header,
+                        i.e. `graph[:, 1:, :]`.
+
+    Returns:
+        An array with the number of elements of every edge which is 0 where
+        there is no edge.
+    """
+    types = edges[0]
+    mask = SIZE_MASK[types + OFFSET]
+    # Replicating dimensions are negative
+    dims = jnp.maximum(jnp.abs(jnp.moveaxis(edges[1:], 0, -1)), 1)
+    sizes = jnp.prod(jnp.where(mask > 0, dims, 1), axis=-1)
+    return jnp.where(types != 0, sizes, 0).astype(jnp.float32)
+
+
+def _eliminate_with_costs(vertex: int, graph: Array) -> Array:
+    num_i, _ = get_shape(graph)
+    edges = graph[:, 1:, :]
+    sizes = get_jacobian_sizes(edges)
+
+    in_mask = edges[0, :, vertex-1] != 0
+    out_mask = edges[0, num_i+vertex-1, :] != 0
+    num_in = jnp.sum(in_mask).astype(jnp.float32)
+    num_out = jnp.sum(out_mask).astype(jnp.float32)
+
+    # Every ingoing Jacobian is read once per outgoing Jacobian and vice versa
+    reads = jnp.sum(jnp.where(in_mask, sizes[:, vertex-1], 0.))*num_out
+    reads += jnp.sum(jnp.where(out_mask, sizes[num_i+vertex-1, :], 0.))*num_in
+
+    new_graph, fmas = vertex_eliminate(vertex, graph)
+    new_edges = new_graph[:, 1:, :]
+    changed = jnp.logical_and(jnp.any(new_edges != edges, axis=0), new_edges[0] != 0)
+    writes = jnp.sum(jnp.where(changed, get_jacobian_sizes(new_edges), 0.))
+
+    costs = jnp.array([fmas, num_in*num_out, reads+writes], dtype=jnp.float32)
+    return new_graph, costs
+
+
+def get_cost_features(order: Sequence[int], graph: Array) -> Array:
+    """
+    Fully JIT-compilable function that computes the cost features of an
+    elimination order. Vertices that are already eliminated are skipped
+    like in `cross_country`.
+
+    Arguments:
+        order (Sequence[int]): Elimination order of the vertices.
+        graph (Array): Dense computational graph representation.
+
+    Returns:
+        An array with the `NUM_FEATURES` features named in `FEATURE_NAMES`.
+    """
+    def elim_fn(carry, vertex):
+        _graph, costs = carry
+        not_masked = jnp.logical_not(_graph.at[1, 0, vertex-1].get() > 0)
+        _graph, _costs = lax.cond(not_masked,
+                                lambda g: _eliminate_with_costs(vertex, g),
+                                lambda g: (g, jnp.zeros(3, dtype=jnp.float32)),
+                                _graph)
+        return (_graph, costs + _costs), None
+
+    (final_graph, costs), _ = lax.scan(elim_fn, (graph, jnp.zeros(3, dtype=jnp.float32)),
+                                        jnp.asarray(order))
+    final_edges = final_graph[:, 1:, :]
+    classes = SPARSITY_CLASS[final_edges[0] + OFFSET]
+    num_edges = [jnp.sum(classes == c).astype(jnp.float32) for c in (1, 2, 3)]
+    final_size = jnp.sum(get_jacobian_sizes(final_edges))
+    return jnp.concatenate((costs, jnp.stack(num_edges),
+                            jnp.stack([final_size, jnp.float32(1.)])))
+
+
+@jax.jit
+def get_cost_features_batch(orders: Array, graph: Array) -> Array:
+    """
+    Computes the cost features of a batch of elimination orders of shape
+    (N, num_v).
+    """
+    return jax.vmap(get_cost_features, in_axes=(0, None))(orders, graph)
+
+
+class CostModel:
+    """
+    Linear model of the runtime in terms of the cost features. The features
+    are standardized before the weights are fitted with ridge regression.
+    `variance` is the variance of the residuals of the fit and serves as the
+    uncertainty of the predictions.
+
+    Example:
+        model = CostModel().fit(get_cost_features_batch(orders, graph), runtimes)
+        runtimes = model.predict(get_cost_features_batch(new_orders, graph))
+    """
+    weights: np.ndarray
+    mean: np.ndarray
+    scale: np.ndarray
+    variance: float
+
+    def __init__(self,
+                weights: Array = None,
+                mean: Array = None,
+                scale: Array = None,
+                variance: float = 0.) -> None:
+        self.weights = None if weights is None else np.asarray(weights, dtype=np.float64)
+        self.mean = np.zeros(NUM_FEATURES) if mean is None else np.asarray(mean, dtype=np.float64)
+        self.scale = np.ones(NUM_FEATURES) if scale is None else np.asarray(scale, dtype=np.float64)
+        self.variance = float(variance)
+
+    def _standardize(self, features: Array) -> np.ndarray:
+        return (np.asarray(features, dtype=np.float64) - self.mean) / self.scale
+
+    def fit(self, features: Array, runtimes: Array, l2: float = 1e-6) -> "CostModel":
+        """
+        Fits the weights to measured runtimes.
+
+        Arguments:
+            features (Array): Features of shape (N, NUM_FEATURES).
+            runtimes (Array): Measured runtimes of shape (N,).
+            l2 (float): Strength of the ridge regularization.
+
+        Returns:
+            The calibrated model itself.
+        """
+        features = np.asarray(features, dtype=np.float64)
+        runtimes = np.asarray(runtimes, dtype=np.float64)
+        self.mean = features.mean(axis=0)
+        self.scale = features.std(axis=0)
+        # Constant features, in particular the bias, are not standardized
+        constant = self.scale < 1e-12
+        self.mean[constant] = 0.
+        self.scale[constant] = 1.
+
+        # Features of the final graph are constant for a single graph, so the
+        # minimum-norm solution of the regularized least squares is used
+        X = self._standardize(features)
+        A = np.concatenate((X, np.sqrt(l2*len(X))*np.eye(NUM_FEATURES)), axis=0)
+        b = np.concatenate((runtimes, np.zeros(NUM_FEATURES)))
+        self.weights = np.linalg.lstsq(A, b, rcond=None)[0]
+        residuals = runtimes - X @ self.weights
+        self.variance = float(np.mean(residuals**2))
+        return self
+
+    def predict(self, features: Array) -> np.ndarray:
+        """
+        Predicts the runtimes for features of shape (..., NUM_FEATURES).
+        """
+        if self.weights is None:
+            raise ValueError("The cost model has to be calibrated with `fit` first!")
+        return self._standardize(features) @ self.weights
+
+    def save(self, fname: str) -> None:
+        np.savez(fname, weights=self.weights, mean=self.mean,
+                scale=self.scale, variance=self.variance)
+
+    @classmethod
+    def load(cls, fname: str) -> "CostModel":
+        with np.load(fname) as data:
+            return cls(data["weights"], data["mean"], data["scale"], float(data["variance"]))
+
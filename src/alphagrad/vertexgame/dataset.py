@@ -1,49 +1,332 @@
 import os
-from typing import Sequence, Tuple
-from torch.utils.data import Dataset
+import bisect
+from typing import Dict, Iterator, Sequence, Tuple
+
+import h5py
+import numpy as np
+
+from torch.utils.data import Dataset, IterableDataset, Sampler, get_worker_info
 
 from chex import Array
 
-from .utils import read, read_graph, read_file_size, densify
+from .utils import read_file_size, read_layout, densify
+from .bucketing import get_bucket, get_sparse_effective_shape, pad_to_bucket
 
 
 class GraphDataset(Dataset):
+    suffix: str = ".hdf5"
     files: Sequence[str]
     file_sizes: Sequence[int]
+    file_layouts: Sequence[bool]
+    offsets: Sequence[int]
     length: int
     include_code: bool
     shape: Sequence[int]
+    buckets: Sequence[Sequence[int]]
     
     def __init__(self, 
                 dir: str, 
                 include_code: bool = False, 
-                shape: Sequence[int] = [20, 105, 20]) -> None:
+                shape: Sequence[int] = [20, 105, 20],
+                buckets: Sequence[Sequence[int]] = None) -> None:
+        """
+        If `buckets` is given, every graph is padded to the smallest bucket
+        that fits it instead of the global `shape`. Use `BucketBatchSampler`
+        to create batches of graphs from the same bucket.
+        
+        The hdf5 files are opened lazily and kept open. Every process, e.g.
+        every `DataLoader` worker, opens its own handles after the fork.
+        """
         self.length = 0
         self.shape = shape
+        self.buckets = buckets
         self.include_code = include_code
-        self.files, self.file_sizes = [], []
-        for file in os.listdir(dir):
-            if file.endswith(".hdf5"):
+        self.files, self.file_sizes, self.file_layouts = [], [], []
+        for file in sorted(os.listdir(dir)):
+            if file.endswith(self.suffix):
                 path = os.path.join(dir, file)
                 self.files.append(path)
-                file_size = read_file_size(path)
+                file_size, columnar = self._read_info(path)
                 self.file_sizes.append(file_size)
+                self.file_layouts.append(columnar)
                 self.length += file_size
+        # Start index of every file, used to locate samples with a binary search
+        self.offsets = np.cumsum([0] + self.file_sizes).tolist()
+        self._handles = {}
+        self._pid = None
     
     def __len__(self) -> int:
         return self.length
     
+    def __getstate__(self):
+        # Open file handles cannot be pickled, e.g. for spawned workers
+        state = self.__dict__.copy()
+        state["_handles"] = {}
+        state["_pid"] = None
+        return state
+    
+    def _read_info(self, path: str) -> Tuple[int, bool]:
+        # Number of samples and layout of the edges of a file
+        return read_file_size(path), read_layout(path)
+    
+    def _open(self, file_idx: int) -> h5py.File:
+        return h5py.File(self.files[file_idx], "r")
+    
+    def _get_handle(self, file_idx: int) -> h5py.File:
+        # Handles that were inherited from the parent process are not reused
+        if self._pid != os.getpid():
+            self._handles = {}
+            self._pid = os.getpid()
+        if file_idx not in self._handles:
+            self._handles[file_idx] = self._open(file_idx)
+        return self._handles[file_idx]
+    
+    def close(self) -> None:
+        if self._pid == os.getpid():
+            for handle in self._handles.values():
+                handle.close()
+        self._handles = {}
+    
+    def _locate(self, idx: int) -> Tuple[int, int]:
+        if idx < 0 or idx >= self.length:
+            raise IndexError(f"Index {idx} out of range for dataset of size {self.length}!")
+        file_idx = bisect.bisect_right(self.offsets, idx) - 1
+        return file_idx, idx - self.offsets[file_idx]
+    
+    def _read(self, file_idx: int, idxs, include_code: bool = False) -> Tuple[Array, Array, Array]:
+        file = self._get_handle(file_idx)
+        codes = file["data/code"][idxs] if include_code else None
+        headers = file["data/graph_header"][idxs]
+        graphs = file["data/graph"][idxs]
+        return codes, headers, graphs
+    
     def __getitem__(self, idx: int) -> Tuple[Array, Array]:
-        file_idx = [fs for i, fs in enumerate(self.file_sizes) if sum(self.file_sizes[:i+1]) <= idx]
-        file = self.files[len(file_idx)]
-        _idx = idx - sum(file_idx)
+        file_idx, _idx = self._locate(idx)
+        columnar = self.file_layouts[file_idx]
         
+        code, header, sparse_graph = self._read(file_idx, _idx, self.include_code)
+        graph = self._densify(header, sparse_graph, columnar)
         if self.include_code:
-            code, header, sparse_graph = read(file, _idx)
-            graph = densify(header, sparse_graph, shape=self.shape)
             return code, graph
         else:
-            header, sparse_graph = read_graph(file, _idx)
-            graph = densify(header, sparse_graph, shape=self.shape)
             return graph
+    
+    def __getitems__(self, idxs: Sequence[int]) -> Sequence[Tuple[Array, Array]]:
+        """
+        Batched version of `__getitem__` that is used by the `DataLoader`.
+        Runs of consecutive indices within the same file are read with a 
+        single slice.
+        """
+        samples = [None]*len(idxs)
+        order = sorted(range(len(idxs)), key=lambda n: idxs[n])
+        
+        start = 0
+        while start < len(order):
+            file_idx, first = self._locate(idxs[order[start]])
+            # Extend the run as long as the indices are consecutive
+            stop = start + 1
+            while stop < len(order) and idxs[order[stop]] - idxs[order[start]] == stop - start \
+                and idxs[order[stop]] < self.offsets[file_idx+1]:
+                stop += 1
+                
+            codes, headers, sparse_graphs = self._read(file_idx, slice(first, first+stop-start), 
+                                                        self.include_code)
+            columnar = self.file_layouts[file_idx]
+            for n in range(stop - start):
+                graph = self._densify(headers[n], sparse_graphs[n], columnar)
+                samples[order[start+n]] = (codes[n], graph) if self.include_code else graph
+            start = stop
+        return samples
+
+    def _densify(self, header: Array, sparse_graph: Array, columnar: bool = False) -> Array:
+        graph = densify(header, sparse_graph, shape=self.shape, columnar=columnar)
+        if self.buckets is not None:
+            graph = pad_to_bucket(graph, self.buckets)
+        return graph
+
+    def get_bucket_indices(self) -> Dict[Tuple[int, int, int], Sequence[int]]:
+        """
+        Groups the indices of all graphs by bucket. The shapes are computed
+        from the headers and edge indices, so no graph is densified.
+        """
+        assert self.buckets is not None, "Dataset has no buckets!"
+        bucket_indices = {}
+        offset = 0
+        for file_idx, (file_size, columnar) in enumerate(zip(self.file_sizes, self.file_layouts)):
+            _, headers, sparse_graphs = self._read(file_idx, slice(0, file_size))
+            for i, (header, sparse_graph) in enumerate(zip(headers, sparse_graphs)):
+                shape = get_sparse_effective_shape(header, sparse_graph, columnar)
+                bucket = get_bucket(shape, self.buckets)
+                bucket_indices.setdefault(bucket, []).append(offset+i)
+            offset += file_size
+        return bucket_indices
+
+
+class BucketBatchSampler(Sampler):
+    """
+    Batch sampler that only combines graphs from the same bucket such that all
+    graphs of a batch have the same padded shape. The batches of the different
+    buckets are shuffled together.
+    """
+    bucket_indices: Dict[Tuple[int, int, int], Sequence[int]]
+    batchsize: int
+    shuffle: bool
+    drop_last: bool
+    rng: np.random.Generator
+
+    def __init__(self,
+                dataset: GraphDataset,
+                batchsize: int,
+                shuffle: bool = True,
+                drop_last: bool = False,
+                seed: int = 0) -> None:
+        self.bucket_indices = dataset.get_bucket_indices()
+        self.batchsize = batchsize
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.rng = np.random.default_rng(seed)
+
+    def _make_batches(self) -> Sequence[Sequence[int]]:
+        batches = []
+        for indices in self.bucket_indices.values():
+            indices = np.array(indices)
+            if self.shuffle:
+                indices = self.rng.permutation(indices)
+            for i in range(0, len(indices), self.batchsize):
+                batch = indices[i:i+self.batchsize].tolist()
+                if len(batch) == self.batchsize or not self.drop_last:
+                    batches.append(batch)
+        if self.shuffle:
+            batches = [batches[i] for i in self.rng.permutation(len(batches))]
+        return batches
+
+    def __iter__(self) -> Iterator[Sequence[int]]:
+        return iter(self._make_batches())
+
+    def __len__(self) -> int:
+        num_batches = 0
+        for indices in self.bucket_indices.values():
+            if self.drop_last:
+                num_batches += len(indices) // self.batchsize
+            else:
+                num_batches += -(-len(indices) // self.batchsize)
+        return num_batches
+
+
+class GraphStream(IterableDataset):
+    """
+    Iterable version of a `GraphDataset` that reads the files in large
+    sequential blocks instead of random single samples. The blocks of all
+    files are shuffled and distributed across the `DataLoader` workers, and
+    the samples are shuffled with a bounded in-memory buffer. Samples are
+    kept in sparse form while they are in the buffer.
+
+    If `batchsize` is given, the stream yields batches as numpy arrays
+    instead of single samples. If the dataset has buckets, every batch only
+    contains graphs of the same bucket. Disable the automatic batching of the
+    `DataLoader` in that case, e.g.
+        DataLoader(stream, batch_size=None, num_workers=4, collate_fn=jnp.asarray)
+    """
+    dataset: GraphDataset
+    blocksize: int
+    buffer_size: int
+    batchsize: int
+    shuffle: bool
+    drop_last: bool
+    seed: int
+    epoch: int
+
+    def __init__(self,
+                dataset: GraphDataset,
+                blocksize: int = 1024,
+                buffer_size: int = 8192,
+                batchsize: int = None,
+                shuffle: bool = True,
+                drop_last: bool = False,
+                seed: int = 0) -> None:
+        self.dataset = dataset
+        self.blocksize = blocksize
+        self.buffer_size = buffer_size
+        self.batchsize = batchsize
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch: int) -> None:
+        """
+        Sets the epoch which changes the shuffling of the next iteration.
+        """
+        self.epoch = epoch
+
+    def _get_blocks(self) -> Sequence[Tuple[int, int, int]]:
+        blocks = [(file_idx, start, min(start+self.blocksize, file_size))
+                    for file_idx, file_size in enumerate(self.dataset.file_sizes)
+                    for start in range(0, file_size, self.blocksize)]
+        if self.shuffle:
+            rng = np.random.default_rng((self.seed, self.epoch))
+            blocks = [blocks[i] for i in rng.permutation(len(blocks))]
+
+        worker_info = get_worker_info()
+        if worker_info is not None:
+            blocks = blocks[worker_info.id::worker_info.num_workers]
+        return blocks
+
+    def _iter_sparse(self) -> Iterator[Tuple]:
+        include_code = self.dataset.include_code
+        for file_idx, start, stop in self._get_blocks():
+            codes, headers, graphs = self.dataset._read(file_idx, slice(start, stop), include_code)
+            columnar = self.dataset.file_layouts[file_idx]
+            for n in range(stop - start):
+                code = codes[n] if include_code else None
+                yield code, headers[n], graphs[n], columnar
+
+    def _iter_shuffled(self) -> Iterator[Tuple]:
+        if not self.shuffle:
+            yield from self._iter_sparse()
+            return
+
+        worker_info = get_worker_info()
+        worker_id = 0 if worker_info is None else worker_info.id
+        rng = np.random.default_rng((self.seed, self.epoch, worker_id))
+        buffer = []
+        for sample in self._iter_sparse():
+            if len(buffer) < self.buffer_size:
+                buffer.append(sample)
+                continue
+            idx = rng.integers(len(buffer))
+            yield buffer[idx]
+            buffer[idx] = sample
+        for idx in rng.permutation(len(buffer)):
+            yield buffer[idx]
+
+    def _iter_samples(self) -> Iterator:
+        for code, header, graph, columnar in self._iter_shuffled():
+            graph = self.dataset._densify(header, graph, columnar)
+            yield (code, graph) if self.dataset.include_code else graph
+
+    def _make_batch(self, samples: Sequence) -> Tuple:
+        if self.dataset.include_code:
+            codes, graphs = zip(*samples)
+            return list(codes), np.stack(graphs)
+        return np.stack(samples)
+
+    def __iter__(self) -> Iterator:
+        if self.batchsize is None:
+            yield from self._iter_samples()
+            return
+
+        # Graphs are grouped by their padded shape, i.e. their bucket
+        pending = {}
+        for sample in self._iter_samples():
+            graph = sample[1] if self.dataset.include_code else sample
+            samples = pending.setdefault(graph.shape, [])
+            samples.append(sample)
+            if len(samples) == self.batchsize:
+                yield self._make_batch(samples)
+                pending[graph.shape] = []
+        if not self.drop_last:
+            for samples in pending.values():
+                if len(samples) > 0:
+                    yield self._make_batch(samples)
 
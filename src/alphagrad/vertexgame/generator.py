@@ -33,6 +33,13 @@ parser.add_argument("--sampling_shape", type=int, nargs="+",
 parser.add_argument("--scalar", type=int,
                     default=0, help="Sample scalar or vector/matrix functions.")
 
+parser.add_argument("--num_workers", type=int,
+                    default=1, help="Number of sampling processes.")
+
+parser.add_argument("--resume", type=str,
+                    default=None, help="Existing file whose generation is resumed. "
+                                        "Requires the same seed and batchsize.")
+
 args = parser.parse_args()
 
 
@@ -48,17 +55,22 @@ gen = Graph2File(sampler,
                 fname_prefix=args.prefix,
                 num_samples=args.num_samples, 
                 batchsize=args.batchsize,
-                storage_shape=args.storage_shape)
-
-
-if args.scalar == 0:
-    gen.generate(key=key, 
-                sampling_shape=args.sampling_shape,
-                primal_p=jnp.array([.4, .6, .4]), 
-                primitive_p=jnp.array([.2, .55, .15, .1, .0])) # [.1, .49 .05 .05 .31]
-else:
-    gen.generate(key=key,
-                sampling_shape=args.sampling_shape,
-                primal_p=jnp.array([1., 0., 0.]), 
-                primitive_p=jnp.array([.2, .8, 0., 0., 0.]))
+                storage_shape=args.storage_shape,
+                num_workers=args.num_workers)
+
+
+# The guard is required since worker processes are spawned
+if __name__ == "__main__":
+    if args.scalar == 0:
+        gen.generate(key=key, 
+                    fname=args.resume,
+                    sampling_shape=args.sampling_shape,
+                    primal_p=jnp.array([.4, .6, .4]), 
+                    primitive_p=jnp.array([.2, .55, .15, .1, .0])) # [.1, .49 .05 .05 .31]
+    else:
+        gen.generate(key=key,
+                    fname=args.resume,
+                    sampling_shape=args.sampling_shape,
+                    primal_p=jnp.array([1., 0., 0.]), 
+                    primitive_p=jnp.array([.2, .8, 0., 0., 0.]))
 
@@ -1 +1,3 @@
-from .from_jaxpr import make_graph
\ No newline at end of file
+from .from_jaxpr import make_graph
+from .graph_cache import (GraphCache, DEFAULT_MAX_SIZE, cached_make_graph, 
+                        get_default_cache, get_jaxpr_key, get_graph_key)
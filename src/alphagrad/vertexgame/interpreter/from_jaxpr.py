@@ -1,11 +1,14 @@
 from typing import Callable, Sequence, Union
 
+import numpy as np
+
 import jax
+import jax.numpy as jnp
 from jax._src.core import ClosedJaxpr, JaxprEqn, Literal
 
 from chex import Array
 
-from ..core import make_empty_edges, get_shape
+from ..core import get_shape
 from .utils import add_slice
 from .prim_mapper import vertex_registry
     
@@ -53,6 +56,9 @@ def unroll_pjit(eqn: JaxprEqn) -> Sequence[JaxprEqn]:
 def make_graph(f_jaxpr: Union[ClosedJaxpr, Callable], *xs: Array) -> Array:
     """
     Function that creates a computational graph from a JAX input function or a jaxpr.
+    The graph is built in a host-side numpy buffer that is updated in-place
+    by the functions of the `vertex_registry` and transferred to the device
+    only once at the end.
     """
     jaxpr = jax.make_jaxpr(f_jaxpr)(*xs) if isinstance(f_jaxpr, Callable) else f_jaxpr
             
@@ -61,10 +67,8 @@ def make_graph(f_jaxpr: Union[ClosedJaxpr, Callable], *xs: Array) -> Array:
     eqns = jaxpr.eqns # filter_eqns(jaxpr.eqns)
     num_v = len(eqns)
        
-    edges = make_empty_edges([num_i, num_v, num_o])
-    edges = edges.at[0, 0, 0].set(num_i)
-    edges = edges.at[0, 0, 1].set(num_v-num_o)
-    edges = edges.at[0, 0, 2].set(num_o)
+    edges = np.zeros((5, num_i+num_v+1, num_v), dtype=np.int32)
+    edges[0, 0, 0:3] = [num_i, num_v-num_o, num_o]
         
     is_invar_list = []
     
@@ -106,8 +110,8 @@ def make_graph(f_jaxpr: Union[ClosedJaxpr, Callable], *xs: Array) -> Array:
             # edge
             edges = add_slice(edges, outvar, idx, num_i, num_vo)
         else:
-            edges = edges.at[1, 0, idx-num_i-1].set(1)
-            edges = edges.at[2, 0, idx-num_i-1].set(1)
+            edges[1, 0, idx-num_i-1] = 1
+            edges[2, 0, idx-num_i-1] = 1
 
-    return edges
+    return jnp.asarray(edges)
 
@@ -0,0 +1,187 @@
+"""
+Content-addressed on-disk cache for computational graphs and their baseline
+scores. Graphs are keyed by a hash of the jaxpr, i.e. the equations and the
+abstract values of the inputs, and baseline scores are keyed by a hash of the
+graph itself. Both keys also contain a fingerprint of the interpreter, the
+elimination code and the transforms and search code that compute the baseline
+orders so that entries become stale whenever that code changes.
+The size of the cache is bounded and the least recently used entries are
+evicted first.
+
+The cache is opt-in and enabled by setting the `ALPHAGRAD_GRAPH_CACHE`
+environment variable to the cache directory.
+"""
+import os
+import hashlib
+import tempfile
+from typing import Callable, Dict, List, Optional, Union
+
+import numpy as np
+
+import jax
+from jax._src.core import ClosedJaxpr
+
+from chex import Array
+
+from .from_jaxpr import make_graph
+
+
+DEFAULT_MAX_SIZE = 1 << 30 # 1 GiB
+
+_fingerprint = None
+
+
+def _get_source_files() -> List[str]:
+    # Source files that determine the content of the cache entries, i.e. the
+    # interpreter for the graphs and the elimination and Markowitz code for 
+    # the baseline orders and scores
+    this_dir = os.path.dirname(__file__)
+    vertexgame_dir = os.path.dirname(this_dir)
+    transforms_dir = os.path.join(vertexgame_dir, "transforms")
+    files = [os.path.join(this_dir, name) for name in sorted(os.listdir(this_dir))
+            if name.endswith(".py") and name != os.path.basename(__file__)]
+    files += [os.path.join(transforms_dir, name) for name in sorted(os.listdir(transforms_dir))
+            if name.endswith(".py")]
+    files += [os.path.join(vertexgame_dir, name) for name in ("core.py", "vertex_game.py", "search.py")]
+    return files
+
+
+def _get_fingerprint() -> str:
+    # Hash of the source files that determine the content of the cache entries
+    global _fingerprint
+    if _fingerprint is None:
+        sha = hashlib.sha256()
+        for file in _get_source_files():
+            with open(file, "rb") as f:
+                sha.update(f.read())
+        sha.update(jax.__version__.encode())
+        _fingerprint = sha.hexdigest()
+    return _fingerprint
+
+
+def get_jaxpr_key(jaxpr: ClosedJaxpr) -> str:
+    """
+    Computes a canonical hash of a jaxpr and its input avals.
+    """
+    avals = ",".join([str(invar.aval) for invar in jaxpr.jaxpr.invars])
+    sha = hashlib.sha256()
+    sha.update(_get_fingerprint().encode())
+    sha.update(avals.encode())
+    sha.update(str(jaxpr).encode())
+    return "graph-" + sha.hexdigest()
+
+
+def get_graph_key(graph: Array) -> str:
+    """
+    Computes a hash of the content of a computational graph.
+    """
+    graph = np.ascontiguousarray(np.asarray(graph, dtype=np.int32))
+    sha = hashlib.sha256()
+    sha.update(_get_fingerprint().encode())
+    sha.update(str(graph.shape).encode())
+    sha.update(graph.tobytes())
+    return "scores-" + sha.hexdigest()
+
+
+class GraphCache:
+    """
+    Directory of `.npz` files with size-bounded LRU eviction. Reading an entry
+    updates its modification time which is used as the time of last access.
+    """
+    path: str
+    max_size: int
+
+    def __init__(self, path: str, max_size: int = DEFAULT_MAX_SIZE) -> None:
+        self.path = path
+        self.max_size = max_size
+        os.makedirs(path, exist_ok=True)
+
+    def _get_fname(self, key: str) -> str:
+        return os.path.join(self.path, key + ".npz")
+
+    def load(self, key: str) -> Optional[Dict[str, np.ndarray]]:
+        fname = self._get_fname(key)
+        try:
+            with np.load(fname) as data:
+                entry = {name: data[name] for name in data.files}
+            os.utime(fname)
+            return entry
+        except (FileNotFoundError, OSError, ValueError):
+            # Missing or corrupted entries are treated as cache misses
+            return None
+
+    def store(self, key: str, **arrays: Array) -> None:
+        # Write to a temporary file first so that readers never see partial entries
+        fd, tmp_fname = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **{name: np.asarray(a) for name, a in arrays.items()})
+        os.replace(tmp_fname, self._get_fname(key))
+        self.evict()
+
+    def size(self) -> int:
+        return sum(os.path.getsize(os.path.join(self.path, f))
+                    for f in os.listdir(self.path) if f.endswith(".npz"))
+
+    def evict(self) -> None:
+        """
+        Removes the least recently used entries until the cache fits into
+        `max_size` bytes.
+        """
+        entries = []
+        for fname in os.listdir(self.path):
+            if fname.endswith(".npz"):
+                stat = os.stat(os.path.join(self.path, fname))
+                entries.append((stat.st_mtime, stat.st_size, fname))
+        size = sum(e[1] for e in entries)
+        for _, fsize, fname in sorted(entries):
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(os.path.join(self.path, fname))
+            except FileNotFoundError:
+                pass
+            size -= fsize
+
+
+def get_default_cache() -> Optional[GraphCache]:
+    """
+    Returns the cache in the directory given by `ALPHAGRAD_GRAPH_CACHE` or None
+    if the cache is disabled. The maximum size in bytes can be set with
+    `ALPHAGRAD_GRAPH_CACHE_SIZE`.
+    """
+    path = os.environ.get("ALPHAGRAD_GRAPH_CACHE")
+    if not path:
+        return None
+    max_size = int(os.environ.get("ALPHAGRAD_GRAPH_CACHE_SIZE", DEFAULT_MAX_SIZE))
+    return GraphCache(path, max_size)
+
+
+def cached_make_graph(f_jaxpr: Union[ClosedJaxpr, Callable],
+                        *xs: Array,
+                        cache: GraphCache = None) -> Array:
+    """
+    Same as `make_graph` but looks up the graph in the cache first. Only the
+    jaxpr has to be traced on a cache hit.
+
+    Arguments:
+        f_jaxpr (Union[ClosedJaxpr, Callable]): Function or jaxpr.
+        xs (Array): Example inputs of the function.
+        cache (GraphCache): Cache to use. Defaults to `get_default_cache()`.
+
+    Returns:
+        The computational graph representation.
+    """
+    cache = get_default_cache() if cache is None else cache
+    jaxpr = jax.make_jaxpr(f_jaxpr)(*xs) if isinstance(f_jaxpr, Callable) else f_jaxpr
+    if cache is None:
+        return make_graph(jaxpr)
+
+    key = get_jaxpr_key(jaxpr)
+    entry = cache.load(key)
+    if entry is not None:
+        return jax.numpy.asarray(entry["graph"])
+
+    graph = make_graph(jaxpr)
+    cache.store(key, graph=graph)
+    return graph
+
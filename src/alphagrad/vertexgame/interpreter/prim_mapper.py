@@ -1,7 +1,8 @@
+import numpy as np
+
 import jax
 import jax.nn as jnn
 import jax.lax as lax
-import jax.numpy as jnp
 
 from jax._src.core import Var
 
@@ -16,11 +17,11 @@ def get_shape(var: Var):
     Row- and column vectors are treated as tensors with shape (1, n) and (n, 1)
     Matrices are treated as tensors of shape (n, m)
     """
-    var_shape = jnp.array(var.aval.shape)
+    var_shape = np.array(var.aval.shape)
     if var.aval.size == 1:
-        var_shape = jnp.array([1, 1])
+        var_shape = np.array([1, 1])
     if len(var.aval.shape) == 1:
-        var_shape = jnp.array([var.aval.shape[0], 1])
+        var_shape = np.array([var.aval.shape[0], 1])
     return var_shape
 
 
@@ -31,11 +32,11 @@ def _get_shape(var: Var):
     Row- and column vectors are treated as tensors with shape (1, n) and (n, 1)
     Matrices are treated as tensors of shape (n, m)
     """
-    var_shape = jnp.array(var.aval.shape)
+    var_shape = np.array(var.aval.shape)
     if var.aval.size == 1:
-        var_shape = jnp.array([0, 0])
+        var_shape = np.array([0, 0])
     if len(var.aval.shape) == 1:
-        var_shape = jnp.array([var.aval.shape[0], 0])
+        var_shape = np.array([var.aval.shape[0], 0])
     return var_shape
 
 
@@ -71,12 +72,12 @@ def add_mono_vertex(edges, eqn, variables, **params):
     else:
         sparsity_type = 6
         
-    num_i = edges.at[0, 0, 0].get()
+    num_i = edges[0, 0, 0]
     i = variables[str(eqn.invars[0])]
     j = variables[str(eqn.outvars[0])] - num_i - 1
 
-    structure = jnp.concatenate([jnp.array([sparsity_type]), _invar_shape, _outvar_shape]) 
-    edges = edges.at[:, i, j].set(structure)
+    structure = np.concatenate([np.array([sparsity_type]), _invar_shape, _outvar_shape]) 
+    edges[:, i, j] = structure
     return edges
 
 vertex_registry[lax.neg_p] = add_mono_vertex
@@ -185,7 +186,7 @@ def add_bi_vertex(edges, eqn, variables, **params):
             else:
                 sparsity_type = 6
             
-        num_i = edges.at[0, 0, 0].get()
+        num_i = edges[0, 0, 0]
         i = variables[str(invar)]
         j = variables[str(eqn.outvars[0])] - num_i - 1
         
@@ -193,9 +194,9 @@ def add_bi_vertex(edges, eqn, variables, **params):
         other_invar_shape = get_shape(eqn.invars[1-idx])
         outvar_shape = get_shape(eqn.outvars[0])
 
-        structure = jnp.concatenate([jnp.array([sparsity_type]), outvar_shape, invar_shape]) 
+        structure = np.concatenate([np.array([sparsity_type]), outvar_shape, invar_shape]) 
         # print("structure", structure)
-        edges = edges.at[:, i, j].set(structure)
+        edges[:, i, j] = structure
     return edges
 
 vertex_registry[lax.add_p] = add_bi_vertex
@@ -282,7 +283,7 @@ def add_dot_general_vertex(edges, eqn, variables, **params):
                 rhs_sparsity_type = -5
             
     # Treat Literals and Vars appropriately
-    num_i = edges.at[0, 0, 0].get()
+    num_i = edges[0, 0, 0]
     j = variables[str(eqn.outvars[0])] - num_i - 1
     
     lhs_invar_shape = get_shape(eqn.invars[0])
@@ -292,25 +293,25 @@ def add_dot_general_vertex(edges, eqn, variables, **params):
     # Only first variable is a Var
     if isinstance(eqn.invars[0], Var) and not isinstance(eqn.invars[1], Var):
         il = variables[str(eqn.invars[0])]
-        lhs_structure = jnp.concatenate([jnp.array([lhs_sparsity_type]), outvar_shape, lhs_invar_shape]) 
-        edges = edges.at[:, il, j].set(lhs_structure)
+        lhs_structure = np.concatenate([np.array([lhs_sparsity_type]), outvar_shape, lhs_invar_shape]) 
+        edges[:, il, j] = lhs_structure
         
     # Only second variable is a Var
     elif not isinstance(eqn.invars[0], Var) and isinstance(eqn.invars[1], Var):
         ir = variables[str(eqn.invars[1])]
-        rhs_structure = jnp.concatenate([jnp.array([rhs_sparsity_type]), outvar_shape, rhs_invar_shape]) 
-        edges = edges.at[:, ir, j].set(rhs_structure)
+        rhs_structure = np.concatenate([np.array([rhs_sparsity_type]), outvar_shape, rhs_invar_shape]) 
+        edges[:, ir, j] = rhs_structure
         
     # Both variables are of type `Var`
     else:
         il = variables[str(eqn.invars[0])]
         ir = variables[str(eqn.invars[1])]
         
-        lhs_structure = jnp.concatenate([jnp.array([lhs_sparsity_type]), outvar_shape, lhs_invar_shape]) 
-        edges = edges.at[:, il, j].set(lhs_structure)
+        lhs_structure = np.concatenate([np.array([lhs_sparsity_type]), outvar_shape, lhs_invar_shape]) 
+        edges[:, il, j] = lhs_structure
         
-        rhs_structure = jnp.concatenate([jnp.array([rhs_sparsity_type]), outvar_shape, rhs_invar_shape]) 
-        edges = edges.at[:, ir, j].set(rhs_structure)
+        rhs_structure = np.concatenate([np.array([rhs_sparsity_type]), outvar_shape, rhs_invar_shape]) 
+        edges[:, ir, j] = rhs_structure
     # print("dot", eqn.outvars, eqn.invars, lhs_structure, rhs_structure, dims)
     return edges
     
@@ -349,12 +350,12 @@ def add_sum_vertex(edges, eqn, variables, **params):
         elif outvar_shape[0] == 1 and outvar_shape[1] > 0:
             sparsity_type = -3
     
-    num_i = edges.at[0, 0, 0].get()
+    num_i = edges[0, 0, 0]
     i = variables[str(filtered_invars[0])]
     j = variables[str(eqn.outvars[0])] - num_i - 1
 
-    structure = jnp.concatenate([jnp.array([sparsity_type]), _outvar_shape, _invar_shape]) 
-    edges = edges.at[:, i, j].set(structure)
+    structure = np.concatenate([np.array([sparsity_type]), _outvar_shape, _invar_shape]) 
+    edges[:, i, j] = structure
     return edges
 
 vertex_registry[lax.reduce_sum_p] = add_sum_vertex
@@ -372,12 +373,12 @@ def add_prod_vertex(edges, eqn, variables, **params):
     # Input is singleton or row/column vector or matrix
     sparsity_type = 1
         
-    num_i = edges.at[0, 0, 0].get()
+    num_i = edges[0, 0, 0]
     i = variables[str(filtered_invars[0])]
     j = variables[str(eqn.outvars[0])] - num_i - 1
 
-    structure = jnp.concatenate([jnp.array([sparsity_type]), _outvar_shape, _invar_shape]) 
-    edges = edges.at[:, i, j].set(structure)
+    structure = np.concatenate([np.array([sparsity_type]), _outvar_shape, _invar_shape]) 
+    edges[:, i, j] = structure
     return edges
 
 
@@ -409,12 +410,12 @@ def add_reduce_vertex(edges, eqn, variables, **params):
         elif outvar_shape[0] == 1 and outvar_shape[1] > 1:
             sparsity_type = 3
     
-    num_i = edges.at[0, 0, 0].get()
+    num_i = edges[0, 0, 0]
     i = variables[str(filtered_invars[0])]
     j = variables[str(eqn.outvars[0])] - num_i - 1
 
-    structure = jnp.concatenate([jnp.array([sparsity_type]), _outvar_shape, _invar_shape]) 
-    edges = edges.at[:, i, j].set(structure)
+    structure = np.concatenate([np.array([sparsity_type]), _outvar_shape, _invar_shape]) 
+    edges[:, i, j] = structure
     return edges
 
 vertex_registry[lax.reduce_max_p] = add_reduce_vertex
@@ -445,12 +446,12 @@ def add_transpose_vertex(edges, eqn, variables, **params):
     else:
         sparsity_type = -7
             
-    num_i = edges.at[0, 0, 0].get()
+    num_i = edges[0, 0, 0]
     i = variables[str(filtered_invars[0])]
     j = variables[str(eqn.outvars[0])] - num_i - 1
 
-    structure = jnp.concatenate([jnp.array([sparsity_type]), _outvar_shape, _invar_shape]) 
-    edges = edges.at[:, i, j].set(structure)
+    structure = np.concatenate([np.array([sparsity_type]), _outvar_shape, _invar_shape]) 
+    edges[:, i, j] = structure
     return edges
 
 vertex_registry[lax.transpose_p] = add_transpose_vertex
@@ -462,12 +463,12 @@ def add_stop_gradient_vertex(edges, eqn, variables, **params):
     """
     filtered_invars = filter_invars(eqn, variables)
                     
-    num_i = edges.at[0, 0, 0].get()
+    num_i = edges[0, 0, 0]
     i = variables[str(filtered_invars[0])]
     j = variables[str(eqn.outvars[0])] - num_i - 1
 
-    structure = jnp.zeros(5, dtype=jnp.int32)
-    edges = edges.at[:, i, j].set(structure)
+    structure = np.zeros(5, dtype=np.int32)
+    edges[:, i, j] = structure
     return edges
 
 vertex_registry[lax.stop_gradient_p] = add_stop_gradient_vertex
@@ -493,12 +494,12 @@ def add_broadcast_vertex(edges, eqn, variables, **params):
     else:
         sparsity_type = -7
                     
-    num_i = edges.at[0, 0, 0].get()
+    num_i = edges[0, 0, 0]
     i = variables[str(filtered_invars[0])]
     j = variables[str(eqn.outvars[0])] - num_i - 1
 
-    structure = jnp.concatenate([jnp.array([sparsity_type]), _outvar_shape, _invar_shape]) 
-    edges = edges.at[:, i, j].set(structure)
+    structure = np.concatenate([np.array([sparsity_type]), _outvar_shape, _invar_shape]) 
+    edges[:, i, j] = structure
     return edges
 
 vertex_registry[lax.broadcast_in_dim_p] = add_broadcast_vertex
@@ -524,12 +525,12 @@ def add_squeeze_vertex(edges, eqn, variables, **params):
     else:
         sparsity_type = -7
                     
-    num_i = edges.at[0, 0, 0].get()
+    num_i = edges[0, 0, 0]
     i = variables[str(filtered_invars[0])]
     j = variables[str(eqn.outvars[0])] - num_i - 1
 
-    structure = jnp.concatenate([jnp.array([sparsity_type]), _outvar_shape, _invar_shape]) 
-    edges = edges.at[:, i, j].set(structure)
+    structure = np.concatenate([np.array([sparsity_type]), _outvar_shape, _invar_shape]) 
+    edges[:, i, j] = structure
     return edges
 
 vertex_registry[lax.squeeze_p] = add_squeeze_vertex
@@ -551,13 +552,13 @@ def add_reshape_gradient_vertex(edges, eqn, variables, **params):
     
     sparsity_type = 11
                     
-    num_i = edges.at[0, 0, 0].get()
+    num_i = edges[0, 0, 0]
     i = variables[str(filtered_invars[0])]
     j = variables[str(eqn.outvars[0])] - num_i - 1
 
-    structure = jnp.concatenate([jnp.array([sparsity_type]), _outvar_shape, _invar_shape]) 
+    structure = np.concatenate([np.array([sparsity_type]), _outvar_shape, _invar_shape]) 
 
-    edges = edges.at[:, i, j].set(structure)
+    edges[:, i, j] = structure
     return edges
 
 vertex_registry[lax.reshape_p] = add_reshape_gradient_vertex
@@ -587,12 +588,12 @@ def add_copy_gradient_vertex(edges, eqn, variables, **params):
     
     sparsity_type = -1
                     
-    num_i = edges.at[0, 0, 0].get()
+    num_i = edges[0, 0, 0]
     i = variables[str(filtered_invars[0])]
     j = variables[str(eqn.outvars[0])] - num_i - 1
 
-    structure = jnp.concatenate([jnp.array([sparsity_type]), _outvar_shape, _invar_shape]) 
-    edges = edges.at[:, i, j].set(structure)
+    structure = np.concatenate([np.array([sparsity_type]), _outvar_shape, _invar_shape]) 
+    edges[:, i, j] = structure
     return edges
 
 vertex_registry[lax.convert_element_type_p] = add_copy_gradient_vertex
@@ -614,12 +615,12 @@ def add_concatenate_vertex(edges, eqn, variables, **params):
         _invar_shape = get_shape(filtered_invars[0])
 
         sparsity_type = 11  # TODO this is the important bit!
-        num_i = edges.at[0, 0, 0].get()
+        num_i = edges[0, 0, 0]
         i = variables[str(invar)]
         j = variables[str(eqn.outvars[0])] - num_i - 1
 
-        structure = jnp.concatenate([jnp.array([sparsity_type]), _outvar_shape, _invar_shape])
-        edges = edges.at[:, i, j].set(structure)
+        structure = np.concatenate([np.array([sparsity_type]), _outvar_shape, _invar_shape])
+        edges[:, i, j] = structure
                         
     return edges
 
@@ -1,5 +1,4 @@
-import jax
-import jax.numpy as jnp
+import numpy as np
 
 
 def add_slice(edges, outvar, idx, num_i, num_vo):
@@ -10,7 +9,7 @@ def add_slice(edges, outvar, idx, num_i, num_vo):
     It effectively adds another vertex to the graph which is connected to
     the vertex in question by a single copy edge with sparsity type 8.
     """
-    slc = jnp.zeros((5, num_i+num_vo+1), dtype=jnp.int32)
+    slc = np.zeros((5, num_i+num_vo+1), dtype=np.int32)
     
     if outvar.aval.shape == ():
         outvar_shape = (1, 1)
@@ -18,15 +17,15 @@ def add_slice(edges, outvar, idx, num_i, num_vo):
         outvar_shape = (outvar.aval.shape[0], 1)
     else:
         outvar_shape = outvar.aval.shape
-    jac_shape = jnp.array([8, *outvar_shape, *outvar_shape])
-    slc = slc.at[:, idx-num_i-1].set(jac_shape)
+    jac_shape = np.array([8, *outvar_shape, *outvar_shape])
+    slc[:, idx-num_i-1] = jac_shape
     
-    edges = jnp.append(edges, slc[:, :, jnp.newaxis], axis=2)
-    zeros = jnp.zeros((5, 1, num_vo+1), dtype=jnp.int32)
-    edges = jnp.append(edges, zeros, axis=1)
-    edges = edges.at[0, 0, 1].add(1)
-    edges = edges.at[1, 0, -1].set(1)
-    edges = edges.at[2, 0, -1].set(1)
+    edges = np.append(edges, slc[:, :, np.newaxis], axis=2)
+    zeros = np.zeros((5, 1, num_vo+1), dtype=np.int32)
+    edges = np.append(edges, zeros, axis=1)
+    edges[0, 0, 1] += 1
+    edges[1, 0, -1] = 1
+    edges[2, 0, -1] = 1
     
     return edges
 
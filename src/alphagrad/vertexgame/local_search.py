@@ -0,0 +1,245 @@
+"""
+Population-based local search over elimination orders for graphs that are too
+large for `branch_and_bound` and where RL training takes hours.
+
+Orders are represented as permutations of the vertices that remain to be
+eliminated and are perturbed with three moves:
+- swap two vertices,
+- move a vertex to another position (insert) and
+- reverse the segment between two positions.
+All members of a population are mutated at once with `vmap` and scored
+together with `cross_country_batch`. Both `simulated_annealing` and
+`genetic_algorithm` are seeded with the minimal Markowitz order by default and
+return the best order found, its number of fmas and a convergence trace with
+the best number of fmas after every iteration.
+"""
+from functools import partial
+from typing import Sequence, Tuple
+
+import numpy as np
+
+import jax
+import jax.lax as lax
+import jax.numpy as jnp
+import jax.random as jrand
+
+from chex import Array, PRNGKey
+
+from .core import cross_country_batch, get_vertex_mask
+from .transforms import minimal_markowitz
+
+
+def make_seed_order(graph: Array, order: Sequence[int] = None) -> Array:
+    """
+    Turns an elimination order into a permutation of the remaining vertices.
+    Already eliminated vertices are dropped and missing vertices are appended.
+    Defaults to the minimal Markowitz order.
+    """
+    if order is None:
+        order = jax.jit(minimal_markowitz, static_argnums=1)(graph, int(graph[0, 0, 1]))
+    mask = np.asarray(get_vertex_mask(graph)) > 0
+    remaining = [v for v in range(1, len(mask)+1) if not mask[v-1]]
+    seed = list(dict.fromkeys(int(v) for v in order if int(v) in remaining))
+    seed += [v for v in remaining if v not in seed]
+    return jnp.array(seed, dtype=jnp.int32)
+
+
+def mutate(key: PRNGKey, order: Array) -> Array:
+    """
+    Applies a random swap, insert or segment reverse move to an order.
+    """
+    move_key, pos_key = jrand.split(key)
+    move = jrand.randint(move_key, (), 0, 3)
+    n = order.shape[0]
+    i, j = jnp.sort(jrand.choice(pos_key, n, (2,), replace=False))
+
+    # Index map of every move where position k takes the vertex at idxs[k]
+    k = jnp.arange(n)
+    swap = jnp.where(k == i, j, jnp.where(k == j, i, k))
+    insert = jnp.where((k >= i) & (k < j), k+1, jnp.where(k == j, i, k))
+    reverse = jnp.where((k >= i) & (k <= j), i+j-k, k)
+    idxs = jnp.stack([swap, insert, reverse])[move]
+    return order[idxs]
+
+
+def order_crossover(key: PRNGKey, parent1: Array, parent2: Array) -> Array:
+    """
+    Order crossover (OX) of two permutations. The child inherits a random
+    segment of `parent1` at the same positions and the remaining vertices in
+    the order in which they appear in `parent2`.
+    """
+    n = parent1.shape[0]
+    i, j = jnp.sort(jrand.choice(key, n+1, (2,), replace=False))
+    k = jnp.arange(n)
+    in_segment = (k >= i) & (k < j)
+
+    segment = jnp.where(in_segment, parent1, -1)
+    fill = ~jnp.any(parent2[:, None] == segment[None, :], axis=1)
+    # The r-th vertex of `parent2` that is not inherited goes to the r-th free slot
+    slots = jnp.nonzero(~in_segment, size=n, fill_value=n)[0]
+    ranks = jnp.cumsum(fill) - 1
+    targets = jnp.where(fill, slots[ranks], n)
+    child = jnp.where(in_segment, parent1, 0)
+    return child.at[targets].set(parent2, mode="drop")
+
+
+def _temperature(t_start: float, t_end: float, it: Array, num_iters: int) -> Array:
+    # Geometric cooling schedule
+    return t_start*(t_end/t_start)**(it/max(num_iters-1, 1))
+
+
+@partial(jax.jit, static_argnames=("num_chains", "num_iters", "t_start", "t_end", "chunk_size"))
+def _simulated_annealing(key: PRNGKey,
+                        graph: Array,
+                        seed: Array,
+                        num_chains: int,
+                        num_iters: int,
+                        t_start: float,
+                        t_end: float,
+                        chunk_size: int) -> Tuple[Array, Array, Array]:
+    orders = jnp.tile(seed[None], (num_chains, 1))
+    fmas = cross_country_batch(seed[None], graph)[0]
+    # Temperatures are relative to the number of fmas of the seed
+    scale = jnp.maximum(fmas, 1).astype(jnp.float32)
+
+    def anneal_fn(carry, it):
+        key, orders, fmas, best_order, best_fmas = carry
+        key, mutate_key, accept_key = jrand.split(key, 3)
+        proposals = jax.vmap(mutate)(jrand.split(mutate_key, num_chains), orders)
+        new_fmas = cross_country_batch(proposals, graph, chunk_size=chunk_size)
+
+        # Metropolis criterion
+        temperature = _temperature(t_start, t_end, it, num_iters)*scale
+        delta = (new_fmas - fmas).astype(jnp.float32)
+        u = jrand.uniform(accept_key, (num_chains,))
+        accept = (delta <= 0.) | (u < jnp.exp(-delta/temperature))
+        orders = jnp.where(accept[:, None], proposals, orders)
+        fmas = jnp.where(accept, new_fmas, fmas)
+
+        idx = jnp.argmin(fmas)
+        improved = fmas[idx] < best_fmas
+        best_order = jnp.where(improved, orders[idx], best_order)
+        best_fmas = jnp.where(improved, fmas[idx], best_fmas)
+        return (key, orders, fmas, best_order, best_fmas), best_fmas
+
+    init_carry = (key, orders, jnp.full(num_chains, fmas), seed, fmas)
+    (_, _, _, best_order, best_fmas), trace = lax.scan(anneal_fn, init_carry, jnp.arange(num_iters))
+    return best_order, best_fmas, trace
+
+
+def simulated_annealing(graph: Array,
+                        key: PRNGKey,
+                        num_chains: int = 256,
+                        num_iters: int = 1000,
+                        t_start: float = .05,
+                        t_end: float = 1e-4,
+                        init_order: Sequence[int] = None,
+                        chunk_size: int = 256) -> Tuple[Array, Array, Array]:
+    """
+    Runs `num_chains` independent simulated annealing chains in parallel.
+
+    Arguments:
+        graph (Array): Dense computational graph representation.
+        key (PRNGKey): Random key.
+        num_chains (int): Number of parallel chains.
+        num_iters (int): Number of iterations of every chain.
+        t_start (float): Initial temperature relative to the number of fmas
+                        of the seed order.
+        t_end (float): Final temperature relative to the number of fmas of
+                        the seed order.
+        init_order (Sequence[int]): Seed order of all chains. Defaults to the
+                                    minimal Markowitz order.
+        chunk_size (int): Chunk size of `cross_country_batch`.
+
+    Returns:
+        A tuple that contains the best order, its number of fmas and the best
+        number of fmas after every iteration.
+    """
+    seed = make_seed_order(graph, init_order)
+    if len(seed) < 2:
+        fmas = cross_country_batch(seed[None], graph)[0]
+        return seed, fmas, jnp.full(num_iters, fmas)
+    return _simulated_annealing(key, graph, seed, num_chains, num_iters,
+                                t_start, t_end, chunk_size)
+
+
+@partial(jax.jit, static_argnames=("population_size", "num_generations", "num_elites",
+                                    "mutation_rate", "chunk_size"))
+def _genetic_algorithm(key: PRNGKey,
+                        graph: Array,
+                        seed: Array,
+                        population_size: int,
+                        num_generations: int,
+                        num_elites: int,
+                        mutation_rate: float,
+                        chunk_size: int) -> Tuple[Array, Array, Array]:
+    num_children = population_size - num_elites
+
+    # The initial population consists of the seed and its mutants
+    key, init_key = jrand.split(key)
+    mutants = jax.vmap(mutate, in_axes=(0, None))(jrand.split(init_key, population_size-1), seed)
+    population = jnp.concatenate((seed[None], mutants))
+    fmas = cross_country_batch(population, graph, chunk_size=chunk_size)
+
+    def generation_fn(carry, _):
+        key, population, fmas = carry
+        key, select_key, cross_key, mutate_key, rate_key = jrand.split(key, 5)
+        ranking = jnp.argsort(fmas)
+        elites, elite_fmas = population[ranking[:num_elites]], fmas[ranking[:num_elites]]
+
+        # Binary tournament selection of the parents
+        candidates = jrand.randint(select_key, (2, 2, num_children), 0, population_size)
+        winners = jnp.where(fmas[candidates[:, 0]] <= fmas[candidates[:, 1]],
+                            candidates[:, 0], candidates[:, 1])
+        parents1, parents2 = population[winners[0]], population[winners[1]]
+
+        children = jax.vmap(order_crossover)(jrand.split(cross_key, num_children), parents1, parents2)
+        mutants = jax.vmap(mutate)(jrand.split(mutate_key, num_children), children)
+        is_mutated = jrand.uniform(rate_key, (num_children,)) < mutation_rate
+        children = jnp.where(is_mutated[:, None], mutants, children)
+        child_fmas = cross_country_batch(children, graph, chunk_size=chunk_size)
+
+        population = jnp.concatenate((elites, children))
+        fmas = jnp.concatenate((elite_fmas, child_fmas))
+        return (key, population, fmas), jnp.min(fmas)
+
+    (_, population, fmas), trace = lax.scan(generation_fn, (key, population, fmas),
+                                            None, length=num_generations)
+    idx = jnp.argmin(fmas)
+    return population[idx], fmas[idx], trace
+
+
+def genetic_algorithm(graph: Array,
+                    key: PRNGKey,
+                    population_size: int = 256,
+                    num_generations: int = 500,
+                    num_elites: int = 16,
+                    mutation_rate: float = .5,
+                    init_order: Sequence[int] = None,
+                    chunk_size: int = 256) -> Tuple[Array, Array, Array]:
+    """
+    Genetic algorithm with elitism, binary tournament selection, order
+    crossover and the mutation moves of `mutate`.
+
+    Arguments:
+        graph (Array): Dense computational graph representation.
+        key (PRNGKey): Random key.
+        population_size (int): Number of orders in the population.
+        num_generations (int): Number of generations.
+        num_elites (int): Number of the best orders that are carried over to
+                        the next generation unchanged.
+        mutation_rate (float): Probability that a child is mutated.
+        init_order (Sequence[int]): Seed order of the initial population.
+                                    Defaults to the minimal Markowitz order.
+        chunk_size (int): Chunk size of `cross_country_batch`.
+
+    Returns:
+        A tuple that contains the best order, its number of fmas and the best
+        number of fmas after every generation.
+    """
+    seed = make_seed_order(graph, init_order)
+    if len(seed) < 2:
+        fmas = cross_country_batch(seed[None], graph)[0]
+        return seed, fmas, jnp.full(num_generations, fmas)
+    return _genetic_algorithm(key, graph, seed, population_size, num_generations,
+                            num_elites, mutation_rate, chunk_size)
@@ -1,7 +1,15 @@
 import os
 from typing import Sequence
+from functools import partial
 
 import gc
+import multiprocessing as mp
+from collections import deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+
+import h5py
+import numpy as np
 
 import jax
 import jax.random as jrand
@@ -15,48 +23,142 @@ from .utils import create, write
 class Graph2File:
     """
     Class to create a large dataset of computational graphs.
+    The samples are generated in batches of size `batchsize` where batch `b`
+    is sampled with the key `fold_in(key, b)`. The resulting file therefore
+    does not depend on the number of workers and an interrupted run can be
+    resumed from the `current_idx` attribute of the file.
+    With `num_workers > 1`, the batches are sampled by a pool of processes
+    and appended to the file in order by the main process. At most 
+    `queue_size` batches are sampled or waiting to be written at any time.
     """
     path: str
     fname_prefix: str
     num_samples: int
     batchsize: int
     storage_shape: Sequence[int]
+    columnar: bool
+    num_workers: int
+    queue_size: int
     sampler: ComputationalGraphSampler
-    
-    def __init__(self, 
+
+    def __init__(self,
                 sampler: ComputationalGraphSampler,
                 path: str,
-                fname_prefix: str = "comp_graph_examples", 
-                num_samples: int = 16384,  
+                fname_prefix: str = "comp_graph_examples",
+                num_samples: int = 16384,
                 batchsize: int = 1,
-                storage_shape: Sequence[int] = [20, 105, 20]) -> None:
+                storage_shape: Sequence[int] = [20, 105, 20],
+                columnar: bool = False,
+                num_workers: int = 1,
+                queue_size: int = 16) -> None:
         self.path = path
         self.fname_prefix = fname_prefix
         self.num_samples = num_samples
         self.storage_shape = storage_shape
+        self.columnar = columnar
+        self.num_workers = num_workers
+        self.queue_size = queue_size
         self.sampler = sampler
         self.batchsize = batchsize
-        
-    def generate(self, key: PRNGKey = None, **kwargs) -> None:
-        ri = int(jrand.randint(key, (), 0, 1e6))
-        handle = "_".join([str(s) for s in self.storage_shape])
-        handle += f"_{self.num_samples}"
-        handle += f"_{ri}"
-        
-        name = self.fname_prefix + "-" + handle + ".hdf5"
-        fname = os.path.join(self.path, name)
-        print("Saving under", fname)
-        create(fname, num_samples=self.num_samples, max_shape=self.storage_shape)
-    
-        subkey, key = jrand.split(key, 2)
-        
-        num_samples = 0
-        while num_samples < self.num_samples:
-            samples = self.sampler.sample(self.batchsize, key=subkey, **kwargs)
-            print("Writing", len(samples), "samples to file...")
-            num_samples += len(samples)
-            write(fname, samples)
-            
-            del samples
-            gc.collect()
 
+    def generate(self, key: PRNGKey = None, fname: str = None, **kwargs) -> str:
+        """
+        Generates the dataset. If `fname` is an existing file, the generation
+        is resumed after the last sample that was written to it. Then the
+        same `key` has to be used.
+
+        Returns:
+            The name of the dataset file.
+        """
+        if fname is None:
+            ri = int(jrand.randint(key, (), 0, 1e6))
+            handle = "_".join([str(s) for s in self.storage_shape])
+            handle += f"_{self.num_samples}"
+            handle += f"_{ri}"
+
+            name = self.fname_prefix + "-" + handle + ".hdf5"
+            fname = os.path.join(self.path, name)
+
+        if os.path.isfile(fname):
+            with h5py.File(fname, "r") as file:
+                current_idx = int(file["header"].attrs["current_idx"])
+            print("Resuming", fname, "at sample", current_idx)
+        else:
+            print("Saving under", fname)
+            create(fname, num_samples=self.num_samples,
+                    max_shape=self.storage_shape, columnar=self.columnar)
+            current_idx = 0
+
+        # Batches are written in order, so all batches before `current_idx` are complete
+        first_batch = current_idx // self.batchsize
+        num_batches = -(-self.num_samples // self.batchsize)
+        batches = range(first_batch, num_batches)
+        key = np.asarray(key)
+
+        if self.num_workers <= 1:
+            for batch in batches:
+                samples = _sample_batch(self.sampler, key, self.batchsize, kwargs, batch)
+                print("Writing", len(samples), "samples to file...")
+                write(fname, samples)
+
+                del samples
+                gc.collect()
+        else:
+            self._generate_parallel(fname, key, batches, kwargs)
+        return fname
+
+    def _generate_parallel(self, fname: str, key: np.ndarray, batches: Sequence[int], kwargs) -> None:
+        # JAX is multithreaded and therefore not fork-safe
+        ctx = mp.get_context("spawn")
+        sample_fn = partial(_sample_numpy_batch, self.sampler, key, self.batchsize, kwargs)
+        batches = iter(batches)
+
+        # Sampling is done on the CPU so that workers do not compete for accelerators.
+        # Workers are spawned on demand, so this holds for the whole generation
+        jax_platforms = os.environ.get("JAX_PLATFORMS")
+        os.environ["JAX_PLATFORMS"] = "cpu"
+        try:
+            with ProcessPoolExecutor(self.num_workers, mp_context=ctx) as pool:
+                # Batches are submitted and written in order, so at most 
+                # `queue_size` batches are held in memory
+                futures = deque(pool.submit(sample_fn, batch) 
+                                for batch in islice(batches, self.queue_size))
+                try:
+                    while len(futures) > 0:
+                        # Re-raises the exception of a failed worker and raises
+                        # a BrokenProcessPool if a worker was killed
+                        batch, samples = futures.popleft().result()
+                        print("Writing batch", batch, "with", len(samples), "samples to file...")
+                        write(fname, samples)
+                        
+                        for batch in islice(batches, 1):
+                            futures.append(pool.submit(sample_fn, batch))
+                except BaseException:
+                    for future in futures:
+                        future.cancel()
+                    raise
+        finally:
+            if jax_platforms is None:
+                del os.environ["JAX_PLATFORMS"]
+            else:
+                os.environ["JAX_PLATFORMS"] = jax_platforms
+
+
+def _sample_batch(sampler: ComputationalGraphSampler,
+                key: np.ndarray,
+                batchsize: int,
+                kwargs: dict,
+                batch: int):
+    batch_key = jrand.fold_in(jax.numpy.asarray(key), batch)
+    return sampler.sample(batchsize, key=batch_key, **kwargs)
+
+
+def _sample_numpy_batch(sampler: ComputationalGraphSampler,
+                        key: np.ndarray,
+                        batchsize: int,
+                        kwargs: dict,
+                        batch: int):
+    samples = _sample_batch(sampler, key, batchsize, kwargs, batch)
+    # Convert to numpy to keep the transfer to the main process cheap
+    samples = [(code, np.asarray(header), np.asarray(edges)) for code, header, edges in samples]
+    return batch, samples
@@ -0,0 +1,235 @@
+"""
+Memory-mapped flat binary format for datasets of computational graphs.
+
+Unlike the variable-length datasets of the hdf5 files created by
+`utils.create`, every array of this format is a flat binary file that can be
+memory-mapped with `np.memmap`, so random access does not copy or decode
+anything. A dataset is a directory with the suffix `.graphs` that contains
+- `meta.json`: Number of samples, storage shape and layout of the edges.
+- `headers.bin`: int32 headers of all graphs with shape (num_samples, 5, max_v).
+- `edges.bin`: int32 buffer with the sparse edges of all graphs concatenated.
+- `offsets.bin`: int64 array with num_samples+1 entries such that the edges of
+                sample `n` are `edges[offsets[n]:offsets[n+1]]`.
+- `code.bin` and `code_offsets.bin`: utf-8 encoded source code of the samples
+                                    in the same format as the edges.
+"""
+import os
+import json
+from typing import Sequence, Tuple, Union
+
+import h5py
+import numpy as np
+
+from chex import Array
+
+from .utils import to_columnar
+from .dataset import GraphDataset
+
+
+SUFFIX = ".graphs"
+
+
+class MemmapWriter:
+    """
+    Appends samples to a new memory-mapped dataset. The samples have the same
+    format as for `utils.write`, i.e. tuples of code, header and sparse edges
+    as returned by `sparsify`.
+
+    Example:
+        with MemmapWriter("data/train.graphs", [20, 105, 20]) as writer:
+            writer.write(samples)
+    """
+    path: str
+    max_shape: Sequence[int]
+    columnar: bool
+    num_samples: int
+    num_edges: int
+    num_bytes: int
+
+    def __init__(self,
+                path: str,
+                max_shape: Sequence[int] = (20, 105, 20),
+                columnar: bool = False) -> None:
+        assert os.path.exists(path) == False
+        os.makedirs(path)
+        self.path = path
+        self.max_shape = [int(s) for s in max_shape]
+        self.columnar = columnar
+        self.num_samples = 0
+        self.num_edges = 0
+        self.num_bytes = 0
+
+        self._files = {name: open(os.path.join(path, name), "wb")
+                        for name in ("headers.bin", "edges.bin", "offsets.bin",
+                                    "code.bin", "code_offsets.bin")}
+        self._files["offsets.bin"].write(np.zeros(1, dtype=np.int64).tobytes())
+        self._files["code_offsets.bin"].write(np.zeros(1, dtype=np.int64).tobytes())
+        self._write_meta()
+
+    def _write_meta(self) -> None:
+        meta = {"num_samples": self.num_samples,
+                "max_graph_shape": self.max_shape,
+                "layout": "columnar" if self.columnar else "interleaved"}
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+    def write(self, samples: Sequence[Tuple[str, Array, Array]], convert: bool = True) -> None:
+        """
+        Appends samples to the dataset. If `convert` is False, the edges are
+        expected to already be in the layout of the dataset.
+        """
+        max_v = self.max_shape[1]
+        for code, header, sparse_edges in samples:
+            header = np.asarray(header, dtype=np.int32)
+            assert header.shape == (5, max_v), f"Header of shape {header.shape} does not match (5, {max_v})!"
+            sparse_edges = np.asarray(sparse_edges, dtype=np.int32)
+            if self.columnar and convert:
+                sparse_edges = to_columnar(sparse_edges)
+            code = code.encode("utf-8") if isinstance(code, str) else bytes(code)
+
+            self.num_edges += sparse_edges.size
+            self.num_bytes += len(code)
+            self._files["headers.bin"].write(header.tobytes())
+            self._files["edges.bin"].write(sparse_edges.tobytes())
+            self._files["offsets.bin"].write(np.int64(self.num_edges).tobytes())
+            self._files["code.bin"].write(code)
+            self._files["code_offsets.bin"].write(np.int64(self.num_bytes).tobytes())
+            self.num_samples += 1
+
+        for file in self._files.values():
+            file.flush()
+        self._write_meta()
+
+    def close(self) -> None:
+        for file in self._files.values():
+            file.close()
+        self._write_meta()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def _memmap(fname: str, dtype, shape: Tuple[int, ...]) -> np.ndarray:
+    # Empty files cannot be memory-mapped
+    if np.prod(shape) == 0:
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(fname, dtype=dtype, mode="r", shape=shape)
+
+
+def read_meta(path: str) -> dict:
+    with open(os.path.join(path, "meta.json")) as f:
+        return json.load(f)
+
+
+class MemmapGraphFile:
+    """
+    Read-only view of a memory-mapped dataset.
+    """
+    path: str
+    num_samples: int
+    columnar: bool
+    headers: np.ndarray
+    edges: np.ndarray
+    offsets: np.ndarray
+    code: np.ndarray
+    code_offsets: np.ndarray
+
+    def __init__(self, path: str) -> None:
+        meta = read_meta(path)
+        self.path = path
+        self.num_samples = meta["num_samples"]
+        self.columnar = meta["layout"] == "columnar"
+        max_v = meta["max_graph_shape"][1]
+        n = self.num_samples
+
+        self.headers = _memmap(os.path.join(path, "headers.bin"), np.int32, (n, 5, max_v))
+        self.offsets = _memmap(os.path.join(path, "offsets.bin"), np.int64, (n+1,))
+        self.edges = _memmap(os.path.join(path, "edges.bin"), np.int32, (int(self.offsets[n]),))
+        self.code_offsets = _memmap(os.path.join(path, "code_offsets.bin"), np.int64, (n+1,))
+        self.code = _memmap(os.path.join(path, "code.bin"), np.uint8, (int(self.code_offsets[n]),))
+
+    def __len__(self) -> int:
+        return self.num_samples
+
+    def _get_code(self, idx: int) -> bytes:
+        return self.code[self.code_offsets[idx]:self.code_offsets[idx+1]].tobytes()
+
+    def read(self, idxs: Union[int, slice], include_code: bool = False) -> Tuple[Array, Array, Array]:
+        """
+        Reads a single sample or a slice of samples. Headers and edges are
+        views into the memory-mapped buffers. Like for the hdf5 files, the
+        source code is returned as bytes.
+        """
+        if isinstance(idxs, slice):
+            idxs = range(*idxs.indices(self.num_samples))
+            headers = self.headers[idxs.start:idxs.stop]
+            graphs = [self.edges[self.offsets[n]:self.offsets[n+1]] for n in idxs]
+            codes = [self._get_code(n) for n in idxs] if include_code else None
+            return codes, headers, graphs
+
+        idx = int(idxs)
+        graph = self.edges[self.offsets[idx]:self.offsets[idx+1]]
+        code = self._get_code(idx) if include_code else None
+        return code, self.headers[idx], graph
+
+    def close(self) -> None:
+        self.headers = self.edges = self.offsets = self.code = self.code_offsets = None
+
+
+class MemmapGraphDataset(GraphDataset):
+    """
+    Drop-in replacement for `GraphDataset` that reads all `.graphs` datasets
+    in a directory instead of the `.hdf5` files.
+    """
+    suffix: str = SUFFIX
+
+    def _read_info(self, path: str) -> Tuple[int, bool]:
+        meta = read_meta(path)
+        return meta["num_samples"], meta["layout"] == "columnar"
+
+    def _open(self, file_idx: int) -> MemmapGraphFile:
+        return MemmapGraphFile(self.files[file_idx])
+
+    def _read(self, file_idx: int, idxs, include_code: bool = False) -> Tuple[Array, Array, Array]:
+        return self._get_handle(file_idx).read(idxs, include_code)
+
+
+def convert_to_memmap(fname: str,
+                    path: str = None,
+                    chunksize: int = 4096) -> str:
+    """
+    Converts a dataset file created with `utils.create` into the
+    memory-mapped format. The layout of the edges is preserved.
+
+    Arguments:
+        fname (str): Path of the hdf5 file.
+        path (str): Path of the new dataset. Defaults to `fname` with the
+                    suffix `.graphs`.
+        chunksize (int): Number of samples that are converted at once.
+
+    Returns:
+        The path of the new dataset.
+    """
+    if path is None:
+        path = os.path.splitext(fname)[0] + SUFFIX
+
+    with h5py.File(fname, "r") as file:
+        header = file["header"]
+        num_samples = min(int(header.attrs["num_samples"]), file["data/graph"].shape[0])
+        max_shape = header.attrs["max_graph_shape"]
+        columnar = header.attrs.get("layout", "interleaved") == "columnar"
+
+        # Edges are already stored in the right layout, so we copy them as is
+        with MemmapWriter(path, max_shape, columnar) as writer:
+            for start in range(0, num_samples, chunksize):
+                stop = min(start+chunksize, num_samples)
+                codes = file["data/code"][start:stop]
+                headers = file["data/graph_header"][start:stop]
+                graphs = file["data/graph"][start:stop]
+                writer.write([(code, header, graph) for code, header, graph
+                                in zip(codes, headers, graphs)], convert=False)
+    return path
+
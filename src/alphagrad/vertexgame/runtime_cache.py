@@ -0,0 +1,152 @@
+"""
+Cache for the runtime measurements of elimination orders in the `RuntimeGame`.
+
+Entries are keyed by a canonical hash of the elimination order. Orders that
+only differ by the order in which independent vertices are eliminated share
+the same entry since they compile to the same Jacobian computation up to the
+order of the operations. The key also contains the computational graph and
+the host, since runtimes are specific to the machine they were measured on.
+
+Every entry holds the measured runtime distribution. The most recently used
+`capacity` entries are kept in memory. If a `path` is given, the runtimes are
+additionally stored in a `GraphCache` on disk so that they persist between
+runs.
+"""
+import hashlib
+import platform
+from collections import OrderedDict
+from typing import Dict, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from chex import Array
+
+from .core import get_shape
+from .interpreter.graph_cache import GraphCache, DEFAULT_MAX_SIZE, get_graph_key
+
+
+def canonicalize_order(act_seq: Union[str, Sequence[int]], graph: Array) -> Union[str, Tuple[int, ...]]:
+    """
+    Turns an action sequence into a canonical elimination order of vertices.
+    The elimination of two consecutive vertices commutes if they are not
+    connected at that time. Every vertex is therefore assigned to the level 
+    after the last vertex it was connected to when that vertex was eliminated
+    and the vertices are sorted by level and then by number. This is the
+    Foata normal form of the order which is the same for all orders that
+    can be transformed into each other by swapping commuting vertices.
+    "fwd" and "rev" are returned as they are.
+    """
+    if type(act_seq) is str:
+        return act_seq
+    graph = np.asarray(graph)
+    num_i, num_v = get_shape(graph)
+    adjacency = graph[0, 1:, :] != 0
+    eliminated = graph[1, 0, :] == 1
+    levels = np.zeros(num_v, dtype=np.int32)
+    
+    order = []
+    for action in act_seq:
+        vertex = int(action) + 1
+        if eliminated[vertex-1]:
+            continue
+        eliminated[vertex-1] = True
+        order.append(vertex)
+        
+        preds = np.nonzero(adjacency[:, vertex-1])[0]
+        succs = np.nonzero(adjacency[num_i+vertex-1, :])[0]
+        level = levels[vertex-1] + 1
+        # Remaining neighbours have to be eliminated after this vertex
+        neighbours = np.concatenate((preds[preds >= num_i]-num_i, succs))
+        levels[neighbours] = np.maximum(levels[neighbours], level)
+        
+        adjacency[np.ix_(preds, succs)] = True
+        adjacency[:, vertex-1] = False
+        adjacency[num_i+vertex-1, :] = False
+    return tuple(sorted(order, key=lambda v: (levels[v-1], v)))
+
+
+def get_order_key(act_seq: Union[str, Sequence[int]], graph: Array) -> str:
+    """
+    Computes the canonical hash of an elimination order on a graph.
+    """
+    order = canonicalize_order(act_seq, graph)
+    sha = hashlib.sha256()
+    sha.update(get_graph_key(graph).encode())
+    sha.update(platform.node().encode())
+    sha.update(platform.machine().encode())
+    sha.update(str(order).encode())
+    return "runtime-" + sha.hexdigest()
+
+
+class RuntimeCache:
+    """
+    LRU cache of runtime measurements with hit and miss counters.
+
+    Args:
+        capacity (int): Maximum number of entries that are kept in memory.
+        path (str): Directory of the on-disk cache. If None, only the
+                    in-memory cache is used.
+        max_size (int): Maximum size of the on-disk cache in bytes.
+    """
+    capacity: int
+    disk_cache: Optional[GraphCache]
+    entries: Dict[str, np.ndarray]
+    hits: int
+    misses: int
+
+    def __init__(self,
+                capacity: int = 1024,
+                path: str = None,
+                max_size: int = DEFAULT_MAX_SIZE) -> None:
+        self.capacity = capacity
+        self.disk_cache = GraphCache(path, max_size) if path is not None else None
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """
+        Returns the runtimes of an entry or None.
+        """
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+
+        if self.disk_cache is not None:
+            entry = self.disk_cache.load(key)
+            if entry is not None:
+                self.hits += 1
+                runtimes = entry["runtimes"]
+                self._insert(key, runtimes)
+                return runtimes
+        self.misses += 1
+        return None
+
+    def put(self, key: str, runtimes: Array) -> None:
+        runtimes = np.asarray(runtimes)
+        self._insert(key, runtimes)
+        if self.disk_cache is not None:
+            self.disk_cache.store(key, runtimes=runtimes)
+
+    def _insert(self, key: str, runtimes: np.ndarray) -> None:
+        if self.capacity <= 0:
+            return
+        self.entries[key] = runtimes
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns the counters of the cache for logging.
+        """
+        total = self.hits + self.misses
+        return {"runtime cache hits": self.hits,
+                "runtime cache misses": self.misses,
+                "runtime cache hit rate": self.hits / total if total > 0 else 0.,
+                "runtime cache size": len(self.entries)}
+
@@ -1,6 +1,14 @@
-import time
+import os
+import warnings
+from contextlib import contextmanager
 from functools import partial
-from typing import Callable, Tuple
+from typing import Callable, List, Optional, Sequence, Tuple, Union
+
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
 
 import jax
 import jax.lax as lax
@@ -12,7 +20,10 @@ from .core import (vertex_eliminate,
                     get_elimination_order, 
                     get_vertex_mask, 
                     get_shape)
-from .interpreter import make_graph
+from .interpreter import cached_make_graph
+from .runtime_cache import RuntimeCache, get_order_key
+from .runtime_measurement import RuntimeEstimator
+from .cost_model import CostModel, get_cost_features_batch
     
 from graphax import jacve
 
@@ -20,23 +31,115 @@ State = Tuple[Array, Array]
 EnvOut = Tuple[State, float, bool]
 
 # NOTE: this env is not jittable so far since the tracing mechanism of jacve
-# is not compatible with jit itself. The resulting function is however jittable,
-# which is why we can measure the execution time with a lax.scan. 
+# is not compatible with jit itself. The resulting function is however jittable
+# and every call of it is timed individually on the host.
 # NOTE: working with runtimes also is not nicely parallelizable since the
-# tracing mechanism of jacve is not compatible with vmap/pmap.
+# tracing mechanism of jacve is not compatible with vmap/pmap. Instead, 
+# batches of elimination orders are compiled and timed by a pool of processes.
 class RuntimeGame:
+    """
+    Vertex elimination game where the reward is the negative runtime of the
+    Jacobian that is computed with the resulting elimination order.
+    The runtime is measured and estimated with `estimator`. Measurements of
+    orders that are clearly slower than the best order so far are stopped 
+    early. Every reward comes with the variance of the runtime estimate.
+    
+    With `reward_mode="cost_model"`, the runtime is instead predicted by 
+    `cost_model` from the features of the elimination, which is as fast as the
+    fma game. The cost model is calibrated with the measurements of the
+    orders that were measured so far using `calibrate_cost_model`, and 
+    `measure_best` measures only the most promising candidates.
+    
+    With `num_workers > 1`, the rewards of `get_rewards` and `step_batch` are
+    measured by a pool of spawned processes. `f` therefore has to be picklable,
+    i.e. defined at the top level of a module. The script that creates the
+    game must guard its entry point with `if __name__ == "__main__"` since the
+    workers import it again.
+    
+    Args:
+        num_samples (int): Maximum number of runtime measurements per order.
+        f (Callable): Function whose Jacobian is computed.
+        xs: Example inputs of `f`.
+        num_workers (int): Number of measurement processes.
+        cpu_affinity (Sequence[int]): CPUs that the workers are pinned to. 
+                                    They are split evenly between the workers
+                                    so that measurements do not interfere.
+                                    If None, the workers are not pinned.
+        max_retries (int): Number of times the measurement of an order is
+                            retried in a new pool after a worker crashed.
+        failure_penalty (float): Orders whose measurement failed get the 
+                                runtime of the slowest order measured so far
+                                times `failure_penalty` as a finite penalty.
+        cache_size (int): Number of measured orders that are kept in memory.
+                        Measurements of orders that are found in the cache 
+                        are reused instead of compiling the order again.
+                        A size of 0 disables the in-memory cache.
+        cache_path (str): Optional directory where measured runtimes are 
+                        stored to reuse them between runs.
+        estimator (RuntimeEstimator): Configuration of the measurement.
+        reward_mode (str): Either "runtime" for measured rewards or 
+                            "cost_model" for predicted rewards.
+        cost_model (CostModel): Calibrated cost model for the "cost_model" 
+                                reward mode.
+    """
     f: Callable
     num_samples: int
     num_actions: int
     graph: Array
     reward_fn: Callable
+    measure_fn: Callable
+    cache: RuntimeCache
+    estimator: RuntimeEstimator
+    best_runtime: Optional[float]
+    worst_runtime: Optional[float]
+    failure_penalty: float
+    reward_mode: str
+    cost_model: CostModel
+    measurements: List[Tuple[np.ndarray, float]]
+    xs: Sequence[Array]
+    num_workers: int
+    cpu_affinity: Sequence[int]
+    max_retries: int
     
-    def __init__(self, num_samples: int, f: Callable, *xs) -> None:
-        self.graph = make_graph(f, *xs)
+    def __init__(self, 
+                num_samples: int, 
+                f: Callable, 
+                *xs, 
+                num_workers: int = 1,
+                cpu_affinity: Sequence[int] = None,
+                max_retries: int = 1,
+                failure_penalty: float = 2.,
+                cache_size: int = 1024,
+                cache_path: str = None,
+                estimator: RuntimeEstimator = None,
+                reward_mode: str = "runtime",
+                cost_model: CostModel = None) -> None:
+        self.graph = cached_make_graph(f, *xs)
         self.f = f
         self.num_actions = self.graph.at[0, 0, 1].get()
         self.num_samples = num_samples
-        self.reward_fn = partial(_get_reward, num_samples, f, *xs)
+        self.estimator = RuntimeEstimator() if estimator is None else estimator
+        self.reward_fn = partial(_get_reward, num_samples, f, *xs, estimator=self.estimator)
+        self.measure_fn = partial(_measure_runtimes, num_samples, f, *xs, estimator=self.estimator)
+        self.cache = RuntimeCache(cache_size, cache_path)
+        self.best_runtime = None
+        self.worst_runtime = None
+        self.failure_penalty = failure_penalty
+        
+        if reward_mode not in ("runtime", "cost_model"):
+            raise ValueError(f"Unknown reward mode {reward_mode}!")
+        self.reward_mode = reward_mode
+        self.cost_model = CostModel() if cost_model is None else cost_model
+        self.measurements = []
+        
+        if cpu_affinity is not None:
+            assert len(cpu_affinity) >= num_workers, \
+                f"{len(cpu_affinity)} CPUs are not enough for {num_workers} workers!"
+        self.xs = xs
+        self.num_workers = num_workers
+        self.cpu_affinity = cpu_affinity
+        self.max_retries = max_retries
+        self._pool = None
     
     @partial(jax.jit, static_argnums=(0,))
     def reset(self) -> State:
@@ -67,17 +170,265 @@ class RuntimeGame:
         """
         new_state, num_eliminated_vertices, num_intermediates, new_act_seq = _step(state, action)
         terminated = lax.select(num_eliminated_vertices == num_intermediates, True, False)
-        reward = self.reward_fn(act_seq=new_act_seq) if terminated else 0.0
+        reward = self.get_rewards([new_act_seq])[0] if terminated else 0.0
         return new_state, reward*1., terminated
+    
+    def step_batch(self, states: State, actions: Array) -> Tuple[State, Array, Array, Array, Array]:
+        """
+        Performs a step for a batch of environments. The rewards of all 
+        environments that terminate are measured at once with `get_rewards`.
         
+        Returns:
+            The new states, rewards, termination flags, the variances of the
+            rewards and whether the measurement of the order failed, in 
+            which case the reward is the finite failure penalty. The 
+            variances are finite and non-negative: unknown variances of 
+            failed orders or orders with a single sample are replaced by the
+            largest variance of the batch.
+        """
+        edges, act_seqs = states
+        new_edges, new_act_seqs, dones = [], [], []
+        for i in range(len(actions)):
+            new_state, num_eliminated_vertices, num_intermediates, _ = _step((edges[i], act_seqs[i]), actions[i])
+            new_edges.append(new_state[0])
+            new_act_seqs.append(new_state[1])
+            dones.append(bool(num_eliminated_vertices == num_intermediates))
+            
+        rewards = np.zeros(len(actions), dtype=np.float32)
+        variances = np.zeros(len(actions), dtype=np.float32)
+        failed = np.zeros(len(actions), dtype=bool)
+        terminated = np.flatnonzero(dones)
+        if len(terminated) > 0:
+            act_seqs = [new_act_seqs[i] for i in terminated]
+            if self.reward_mode == "cost_model":
+                rewards[terminated], variances[terminated] = self.predict_rewards(act_seqs, True)
+            else:
+                rewards[terminated], variances[terminated], failed[terminated] = self._measure_rewards(act_seqs)
+            variances = _sanitize_variances(variances)
+        new_states = (jnp.stack(new_edges), jnp.stack(new_act_seqs))
+        return (new_states, jnp.asarray(rewards), jnp.array(dones), 
+                jnp.asarray(variances), jnp.asarray(failed))
+    
+    def get_rewards(self, 
+                    act_seqs: Sequence[Array], 
+                    return_variance: bool = False) -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Computes the rewards of a batch of elimination orders according to
+        `reward_mode`. See `measure_rewards` and `predict_rewards`.
+        """
+        if self.reward_mode == "cost_model":
+            return self.predict_rewards(act_seqs, return_variance)
+        return self.measure_rewards(act_seqs, return_variance)
+    
+    def predict_rewards(self, 
+                        act_seqs: Sequence[Array], 
+                        return_variance: bool = False) -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Predicts the rewards of a batch of elimination orders with the cost 
+        model. The variance of the rewards is the residual variance of the 
+        calibration.
+        """
+        orders = np.stack([self._to_act_seq(act_seq) for act_seq in act_seqs]) + 1
+        features = get_cost_features_batch(orders, self.graph)
+        rewards = -self.cost_model.predict(features).astype(np.float32)
+        if return_variance:
+            return rewards, np.full(len(rewards), self.cost_model.variance, dtype=np.float32)
+        return rewards
+    
+    def measure_best(self, act_seqs: Sequence[Array], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Measures the rewards of the `k` orders with the best predicted rewards.
+
+        Returns:
+            The indices of the measured orders and their measured rewards.
+        """
+        idxs = np.argsort(-self.predict_rewards(act_seqs), kind="stable")[:k]
+        return idxs, self.measure_rewards([act_seqs[i] for i in idxs])
+    
+    def calibrate_cost_model(self, l2: float = 1e-6) -> CostModel:
+        """
+        Fits the cost model to all measurements made so far.
+        """
+        assert len(self.measurements) > 0, "No measurements to calibrate the cost model with!"
+        act_seqs, runtimes = zip(*self.measurements)
+        features = get_cost_features_batch(np.stack(act_seqs) + 1, self.graph)
+        return self.cost_model.fit(features, runtimes, l2)
+    
+    def save_measurements(self, fname: str) -> None:
+        """
+        Stores the measured orders and runtimes in a `.npz` file.
+        """
+        act_seqs, runtimes = zip(*self.measurements) if len(self.measurements) > 0 else ([], [])
+        np.savez(fname, act_seqs=np.array(act_seqs, dtype=np.int32).reshape(-1, int(self.num_actions)),
+                runtimes=np.array(runtimes))
+    
+    def load_measurements(self, fname: str) -> None:
+        """
+        Adds the measurements stored with `save_measurements`.
+        """
+        with np.load(fname) as data:
+            self.measurements.extend(zip(data["act_seqs"], data["runtimes"]))
+    
+    def _to_act_seq(self, act_seq) -> np.ndarray:
+        num_actions = int(self.num_actions)
+        if type(act_seq) is str:
+            act_seq = np.arange(num_actions) if act_seq == "fwd" else np.arange(num_actions)[::-1]
+        return np.asarray(act_seq, dtype=np.int32)
+    
+    def measure_rewards(self, 
+                        act_seqs: Sequence[Array], 
+                        return_variance: bool = False) -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Measures the rewards of a batch of elimination orders. Orders whose
+        runtimes are found in `cache` are not measured again and orders that
+        occur multiple times in the batch are measured only once.
+        With `num_workers > 1`, every order is compiled and timed in one of the 
+        worker processes. If a worker crashes, the pool is restarted and the
+        orders that were lost are measured again. Orders that raise an 
+        exception or still crash after `max_retries` retries get the reward
+        of the slowest measured order times `failure_penalty` and an 
+        infinite variance.
+
+        Args:
+            act_seqs (Sequence[Array]): Action sequences or "fwd"/"rev".
+            return_variance (bool): Whether to return the variances of the
+                                    rewards as well.
+
+        Returns:
+            An array with the reward of every order and optionally an array
+            with the variances.
+        """
+        rewards, variances, _ = self._measure_rewards(act_seqs)
+        if return_variance:
+            return rewards, variances
+        return rewards
+    
+    def _measure_rewards(self, act_seqs: Sequence[Array]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # Returns the rewards, variances and whether the measurement failed
+        graph = np.asarray(self.graph)
+        keys = [get_order_key(act_seq, graph) for act_seq in act_seqs]
+        
+        estimates, misses = {}, {}
+        for i, key in enumerate(keys):
+            if key in estimates or key in misses:
+                continue
+            runtimes = self.cache.get(key)
+            if runtimes is not None:
+                estimates[key] = self._update_best(runtimes)
+            else:
+                misses[key] = i
+                
+        failed = set()
+        if len(misses) > 0:
+            results = self._measure([act_seqs[i] for i in misses.values()])
+            for key, runtimes in zip(misses.keys(), results):
+                if runtimes is None:
+                    failed.add(key)
+                    continue
+                self.cache.put(key, runtimes)
+                estimates[key] = self._update_best(runtimes)
+                self.measurements.append((self._to_act_seq(act_seqs[misses[key]]), estimates[key][0]))
+        
+        # The penalty is computed after all successful measurements of the batch
+        if len(failed) > 0:
+            if self.worst_runtime is None:
+                raise RuntimeError("Could not measure the runtime of any order!")
+            for key in failed:
+                estimates[key] = (self.failure_penalty*self.worst_runtime, np.inf)
+                
+        rewards = np.array([-estimates[key][0] for key in keys], dtype=np.float32)
+        variances = np.array([estimates[key][1] for key in keys], dtype=np.float32)
+        return rewards, variances, np.array([key in failed for key in keys])
+    
+    def _update_best(self, runtimes: np.ndarray) -> Tuple[float, float]:
+        runtime, var = self.estimator.estimate(runtimes)
+        if self.best_runtime is None or runtime < self.best_runtime:
+            self.best_runtime = runtime
+        if self.worst_runtime is None or runtime > self.worst_runtime:
+            self.worst_runtime = runtime
+        return runtime, var
+    
+    def _measure(self, act_seqs: Sequence[Array]) -> Sequence[Optional[np.ndarray]]:
+        # Returns the runtimes of every order or None if the measurement failed
+        if self.num_workers <= 1:
+            return [self.measure_fn(act_seq=act_seq, best_runtime=self.best_runtime) 
+                    for act_seq in act_seqs]
+        
+        # Orders are sent as numpy arrays so that the workers do not need to 
+        # transfer jax arrays between processes.
+        act_seqs = [a if type(a) is str else np.asarray(a) for a in act_seqs]
+        results = [None]*len(act_seqs)
+        pending = list(range(len(act_seqs)))
+        for _ in range(self.max_retries+1):
+            failed, broken = [], False
+            with _cpu_environment():
+                pool = self._get_pool()
+                futures = [(i, pool.submit(_measure, act_seqs[i], self.best_runtime)) 
+                            for i in pending]
+            for i, future in futures:
+                try:
+                    results[i] = future.result()
+                except BrokenProcessPool:
+                    failed.append(i)
+                    broken = True
+                except Exception as e:
+                    # Exceptions are deterministic, so only crashes are retried
+                    warnings.warn(f"Measurement of order {act_seqs[i]} failed with {e!r}!")
+            
+            # A crashed worker breaks the whole pool, so it has to be replaced
+            if broken:
+                self.close()
+            pending = failed
+            if len(pending) == 0:
+                break
+        
+        if len(pending) > 0:
+            warnings.warn(f"Could not measure the runtimes of {len(pending)} orders!")
+        return results
+    
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # JAX is multithreaded and therefore not fork-safe
+            ctx = mp.get_context("spawn")
+            xs = [np.asarray(x) for x in self.xs]
+            initargs = (self.num_samples, self.f, xs, self.estimator, 
+                        self.num_workers, self.cpu_affinity, ctx.Value("i", 0))
+            self._pool = ProcessPoolExecutor(self.num_workers, 
+                                            mp_context=ctx,
+                                            initializer=_init_worker,
+                                            initargs=initargs)
+        return self._pool
+        
+    def close(self) -> None:
+        """
+        Shuts down the worker processes.
+        """
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_pool"] = None
+        # Copies, e.g. in spawned processes, start with an empty cache
+        state["cache"] = RuntimeCache(self.cache.capacity)
+        return state
+        
+    
+def _sanitize_variances(variances: np.ndarray) -> np.ndarray:
+    finite = np.isfinite(variances)
+    max_var = np.max(variances[finite], initial=0.)
+    return np.clip(np.where(finite, variances, max_var), 0., None).astype(np.float32)
+
     
 @partial(jax.jit, donate_argnums=(0,), device=jax.devices("cpu")[0])
 def _step(state, action):
     edges, act_seq = state
-    idx = jnp.sum(jnp.where(act_seq > 0, 1, 0)).astype(jnp.int32)
     # Actions go from 0 to num_intermediates-1 
     # and vertices go from 1 to num_intermediates      
     vertex = action + 1
+    # Action 0 can not be told apart from the padding of `act_seq`, so the
+    # position is the number of eliminated vertices instead
     t = jnp.where(get_elimination_order(edges) > 0, 1, 0).sum()
     new_edges, nops = vertex_eliminate(vertex, edges)
     new_edges = new_edges.at[3, 0, t].set(vertex)
@@ -85,16 +436,22 @@ def _step(state, action):
     # Reward is the negative of the multiplication count
     num_eliminated_vertices = get_vertex_mask(new_edges).sum()
     num_intermediates = get_shape(new_edges)[1]
-    new_act_seq = act_seq.at[idx].set(action)
+    new_act_seq = act_seq.at[t].set(action)
     new_state = (new_edges, new_act_seq)
     return new_state, num_eliminated_vertices, num_intermediates, new_act_seq
 
 
-def _get_reward(num_samples: int, f: Callable, *xs, act_seq=None) -> float:
+def _measure_runtimes(num_samples: int, 
+                    f: Callable, 
+                    *xs, 
+                    act_seq=None,
+                    estimator: RuntimeEstimator = None,
+                    best_runtime: float = None) -> np.ndarray:
     if type(act_seq) is str:
         order = act_seq
     else: 
         order = [int(a)+1 for a in act_seq] 
+    estimator = RuntimeEstimator() if estimator is None else estimator
         
     argnums = list(range(len(xs)))
     # TODO: we need a vmap here to get better measurements!
@@ -102,13 +459,77 @@ def _get_reward(num_samples: int, f: Callable, *xs, act_seq=None) -> float:
     xs = [jnp.stack([x]*512, axis=0) for x in xs]
     jac_fn = jax.jit(jacve(vmap_f, order=order, argnums=argnums), device=jax.devices("cpu")[0])
     
-    def measure_time(i, _):
-        start = time.time()
-        jac = jac_fn(*xs)
-        jax.block_until_ready(jac)
-        end = time.time()
-        return i+1, end - start
+    # Every call is timed individually on the host
+    return estimator.measure(lambda: jax.block_until_ready(jac_fn(*xs)), 
+                            max_samples=num_samples, 
+                            best_runtime=best_runtime)
+
+
+def _get_reward(num_samples: int, 
+                f: Callable, 
+                *xs, 
+                act_seq=None, 
+                estimator: RuntimeEstimator = None) -> float:
+    estimator = RuntimeEstimator() if estimator is None else estimator
+    runtimes = _measure_runtimes(num_samples, f, *xs, act_seq=act_seq, estimator=estimator)
+    runtime, _ = estimator.estimate(runtimes)
+    return -runtime
+
+
+@contextmanager
+def _cpu_environment():
+    # Processes spawned within this context only use the CPU so that 
+    # workers do not compete for accelerators
+    jax_platforms = os.environ.get("JAX_PLATFORMS")
+    os.environ["JAX_PLATFORMS"] = "cpu"
+    try:
+        yield
+    finally:
+        if jax_platforms is None:
+            del os.environ["JAX_PLATFORMS"]
+        else:
+            os.environ["JAX_PLATFORMS"] = jax_platforms
+            
+
+def _pin_process(cpus: Sequence[int]) -> None:
+    if not hasattr(os, "sched_setaffinity"):
+        warnings.warn("CPU pinning is not supported on this platform!")
+        return
+    # The affinity is set per thread and JAX might have already started 
+    # its thread pool, so every thread of the process is pinned
+    try:
+        tids = [int(tid) for tid in os.listdir("/proc/self/task")]
+    except FileNotFoundError:
+        tids = [0]
+    for tid in tids:
+        try:
+            os.sched_setaffinity(tid, cpus)
+        except ProcessLookupError:
+            pass
+    
+
+_measure_fn = None
+
+
+def _init_worker(num_samples: int, 
+                f: Callable, 
+                xs: Sequence[np.ndarray], 
+                estimator: RuntimeEstimator,
+                num_workers: int,
+                cpu_affinity: Sequence[int], 
+                counter) -> None:
+    global _measure_fn
+    if cpu_affinity is not None:
+        with counter.get_lock():
+            worker_idx = counter.value % num_workers
+            counter.value += 1
+        cpus_per_worker = len(cpu_affinity) // num_workers
+        start = worker_idx*cpus_per_worker
+        _pin_process(cpu_affinity[start:start+cpus_per_worker])
     
-    _, dts = lax.scan(measure_time, 0, jnp.zeros(num_samples))
-    return -dts[5:].mean()
+    xs = [jnp.asarray(x) for x in xs]
+    _measure_fn = partial(_measure_runtimes, num_samples, f, *xs, estimator=estimator)
+
 
+def _measure(act_seq, best_runtime: float = None) -> np.ndarray:
+    return _measure_fn(act_seq=act_seq, best_runtime=best_runtime)
@@ -0,0 +1,153 @@
+"""
+Statistically robust measurement of the runtime of a function.
+
+Every call is timed individually with `time.perf_counter_ns`. The first calls
+include compilation and cache effects, so they are treated as warmup until
+the timings stop improving. Afterwards samples are taken until the confidence
+interval of the runtime estimate is tight enough, the function is clearly
+slower than the best one measured so far or the sample budget is exhausted.
+Runtimes are estimated with robust estimators, i.e. the median or a trimmed
+mean, and come with the variance of the estimate.
+"""
+import time
+from statistics import NormalDist
+from typing import Callable, Tuple
+
+import numpy as np
+
+
+ESTIMATORS = ("median", "trimmed_mean", "mean")
+
+
+class RuntimeEstimator:
+    """
+    Configuration of the runtime measurement and estimation.
+
+    Args:
+        estimator (str): Either "median", "trimmed_mean" or "mean".
+        trim (float): Fraction of samples that is cut off at each end for the
+                    trimmed mean.
+        min_samples (int): Minimum number of samples after the warmup.
+        max_warmup (int): Maximum number of warmup calls.
+        warmup_rtol (float): The warmup ends with the first call that is not
+                            faster than all previous calls by more than this
+                            relative tolerance.
+        rtol (float): Sampling stops once the half-width of the confidence
+                    interval is below this fraction of the estimate.
+        confidence (float): Confidence level of the confidence interval.
+        cutoff (float): Sampling stops once the lower bound of the confidence
+                        interval exceeds `cutoff` times the best runtime.
+    """
+    estimator: str
+    trim: float
+    min_samples: int
+    max_warmup: int
+    warmup_rtol: float
+    rtol: float
+    confidence: float
+    cutoff: float
+
+    def __init__(self,
+                estimator: str = "median",
+                trim: float = .1,
+                min_samples: int = 10,
+                max_warmup: int = 20,
+                warmup_rtol: float = .05,
+                rtol: float = .02,
+                confidence: float = .95,
+                cutoff: float = 1.5) -> None:
+        if estimator not in ESTIMATORS:
+            raise ValueError(f"Unknown estimator {estimator}, choose one of {ESTIMATORS}!")
+        self.estimator = estimator
+        self.trim = trim
+        self.min_samples = min_samples
+        self.max_warmup = max_warmup
+        self.warmup_rtol = warmup_rtol
+        self.rtol = rtol
+        self.confidence = confidence
+        self.cutoff = cutoff
+
+    def estimate(self, runtimes: np.ndarray) -> Tuple[float, float]:
+        """
+        Estimates the runtime from a set of samples.
+
+        Returns:
+            A tuple with the estimate and its variance.
+        """
+        runtimes = np.sort(np.asarray(runtimes, dtype=np.float64))
+        n = len(runtimes)
+        if n == 0:
+            return np.nan, np.nan
+        if n == 1:
+            return float(runtimes[0]), np.inf
+
+        if self.estimator == "median":
+            # Asymptotic variance of the median with the scale estimated
+            # robustly from the median absolute deviation
+            median = np.median(runtimes)
+            sigma = 1.4826*np.median(np.abs(runtimes - median))
+            return float(median), float(np.pi/2*sigma**2/n)
+
+        if self.estimator == "trimmed_mean":
+            # The variance of the trimmed mean follows from the variance
+            # of the winsorized samples
+            k = int(self.trim*n)
+            trimmed = runtimes[k:n-k]
+            winsorized = np.clip(runtimes, trimmed[0], trimmed[-1])
+            var = np.var(winsorized, ddof=1) / (len(trimmed)/n)**2 / n
+            return float(np.mean(trimmed)), float(var)
+
+        return float(np.mean(runtimes)), float(np.var(runtimes, ddof=1)/n)
+
+    def is_done(self, runtimes: np.ndarray, best_runtime: float = None) -> bool:
+        """
+        Checks whether the runtime is known precisely enough or whether it is
+        clearly worse than `best_runtime`.
+        """
+        if len(runtimes) < self.min_samples:
+            return False
+        runtime, var = self.estimate(runtimes)
+        z = NormalDist().inv_cdf((1.+self.confidence)/2.)
+        half_width = z*np.sqrt(var)
+        if half_width <= self.rtol*runtime:
+            return True
+        return best_runtime is not None and runtime - half_width > self.cutoff*best_runtime
+
+    def measure(self,
+                fn: Callable[[], None],
+                max_samples: int = 100,
+                best_runtime: float = None) -> np.ndarray:
+        """
+        Measures the runtime of `fn` which has to block until its computation
+        is finished.
+
+        Args:
+            fn (Callable): Function without arguments that is timed.
+            max_samples (int): Maximum number of samples after the warmup.
+            best_runtime (float): Best runtime so far in seconds. Sampling
+                                stops early if `fn` is clearly slower.
+
+        Returns:
+            The runtimes after the warmup in seconds.
+        """
+        def timed_call():
+            start = time.perf_counter_ns()
+            fn()
+            return (time.perf_counter_ns() - start)*1e-9
+
+        # The first call includes the compilation and is always discarded
+        timed_call()
+        fastest = timed_call()
+        for _ in range(self.max_warmup-1):
+            dt = timed_call()
+            if dt >= (1.-self.warmup_rtol)*fastest:
+                break
+            fastest = dt
+
+        runtimes = []
+        while len(runtimes) < max_samples:
+            runtimes.append(timed_call())
+            if self.is_done(runtimes, best_runtime):
+                break
+        return np.array(runtimes)
+
@@ -0,0 +1,205 @@
+"""
+Search-based solvers for the vertex elimination game that serve as non-RL
+baselines next to `forward`, `reverse` and `minimal_markowitz`.
+
+`beam_search` keeps the `beam_width` cheapest partial elimination orders. In
+every step all admissible actions of all beam members are expanded with
+`vertex_game.step` and the best children are selected by their cumulative
+number of fmas, optionally plus a Markowitz heuristic for the cost of the
+remaining eliminations. The graph after eliminating a set of vertices does not
+depend on the order in which they were eliminated, so only the cheapest of the
+children that eliminated the same set of vertices is kept.
+
+`branch_and_bound` is an exact depth-first search for small graphs. It
+starts with the best of the baseline orders as upper bound and prunes all
+partial orders that are already at least as expensive as the upper bound or
+as another partial order that eliminated the same set of vertices. If the
+search finishes within its node budget, the returned order is optimal.
+"""
+from functools import partial
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+import jax
+import jax.lax as lax
+import jax.numpy as jnp
+import jax.random as jrand
+
+from chex import Array
+
+from .core import cross_country, get_shape, get_vertex_mask
+from .vertex_game import step
+from .transforms import minimal_markowitz
+from .transforms.markowitz import markowitz_degrees
+
+
+def _expand(edges: Array) -> Tuple[Array, Array]:
+    """
+    Applies all actions to a state at once. Actions that eliminate an already
+    eliminated vertex are invalid and get an infinite cost.
+    """
+    num_v = edges.shape[-1]
+    actions = jnp.arange(num_v)
+    children, rewards, _ = jax.vmap(step, in_axes=(None, 0))(edges, actions)
+    fmas = jnp.where(get_vertex_mask(edges) == 0, -rewards, jnp.iinfo(jnp.int32).max)
+    return children, fmas
+
+
+def _markowitz_heuristic(edges: Array) -> Array:
+    # Sum of the Markowitz degrees of the remaining vertices
+    degrees = markowitz_degrees(edges)
+    return jnp.where(degrees > 0, degrees, 0).sum()
+
+
+@partial(jax.jit, static_argnames=("num_steps", "beam_width", "markowitz_weight"))
+def _beam_search(graph: Array,
+                num_steps: int,
+                beam_width: int,
+                markowitz_weight: float) -> Tuple[Array, Array]:
+    num_v = graph.shape[-1]
+    max_int = jnp.iinfo(jnp.int32).max
+    # Random hashes of the sets of eliminated vertices to detect duplicates
+    bits = jrand.randint(jrand.PRNGKey(0), (num_v,), 1, max_int, dtype=jnp.int32)
+
+    def expand(edges):
+        # Only the costs of the children leave the map, so at most num_v 
+        # children exist at a time
+        children, fmas = _expand(edges)
+        if markowitz_weight > 0.:
+            return fmas, jax.vmap(_markowitz_heuristic)(children)
+        return fmas, jnp.zeros_like(fmas)
+
+    def step_fn(carry, t):
+        beams, costs, hashes, orders = carry
+        fmas, heuristic = lax.map(expand, beams)
+
+        valid = jnp.logical_and(costs[:, None] < max_int, fmas < max_int)
+        child_costs = jnp.where(valid, costs[:, None] + fmas, max_int).reshape(-1)
+        scores = child_costs.astype(jnp.float32)
+        scores += markowitz_weight*heuristic.reshape(-1).astype(jnp.float32)
+        scores = jnp.where(child_costs < max_int, scores, jnp.inf)
+
+        # Keep only the cheapest child of every set of eliminated vertices.
+        # Sorting by hash and score puts it first in its group of duplicates
+        child_hashes = (hashes[:, None] + bits[None, :]).reshape(-1)
+        idxs = jnp.arange(len(scores))
+        perm = jnp.lexsort((idxs, scores, child_hashes))
+        sorted_hashes = child_hashes[perm]
+        is_first = jnp.concatenate((jnp.ones(1, dtype=bool), sorted_hashes[1:] != sorted_hashes[:-1]))
+        scores = scores.at[perm].set(jnp.where(is_first, scores[perm], jnp.inf))
+
+        # Only the selected children are computed again
+        _, best = lax.top_k(-scores, beam_width)
+        parents, actions = best // num_v, best % num_v
+        new_beams, _, _ = jax.vmap(step)(beams[parents], actions)
+        new_costs = jnp.where(jnp.isfinite(scores[best]), child_costs[best], max_int)
+        new_orders = orders[parents].at[:, t].set(actions + 1)
+        return (new_beams, new_costs, child_hashes[best], new_orders), None
+
+    beams = jnp.tile(graph[None], (beam_width, 1, 1, 1))
+    # Only the first beam member is valid in the beginning
+    costs = jnp.full(beam_width, max_int, dtype=jnp.int32).at[0].set(0)
+    root_hash = jnp.sum(jnp.where(graph[1, 0, :] > 0, bits, 0), dtype=jnp.int32)
+    hashes = jnp.full(beam_width, root_hash, dtype=jnp.int32)
+    orders = jnp.zeros((beam_width, num_steps), dtype=jnp.int32)
+    carry = (beams, costs, hashes, orders)
+    (_, costs, _, orders), _ = lax.scan(step_fn, carry, jnp.arange(num_steps))
+    best = jnp.argmin(costs)
+    return orders[best], costs[best]
+
+
+def beam_search(graph: Array,
+                beam_width: int = 8,
+                markowitz_weight: float = 0.) -> Tuple[Array, Array]:
+    """
+    Beam search over the vertex elimination game. The search is compiled for
+    a fixed number of steps which is computed from the vertex mask, so the
+    graph has to be concrete.
+
+    Arguments:
+        graph (Array): Dense computational graph representation.
+        beam_width (int): Number of partial orders that are kept per step.
+        markowitz_weight (float): Weight of the sum of the Markowitz degrees
+                                of the remaining vertices which is added to
+                                the cumulative fmas to rank the partial orders.
+
+    Returns:
+        A tuple that contains the best elimination order found and its
+        number of fmas.
+    """
+    num_steps = int(graph.shape[-1] - jnp.sum(get_vertex_mask(graph) > 0))
+    if num_steps == 0:
+        return jnp.zeros(0, dtype=jnp.int32), jnp.int32(0)
+    return _beam_search(graph, num_steps, beam_width, markowitz_weight)
+
+
+def branch_and_bound(graph: Array,
+                    beam_width: int = 8,
+                    max_nodes: int = 100_000) -> Tuple[Sequence[int], int, bool]:
+    """
+    Exact search for the elimination order with the minimal number of fmas.
+    The number of partial orders grows exponentially with the number of
+    vertices, so this is only feasible for small graphs. The nodes are
+    expanded on the host with the cheapest child first.
+
+    Arguments:
+        graph (Array): Dense computational graph representation.
+        beam_width (int): Beam width of the `beam_search` that provides the
+                        initial upper bound.
+        max_nodes (int): Maximum number of expanded nodes.
+
+    Returns:
+        A tuple that contains the best elimination order found, its number
+        of fmas and whether it is certified to be optimal, i.e. whether the
+        search finished within `max_nodes` expansions.
+    """
+    num_i, num_v = get_shape(graph)
+    expand = jax.jit(_expand)
+
+    # The best baseline order is the initial upper bound
+    fwd_order = list(range(1, num_v+1))
+    mM_order = jax.jit(minimal_markowitz, static_argnums=1)(graph, int(graph[0, 0, 1]))
+    beam_order, _ = beam_search(graph, beam_width)
+    candidates = [[int(v) for v in beam_order], [int(v) for v in mM_order],
+                fwd_order, fwd_order[::-1]]
+    _cross_country = jax.jit(cross_country)
+    upper_bounds = [int(_cross_country(order, graph)[1]) for order in candidates]
+    best_fmas = min(upper_bounds)
+    best_order = candidates[upper_bounds.index(best_fmas)]
+
+    # Cheapest known cost to eliminate a given set of vertices
+    visited: Dict[bytes, int] = {}
+    num_nodes = 0
+    is_optimal = True
+
+    def search(edges, fmas, order):
+        nonlocal best_fmas, best_order, num_nodes, is_optimal
+        mask = np.asarray(get_vertex_mask(edges)) > 0
+        if mask.all():
+            if fmas < best_fmas:
+                best_fmas, best_order = fmas, list(order)
+            return
+        if num_nodes >= max_nodes:
+            is_optimal = False
+            return
+        num_nodes += 1
+
+        children, child_fmas = expand(edges)
+        child_fmas = np.asarray(child_fmas, dtype=np.int64)
+        for action in np.argsort(child_fmas, kind="stable"):
+            if mask[action]:
+                break
+            _fmas = fmas + int(child_fmas[action])
+            if _fmas >= best_fmas:
+                break
+            child_mask = mask.copy()
+            child_mask[action] = True
+            key = child_mask.tobytes()
+            if visited.get(key, best_fmas) <= _fmas:
+                continue
+            visited[key] = _fmas
+            search(children[action], _fmas, order + [int(action)+1])
+
+    search(graph, 0, [])
+    return best_order, best_fmas, is_optimal
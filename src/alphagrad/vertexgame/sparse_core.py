@@ -0,0 +1,316 @@
+"""
+Edge-list version of the vertex elimination procedures in `core.py`.
+
+Instead of the dense `(5, num_i+num_v+1, num_v)` tensor, the computational
+graph is stored as a padded list of edges in COO format. Every column of the
+edge list has the same layout as the entries returned by `utils.sparsify`,
+i.e. (i, j, sparsity type, Jacobian shapes), where `i` is the row and `j` the
+column of the edge in the dense tensor without its header row.
+The edge list has a fixed capacity so that all functions remain JIT-compilable.
+Empty slots have sparsity type 0 and the sentinel index `i = num_i+num_v`,
+such that the list stays sorted by `i*num_v + j` with all empty slots at the
+end. This allows us to look up existing edges with a binary search.
+
+The fma counts are computed with the same sparsity maps as the dense
+implementation and are therefore identical.
+"""
+
+from typing import Sequence, Tuple
+
+import numpy as np
+
+import jax
+import jax.lax as lax
+import jax.numpy as jnp
+
+from chex import Array
+import equinox as eqx
+from equinox import static_field
+
+from .core import sparsity_fmas_map, sparsity_where, get_shape
+
+
+class EdgeList(eqx.Module):
+    """
+    Padded COO representation of a computational graph.
+
+    Attributes:
+        header (Array): The header row of the dense representation with shape
+                        (5, num_v), i.e. graph shape, vertex mask, output mask
+                        and elimination order.
+        edges (Array): Array of shape (7, max_num_edges) that contains the
+                        row and column index, the sparsity type and the
+                        Jacobian shapes of every edge.
+        num_i (int): Number of input vertices.
+        max_degree (int): Upper bound for the number of ingoing and outgoing
+                        edges of any vertex during the elimination.
+    """
+    header: Array
+    edges: Array
+    num_i: int = static_field()
+    max_degree: int = static_field()
+
+
+def _reachability(graph: np.ndarray) -> np.ndarray:
+    """
+    Computes a boolean matrix of shape (num_i+num_v, num_v) that indicates
+    which vertex can reach which intermediate or output vertex. Every edge that
+    can be created during cross-country elimination connects such a pair.
+    Relies on the vertices being numbered in topological order.
+    """
+    num_i, num_v = get_shape(graph)
+    adjacency = graph[0, 1:, :] != 0
+    reach = adjacency.copy()
+    for col in range(num_v):
+        preds = np.nonzero(adjacency[num_i:, col])[0]
+        if len(preds) > 0:
+            reach[:, col] |= np.any(reach[:, preds], axis=1)
+    return reach
+
+
+def _max_degree(reach: np.ndarray, num_i: int) -> int:
+    in_degrees = reach.sum(axis=0)
+    out_degrees = reach[num_i:, :].sum(axis=1)
+    return max(int(in_degrees.max(initial=0)), int(out_degrees.max(initial=0)), 1)
+
+
+def get_max_degree(graph: Array) -> int:
+    """
+    Computes an upper bound for the in- and out-degree of any vertex during
+    the elimination with an arbitrary order. This function is not 
+    JIT-compilable.
+    """
+    graph = np.asarray(graph)
+    num_i, _ = get_shape(graph)
+    return _max_degree(_reachability(graph), num_i)
+
+
+def make_edge_list(graph: Array,
+                    max_num_edges: int = None,
+                    max_degree: int = None) -> EdgeList:
+    """
+    Converts the dense representation of a computational graph into a padded
+    edge list. This function is not JIT-compilable.
+    If no capacity is given, it is derived from the transitive closure of the
+    graph which bounds the number of edges for every possible elimination order.
+
+    Arguments:
+        graph (Array): Dense computational graph representation.
+        max_num_edges (int): Capacity of the edge list.
+        max_degree (int): Upper bound for the in- and out-degree of a vertex.
+
+    Returns:
+        An `EdgeList` that contains the same graph.
+    """
+    graph = np.asarray(graph)
+    num_i, num_v = get_shape(graph)
+    reach = _reachability(graph)
+
+    if max_num_edges is None:
+        max_num_edges = max(int(reach.sum()), 1)
+    if max_degree is None:
+        max_degree = _max_degree(reach, num_i)
+
+    rows, cols = np.nonzero(graph[0, 1:, :])
+    num_edges = len(rows)
+    if num_edges > max_num_edges:
+        raise ValueError(f"Graph with {num_edges} edges does not fit into "
+                        f"edge list of size {max_num_edges}!")
+
+    edges = np.zeros((7, max_num_edges), dtype=np.int32)
+    edges[0, :] = num_i + num_v
+    edges[0, :num_edges] = rows
+    edges[1, :num_edges] = cols
+    edges[2:, :num_edges] = graph[:, rows+1, cols]
+
+    header = jnp.asarray(graph[:, 0, :], dtype=jnp.int32)
+    return EdgeList(header, jnp.asarray(edges), int(num_i), int(max_degree))
+
+
+def to_graph(edge_list: EdgeList) -> Array:
+    """
+    Fully JIT-compilable function that converts the edge list back into
+    the dense representation of the computational graph.
+
+    Arguments:
+        edge_list (EdgeList): Edge list representation of the graph.
+
+    Returns:
+        Dense computational graph representation.
+    """
+    num_i, num_v = get_edge_list_shape(edge_list)
+    graph = jnp.zeros((5, num_i+num_v+1, num_v), dtype=jnp.int32)
+    graph = graph.at[:, 0, :].set(edge_list.header)
+    i, j = edge_list.edges[0], edge_list.edges[1]
+    # Empty slots point to row num_i+num_v+1 and are dropped
+    graph = graph.at[:, i+1, j].set(edge_list.edges[2:], mode="drop")
+    return graph
+
+
+def get_edge_list_shape(edge_list: EdgeList) -> Tuple[int, int]:
+    return edge_list.num_i, edge_list.header.shape[1]
+
+
+def get_num_edges(edge_list: EdgeList) -> Array:
+    return jnp.sum(edge_list.edges[2] != 0)
+
+
+def _sort_edges(edges: Array, num_v: int) -> Array:
+    keys = edges[0]*num_v + edges[1]
+    output = lax.sort((keys, *edges), num_keys=1)
+    return jnp.stack(output[1:])
+
+
+def vertex_eliminate(vertex: int, edge_list: EdgeList) -> Tuple[EdgeList, int]:
+    """
+    Fully JIT-compilable function that implements the vertex-elimination
+    procedure on the edge list representation. Only the at most `max_degree`
+    ingoing and outgoing edges of the vertex are combined, so apart from a
+    linear pass over the edge list, the cost is independent of the size of
+    the graph.
+
+    Arguments:
+        vertex (int): Vertex we want to eliminate.
+        edge_list (EdgeList): Edge list representation of the
+                            computational graph.
+
+    Returns:
+        A tuple that contains the new edge list of the computational graph
+        and the number of fmas (fused multiplication-addition ops).
+    """
+    num_i, num_v = get_edge_list_shape(edge_list)
+    max_degree = edge_list.max_degree
+    edges = edge_list.edges
+    max_num_edges = edges.shape[1]
+    sentinel = num_i + num_v
+
+    i, j, jacobians = edges[0], edges[1], edges[2:]
+    is_edge = jacobians[0] != 0
+    in_mask = jnp.logical_and(is_edge, j == vertex-1)
+    out_mask = jnp.logical_and(is_edge, i == num_i+vertex-1)
+
+    # Empty entries point to index max_num_edges which is out of bounds
+    in_slots = jnp.nonzero(in_mask, size=max_degree, fill_value=max_num_edges)[0]
+    out_slots = jnp.nonzero(out_mask, size=max_degree, fill_value=max_num_edges)[0]
+    in_edges = jacobians.at[:, in_slots].get(mode="fill", fill_value=0)
+    out_edges = jacobians.at[:, out_slots].get(mode="fill", fill_value=0)
+
+    # Calculate the fmas and the sparsity type of every new edge, the result
+    # has shape (max_degree, max_degree) with out edges along the first axis
+    new_sparsity, fmas = jax.vmap(sparsity_fmas_map, in_axes=(None, 1))(in_edges, out_edges)
+    fmas = jnp.sum(fmas)
+
+    in_valid = in_slots < max_num_edges
+    out_valid = out_slots < max_num_edges
+    is_new_edge = jnp.logical_and(out_valid[:, jnp.newaxis], in_valid[jnp.newaxis, :])
+
+    new_i = jnp.broadcast_to(i.at[in_slots].get(mode="fill", fill_value=sentinel)[jnp.newaxis, :],
+                            is_new_edge.shape)
+    new_j = jnp.broadcast_to(j.at[out_slots].get(mode="fill", fill_value=0)[:, jnp.newaxis],
+                            is_new_edge.shape)
+
+    # Look up edges that already exist with a binary search
+    keys = i*num_v + j
+    new_keys = new_i*num_v + new_j
+    pos = jnp.clip(jnp.searchsorted(keys, new_keys), 0, max_num_edges-1)
+    exists = jnp.logical_and(keys[pos] == new_keys, is_new_edge)
+
+    # Calculate resulting sparsity type and Jacobian shapes
+    old_sparsity = jnp.where(exists, jacobians[0, pos], 0)
+    new_sparsity = sparsity_where(old_sparsity.flatten(), new_sparsity.flatten())
+    new_outs = jnp.broadcast_to(out_edges[1:3, :, jnp.newaxis], (2, *is_new_edge.shape))
+    new_ins = jnp.broadcast_to(in_edges[3:, jnp.newaxis, :], (2, *is_new_edge.shape))
+    new_jacobians = jnp.concatenate((new_sparsity[jnp.newaxis, :],
+                                    new_outs.reshape(2, -1),
+                                    new_ins.reshape(2, -1)), axis=0)
+    new_edges = jnp.concatenate((new_i.reshape(1, -1),
+                                new_j.reshape(1, -1),
+                                new_jacobians), axis=0)
+
+    # Update existing edges
+    update_slots = jnp.where(exists, pos, max_num_edges).flatten()
+    edges = edges.at[:, update_slots].set(new_edges, mode="drop")
+
+    # Delete old edges
+    empty_edge = jnp.zeros((7, 1), dtype=edges.dtype).at[0].set(sentinel)
+    edges = edges.at[:, in_slots].set(empty_edge, mode="drop")
+    edges = edges.at[:, out_slots].set(empty_edge, mode="drop")
+
+    # Add fill-in edges to the free slots
+    is_fill_in = jnp.logical_and(is_new_edge, jnp.logical_not(exists)).flatten()
+    num_free_slots = min(max_degree*max_degree, max_num_edges)
+    free_slots = jnp.nonzero(edges[2] == 0, size=num_free_slots, fill_value=max_num_edges)[0]
+    rank = jnp.cumsum(is_fill_in) - 1
+    fill_slots = free_slots.at[rank].get(mode="fill", fill_value=max_num_edges)
+    fill_slots = jnp.where(is_fill_in, fill_slots, max_num_edges)
+    edges = edges.at[:, fill_slots].set(new_edges, mode="drop")
+
+    edges = _sort_edges(edges, num_v)
+    header = edge_list.header.at[1, vertex-1].set(1)
+    return EdgeList(header, edges, num_i, max_degree), fmas
+
+
+def cross_country(order: Sequence[int], edge_list: EdgeList) -> Tuple[EdgeList, int]:
+    """
+    Fully JIT-compilable function that implements cross-country elimination
+    on the edge list according to the given order.
+
+    Arguments:
+        order (Sequence[int]): Elimination order of the vertices.
+        edge_list (EdgeList): Edge list representation of the
+                            computational graph.
+
+    Returns:
+        A tuple that contains the new edge list of the computational graph
+        and the number of fmas (fused multiplication-addition ops).
+    """
+    def cc_fn(carry, vertex):
+        _edge_list, fmas = carry
+        not_masked = jnp.logical_not(_edge_list.header.at[1, vertex-1].get() > 0)
+
+        _edge_list, _fmas = lax.cond(not_masked,
+                                    lambda e: vertex_eliminate(vertex, e),
+                                    lambda e: (e, 0),
+                                    _edge_list)
+        fmas += _fmas
+        carry = (_edge_list, fmas)
+        return carry, _fmas
+    vertices = jnp.array(order)
+    output, _ = lax.scan(cc_fn, (edge_list, 0), vertices)
+    return output
+
+
+def forward(edge_list: EdgeList) -> Tuple[EdgeList, int]:
+    """
+    Fully JIT-compilable function that implements forward-mode AD on the
+    edge list by eliminating the vertices in sequential order 1,2,3,...,n-1,n.
+
+    Arguments:
+        edge_list (EdgeList): Edge list representation of the
+                            computational graph.
+
+    Returns:
+        A tuple that contains the new edge list of the computational graph
+        and the number of fmas (fused multiplication-addition ops).
+    """
+    num_i, num_vo = get_edge_list_shape(edge_list)
+    order = jnp.arange(1, num_vo+1)
+    return cross_country(order, edge_list)
+
+
+def reverse(edge_list: EdgeList) -> Tuple[EdgeList, int]:
+    """
+    Fully JIT-compilable function that implements reverse-mode AD on the
+    edge list by eliminating the vertices in sequential order n,n-1,...,2,1.
+
+    Arguments:
+        edge_list (EdgeList): Edge list representation of the
+                            computational graph.
+
+    Returns:
+        A tuple that contains the new edge list of the computational graph
+        and the number of fmas (fused multiplication-addition ops).
+    """
+    num_i, num_vo = get_edge_list_shape(edge_list)
+    order = jnp.arange(1, num_vo+1)[::-1]
+    return cross_country(order, edge_list)
@@ -3,4 +3,4 @@ from .symmetry import swap_inputs, swap_intermediates, swap_outputs
 # from .preelimination import safe_preeliminations
 from .clean import connectivity_checker, clean
 from .compression import compress
-from .markowitz import minimal_markowitz, safe_preeliminations
\ No newline at end of file
+from .markowitz import minimal_markowitz, safe_preeliminations, markowitz_degrees
\ No newline at end of file
@@ -1,5 +1,5 @@
 from functools import partial
-from typing import Sequence
+from typing import Sequence, Tuple
 
 import jax
 import jax.lax as lax
@@ -7,7 +7,62 @@ import jax.numpy as jnp
 
 from chex import Array
 
-from ..core import vertex_eliminate, get_shape
+from ..core import vertex_eliminate, get_shape, get_vertex_mask, OFFSET
+
+
+# Lookup tables for the branch-free computation of the Markowitz degree.
+# Row idx is the sparsity type of the edge, col idx is the Jacobian shape 
+# component, i.e. (out_dim1, out_dim2, primal_dim1, primal_dim2).
+# The number of edges that a single edge contributes is the product of the
+# selected shape components. 1 means selected, 0 means masked away.
+# They reproduce `count_in_edges` and `count_out_edges` respectively.
+#              shape component  1  2  3  4    sparsity type
+IN_EDGE_COUNT_MAP = jnp.array([[0, 1, 0, 0],  # -10
+                               [0, 1, 0, 0],  # -9
+                               [0, 1, 0, 0],  # -8
+                               [0, 1, 0, 0],  # -7
+                               [0, 1, 0, 0],  # -6
+                               [0, 1, 0, 0],  # -5
+                               [0, 1, 0, 0],  # -4
+                               [0, 1, 0, 0],  # -3
+                               [0, 1, 0, 0],  # -2
+                               [1, 0, 0, 0],  # -1
+                               [1, 0, 0, 0],  # 0
+                               [0, 0, 1, 1],  # 1
+                               [0, 1, 0, 0],  # 2
+                               [1, 0, 0, 0],  # 3
+                               [1, 0, 0, 0],  # 4
+                               [0, 1, 0, 0],  # 5
+                               [0, 0, 0, 0],  # 6
+                               [0, 0, 0, 0],  # 7
+                               [0, 0, 0, 0],  # 8
+                               [0, 1, 0, 0],  # 9
+                               [0, 1, 0, 0],  # 10
+                               [0, 1, 0, 0]]) # 11
+
+#               shape component  1  2  3  4    sparsity type
+OUT_EDGE_COUNT_MAP = jnp.array([[0, 1, 0, 0],  # -10
+                                [0, 1, 0, 0],  # -9
+                                [0, 1, 0, 0],  # -8
+                                [0, 1, 0, 0],  # -7
+                                [0, 1, 0, 0],  # -6
+                                [0, 1, 0, 0],  # -5
+                                [0, 1, 0, 0],  # -4
+                                [0, 1, 0, 0],  # -3
+                                [0, 1, 0, 0],  # -2
+                                [1, 0, 0, 0],  # -1
+                                [1, 0, 0, 0],  # 0
+                                [1, 1, 0, 0],  # 1
+                                [0, 1, 0, 0],  # 2
+                                [1, 0, 0, 0],  # 3
+                                [1, 0, 0, 0],  # 4
+                                [0, 1, 0, 0],  # 5
+                                [0, 0, 0, 0],  # 6
+                                [0, 0, 0, 0],  # 7
+                                [0, 0, 0, 0],  # 8
+                                [0, 1, 0, 0],  # 9
+                                [0, 1, 0, 0],  # 10
+                                [0, 1, 0, 0]]) # 11
 
 
 def safe_preeliminations(edges: Array, return_order: bool = False):
@@ -16,16 +71,18 @@ def safe_preeliminations(edges: Array, return_order: bool = False):
     """
     num_i, num_vo = get_shape(edges)
     
-    def loop_fn(_edges, _):
-        degree, mMd_vertex = get_minimal_markowitz(_edges)
-        _edges, vertex = lax.cond(degree < 2,
-                                lambda e: (vertex_eliminate(mMd_vertex, e)[0], mMd_vertex),
-                                lambda e: (e, -1), 
-                                _edges)
-        return _edges, vertex
+    def loop_fn(carry, _):
+        _edges, _degrees = carry
+        degree, mMd_vertex = select_minimal_markowitz(_edges, _degrees)
+        _edges, _degrees, vertex = lax.cond(degree < 2,
+                                            lambda e, d: (*eliminate_and_update(mMd_vertex, e, d), mMd_vertex),
+                                            lambda e, d: (e, d, -1), 
+                                            _edges, _degrees)
+        return (_edges, _degrees), vertex
     
     it = jnp.arange(1, num_vo+1)
-    edges, preelim_order = lax.scan(loop_fn, edges, it)
+    degrees = markowitz_degrees(edges)
+    (edges, _), preelim_order = lax.scan(loop_fn, (edges, degrees), it)
     
     if return_order:
         return edges, [int(p) for p in preelim_order if p > 0]
@@ -33,13 +90,21 @@ def safe_preeliminations(edges: Array, return_order: bool = False):
 
 @partial(jax.jit, static_argnums=1)
 def minimal_markowitz(edges: Array, num_v: int) -> Sequence[int]:    
-    def loop_fn(_edges, _):
-        degree, mMd_vertex = get_minimal_markowitz(_edges)
-        _edges, _ = vertex_eliminate(mMd_vertex, _edges)
-        return _edges, mMd_vertex
+    """
+    Computes the elimination order with regard to the minimal Markowitz degree.
+    Instead of recomputing the Markowitz degrees of all vertices after every 
+    elimination, we keep them in the carry and only update the degrees of the
+    neighbours of the eliminated vertex.
+    """
+    def loop_fn(carry, _):
+        _edges, _degrees = carry
+        degree, mMd_vertex = select_minimal_markowitz(_edges, _degrees)
+        _edges, _degrees = eliminate_and_update(mMd_vertex, _edges, _degrees)
+        return (_edges, _degrees), mMd_vertex
 
     it = jnp.arange(1, num_v+1)
-    _, idxs = lax.scan(loop_fn, edges, it)
+    degrees = markowitz_degrees(edges)
+    _, idxs = lax.scan(loop_fn, (edges, degrees), it)
 
     # TODO make this jittable, 
     # removed if edges.at[2, 0, i-1].get() == 0 else -1
@@ -53,21 +118,86 @@ def get_minimal_markowitz(edges: Array, degrees: bool = False) -> Sequence[int]:
     To do this it calculates the markowitz degree of a single vertex within a
     group of similar vertices, i.e. for a single component of a tensor vertex.
     """    
-    def loop_fn(carry, vertex):
-        is_eliminated_vertex = edges.at[1, 0, vertex-1].get() == 1
-        markowitz_degree = lax.cond(is_eliminated_vertex,
-                                    lambda v, e: -1, 
-                                    lambda v, e: calc_markowitz_degree(v, e), 
-                                    vertex, edges)
-        return carry, markowitz_degree
-    
-    vertices = jnp.arange(1, edges.shape[-1]+1)
-    _, markowitz_degrees = lax.scan(loop_fn, (), vertices)
+    _degrees = markowitz_degrees(edges)
     if degrees:
-        print(markowitz_degrees)
+        print(_degrees)
+    return select_minimal_markowitz(edges, _degrees)
+
+
+def select_minimal_markowitz(edges: Array, degrees: Array) -> Tuple[int, int]:
+    """
+    Selects the vertex with minimal Markowitz degree among the vertices that 
+    have not been eliminated yet. Eliminated vertices have degree -1 and are
+    thus sorted to the front.
+    """
     idx = jnp.sum(edges.at[1, 0, :].get())
-    mMd_vertex = jnp.argsort(markowitz_degrees)[idx]+1
-    return markowitz_degrees[mMd_vertex-1], mMd_vertex
+    mMd_vertex = jnp.argsort(degrees)[idx]+1
+    return degrees[mMd_vertex-1], mMd_vertex
+
+
+def _edge_counts(jacobians: Array, count_map: Array) -> Array:
+    """
+    Computes the number of scalar edges that every edge in `jacobians` 
+    represents. `jacobians` has the sparsity type and Jacobian shapes in the
+    first axis and arbitrary trailing axes.
+    """
+    sparsity_types = jacobians[0].astype(jnp.int32) + OFFSET
+    mask = jnp.moveaxis(count_map[sparsity_types], -1, 0)
+    return jnp.prod(jnp.where(mask > 0, jacobians[1:], 1), axis=0)
+
+
+def markowitz_degrees(edges: Array) -> Array:
+    """
+    Branch-free computation of the Markowitz degrees of all vertices at once.
+    The number of ingoing and outgoing edges is looked up from the sparsity
+    types with `IN_EDGE_COUNT_MAP` and `OUT_EDGE_COUNT_MAP` instead of 
+    walking the edges one by one. Eliminated vertices are assigned the 
+    degree -1.
+    """
+    num_i, num_v = get_shape(edges)
+    jacobians = edges.at[:, 1:, :].get()
+    in_edge_counts = _edge_counts(jacobians[:, num_i:, :], IN_EDGE_COUNT_MAP).sum(axis=1)
+    out_edge_counts = _edge_counts(jacobians, OUT_EDGE_COUNT_MAP).sum(axis=0)
+    degrees = in_edge_counts * out_edge_counts
+    return jnp.where(get_vertex_mask(edges) == 1, -1, degrees)
+
+
+def markowitz_degree(vertex: int, edges: Array) -> int:
+    """
+    Branch-free computation of the Markowitz degree of a single vertex.
+    """
+    num_i, num_v = get_shape(edges)
+    in_edge_slice = edges.at[:, vertex+num_i, :].get()
+    out_edge_slice = edges.at[:, 1:, vertex-1].get()
+    in_edge_count = _edge_counts(in_edge_slice, IN_EDGE_COUNT_MAP).sum()
+    out_edge_count = _edge_counts(out_edge_slice, OUT_EDGE_COUNT_MAP).sum()
+    is_eliminated_vertex = edges.at[1, 0, vertex-1].get() == 1
+    return jnp.where(is_eliminated_vertex, -1, in_edge_count * out_edge_count)
+
+
+def eliminate_and_update(vertex: int, 
+                        edges: Array, 
+                        degrees: Array) -> Tuple[Array, Array]:
+    """
+    Eliminates the given vertex and updates the Markowitz degrees. Only the
+    predecessors and successors of the eliminated vertex gain or lose edges,
+    so only their degrees are recomputed.
+    """
+    num_i, num_v = get_shape(edges)
+    preds = edges.at[0, num_i+1:, vertex-1].get() != 0
+    succs = edges.at[0, num_i+vertex, :].get() != 0
+    affected = jnp.logical_or(preds, succs).at[vertex-1].set(True)
+    affected_vertices = jnp.nonzero(affected, size=num_v, fill_value=-1)[0] + 1
+    
+    edges, _ = vertex_eliminate(vertex, edges)
+
+    def update_fn(i, _degrees):
+        v = affected_vertices[i]
+        return _degrees.at[v-1].set(markowitz_degree(v, edges))
+
+    num_affected = jnp.sum(affected)
+    degrees = lax.fori_loop(0, num_affected, update_fn, degrees)
+    return edges, degrees
 
 
 def calc_markowitz_degree(vertex: int, edges: Array):
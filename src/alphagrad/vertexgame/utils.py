@@ -51,40 +51,164 @@ def write(fname: str, samples: Tuple[str, Array]):
         
         if idx + batchsize > num_samples:
             samples = samples[0:num_samples-idx]
+            batchsize = len(samples)
             print("Maximum file size reached!")
         
         code_dset = file["data/code"]
         header_dset = file["data/graph_header"]
         graph_dset = file["data/graph"]
         
+        # Resizable datasets grow with every write
+        if code_dset.shape[0] < idx + batchsize:
+            for dset in (code_dset, header_dset, graph_dset):
+                dset.resize(idx + batchsize, axis=0)
+        
+        columnar = header.attrs.get("layout", "interleaved") == "columnar"
+        
         print(samples[0][1])
         code_dset[idx:idx+batchsize] = [sample[0] for sample in samples]
         header_dset[idx:idx+batchsize] = [sample[1] for sample in samples]
-        graph_dset[idx:idx+batchsize] = [sample[2] for sample in samples]
+        # Samplers return the interleaved representation of `sparsify`
+        graph_dset[idx:idx+batchsize] = [to_columnar(sample[2]) if columnar else sample[2] 
+                                        for sample in samples]
     
         header.attrs["current_idx"] = idx + batchsize
         
         
-def create(fname: str, num_samples: int, max_shape: Sequence[int] = (20, 105, 20)):
+def _get_compression_kwargs(compression: str = None) -> dict:
+    """
+    Translates the name of a compression filter into the arguments of
+    `create_dataset`. `gzip` and `lzf` are built into h5py, `lz4` requires
+    the optional `hdf5plugin` package.
+    """
+    if compression is None:
+        return {}
+    if compression == "lz4":
+        try:
+            import hdf5plugin
+        except ImportError:
+            raise ImportError("lz4 compression requires `hdf5plugin`, "
+                            "install it with `pip install hdf5plugin`!")
+        return dict(hdf5plugin.LZ4())
+    if compression in ("gzip", "lzf"):
+        return {"compression": compression}
+    raise ValueError(f"Unknown compression {compression}!")
+
+        
+def create(fname: str, 
+            num_samples: int, 
+            max_shape: Sequence[int] = (20, 105, 20), 
+            columnar: bool = False,
+            chunksize: int = None,
+            compression: str = None,
+            resizable: bool = False):
+    """
+    Creates a new dataset file. If `columnar` is True, the sparse graphs are
+    stored in the columnar layout of `sparsify`.
+    
+    Args:
+        fname (str): Name of the file.
+        num_samples (int): Maximum number of samples of the file.
+        max_shape (Sequence[int]): Storage shape of the graphs.
+        columnar (bool): Whether to use the columnar edge layout.
+        chunksize (int): Number of samples per chunk. Should be aligned with
+                        the batchsize that is used for reading. If None, the
+                        datasets are contiguous unless chunking is required.
+        compression (str): Compression filter for the datasets, i.e. `gzip`, 
+                        `lzf` or `lz4`. Note that for the variable-length edges
+                        HDF5 only compresses the references into the heap.
+        resizable (bool): If True, the datasets start empty and grow with 
+                        every `write` up to `num_samples` instead of being
+                        preallocated.
+    """
     assert os.path.isfile(fname) == False
     max_v = max_shape[1]
     
+    kwargs = _get_compression_kwargs(compression)
+    if resizable:
+        kwargs["maxshape"] = (None,)
+    elif chunksize is not None:
+        # Chunks must not be larger than fixed-size datasets
+        chunksize = max(1, min(chunksize, num_samples))
+    chunks = (chunksize,) if chunksize is not None else None
+    if chunks is None and len(kwargs) > 0:
+        chunks = True
+    size = 0 if resizable else num_samples
+    
     with h5py.File(fname, "w") as file:
         header = file.create_group("header", (1,))
         header.attrs["num_samples"] = num_samples
         header.attrs["max_graph_shape"] = max_shape
         header.attrs["current_idx"] = 0
+        header.attrs["layout"] = "columnar" if columnar else "interleaved"
         
         data = file.create_group("data")
         str_dtype = h5py.string_dtype(encoding="utf-8")
-        source_code = file.create_dataset("data/code", (num_samples,), dtype=str_dtype)
+        source_code = file.create_dataset("data/code", (size,), dtype=str_dtype,
+                                        chunks=chunks, **kwargs)
         
         header_dims = (5, max_v)
-        graph_header = file.create_dataset("data/graph_header", (num_samples,)+header_dims, dtype="i4")
+        header_kwargs = dict(kwargs)
+        if "maxshape" in kwargs:
+            header_kwargs["maxshape"] = (None,)+header_dims
+        header_chunks = (chunksize,)+header_dims if chunksize is not None else chunks
+        graph_header = file.create_dataset("data/graph_header", (size,)+header_dims, dtype="i4",
+                                        chunks=header_chunks, **header_kwargs)
         
         graph_dtype = h5py.vlen_dtype(np.int32)
-        edges = file.create_dataset("data/graph", (num_samples,), dtype=graph_dtype)
+        edges = file.create_dataset("data/graph", (size,), dtype=graph_dtype,
+                                    chunks=chunks, **kwargs)
+
+
+def compact(fname: str, 
+            out_fname: str = None,
+            chunksize: int = None,
+            compression: str = None,
+            resizable: bool = False,
+            batchsize: int = 4096) -> str:
+    """
+    Rewrites a dataset file with a new storage layout. Only the samples that
+    were actually written, i.e. up to `current_idx`, are copied, so unused
+    preallocated rows are removed. The edge layout is preserved.
+    
+    Args:
+        fname (str): Name of the file.
+        out_fname (str): Name of the new file. If None, `fname` is replaced.
+        chunksize, compression, resizable: See `create`.
+        batchsize (int): Number of samples that are copied at once.
+    
+    Returns:
+        The name of the new file.
+    """
+    assert os.path.isfile(fname) == True
+    tmp_fname = fname + ".compact.tmp" if out_fname is None else out_fname
+    
+    with h5py.File(fname, "r") as file:
+        header = file["header"]
+        num_samples = int(header.attrs["current_idx"])
+        columnar = header.attrs.get("layout", "interleaved") == "columnar"
+        create(tmp_fname, num_samples, header.attrs["max_graph_shape"], columnar=columnar, 
+                chunksize=chunksize, compression=compression, resizable=resizable)
         
+        with h5py.File(tmp_fname, "a") as out_file:
+            names = ("data/code", "data/graph_header", "data/graph")
+            if resizable:
+                for name in names:
+                    out_file[name].resize(num_samples, axis=0)
+            # Copy the edges as they are since they are already in the right layout
+            for start in range(0, num_samples, batchsize):
+                stop = min(start+batchsize, num_samples)
+                out_file["data/code"][start:stop] = file["data/code"][start:stop]
+                out_file["data/graph_header"][start:stop] = file["data/graph_header"][start:stop]
+                # Object arrays of equally long edge arrays are not accepted by h5py
+                out_file["data/graph"][start:stop] = list(file["data/graph"][start:stop])
+            out_file["header"].attrs["current_idx"] = num_samples
+            
+    if out_fname is None:
+        os.replace(tmp_fname, fname)
+        return fname
+    return out_fname
+
 
 def delete(fname: str):
     os.remove(fname)
@@ -121,56 +245,82 @@ def read_file_size(fname: str) -> int:
     """
     assert os.path.isfile(fname) == True
     
-    with h5py.File(fname, "a") as file:
+    with h5py.File(fname, "r") as file:
         header = file["header"]
-        return header.attrs["num_samples"]
+        # Resizable files only contain the samples that were written so far
+        return min(int(header.attrs["num_samples"]), file["data/graph"].shape[0])
 
 
-def sparsify(edges: Array) -> Tuple[Array, Array]:
+def read_layout(fname: str) -> bool:
+    """
+    Returns whether the sparse graphs in the file are stored in columnar 
+    layout. Files without a layout attribute are interleaved.
+    """
+    assert os.path.isfile(fname) == True
+    
+    with h5py.File(fname, "r") as file:
+        return file["header"].attrs.get("layout", "interleaved") == "columnar"
+
+
+def sparsify(edges: Array, columnar: bool = False) -> Tuple[Array, Array]:
     """
     Function that takes in a 3d tensor that is the representation of a 
     computational graph and turns it into a sparsified version where we
     get a list of entries with corresponding values in the format
     (i, j, sparsity type, Jacobian shapes).
     This means it contains only existing edges.
+    The edges are gathered with a single fancy-index on the host.
 
     Args:
         edges (Array): Computational graph representation.
+        columnar (bool): If True, the entries are stored column by column,
+                        i.e. first all i, then all j, all sparsity types etc.
+                        Otherwise the 7 values of every edge are stored 
+                        consecutively.
     """
-    header = edges.at[:, 0, :].get()
+    edges = np.asarray(edges)
+    header = edges[:, 0, :]
     
-    sparsity_map = edges.at[0, 1:, :].get()
-    nonzeros = jnp.nonzero(sparsity_map)
-
-    sparse_edges = []
-    for i, j in zip(nonzeros[0], nonzeros[1]):
-        edge = edges.at[:, i+1, j].get()
-        idxs = jnp.array([i, j])
-        edge = jnp.concatenate((idxs, edge))
-        sparse_edges.append(edge)
+    i, j = np.nonzero(edges[0, 1:, :])
+    sparse_edges = np.concatenate((i[np.newaxis], j[np.newaxis], edges[:, i+1, j]), axis=0)
+    sparse_edges = sparse_edges.astype(np.int32)
     
-    return header, jnp.concatenate(sparse_edges, axis=0)
+    if not columnar:
+        sparse_edges = sparse_edges.T
+    return header, sparse_edges.ravel()
+
+
+def to_columnar(edges: Array) -> Array:
+    """
+    Converts the interleaved sparse representation returned by `sparsify`
+    into the columnar one.
+    """
+    return np.asarray(edges).reshape(-1, 7).T.ravel()
     
 
-def densify(header: Array, edges: Array, shape: Sequence[int] = [20, 105, 20]) -> Array:
+def densify(header: Array, 
+            edges: Array, 
+            shape: Sequence[int] = [20, 105, 20],
+            columnar: bool = False) -> Array:
     """
     Function that takes in the sparsified representation of a computational
     graph and turns it into a single dense 3d tensor again.
     Since data is loaded from hdf5 into numpy arrays, we use numpy to 
     reassemble the computational graph representation instead of jax.numpy.
+    All edges are written with a single scatter.
 
     Args:
         header (Array): Computational graph representation.
         edges (Sequence[Array]): Computational graph representation containing
                                 only nonzero entries, i.e. existing edges.
+        shape (Sequence[int]): Storage shape of the dense representation.
+        columnar (bool): Whether `edges` is in columnar layout.
     """    
     dense_edges = make_empty_edges(shape)
     dense_edges[:, 0, :] = header
 
-    for n in range(0, edges.shape[0], 7):
-        edge = edges[n:n+7]
-        i, j = edge[0:2]
-        val = edge[2:]
-        dense_edges[:, i+1, j] = val
+    edges = np.asarray(edges)
+    edges = edges.reshape(7, -1) if columnar else edges.reshape(-1, 7).T
+    dense_edges[:, edges[0]+1, edges[1]] = edges[2:]
     return dense_edges
 
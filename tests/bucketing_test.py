@@ -0,0 +1,63 @@
+import unittest
+
+import jax
+import jax.numpy as jnp
+import jax.random as jrand
+
+from alphagrad.vertexgame import (make_graph, embed, forward, reverse, 
+                                vertex_eliminate, sparsify, get_bucket, 
+                                pad_to_bucket)
+from alphagrad.vertexgame.bucketing import (get_effective_shape, 
+                                            get_sparse_effective_shape)
+
+
+def Perceptron(x, W1, b1, W2, b2):
+    h = jnp.tanh(W1 @ x + b1)
+    o = W2 @ h + b2
+    return jnp.sum(o**2), jnp.log(h.sum())
+
+
+BUCKETS = [[10, 30, 10], [15, 60, 15], [20, 105, 20]]
+
+
+class BucketingTest(unittest.TestCase):
+    def setUp(self):
+        self.graph = make_graph(Perceptron, jnp.ones(4), jnp.ones((8, 4)), jnp.ones(8), 
+                                jnp.ones((3, 8)), jnp.ones(3))
+        
+    def test_get_bucket(self):
+        self.assertEqual(get_bucket([5, 20, 2], BUCKETS), (10, 30, 10))
+        self.assertEqual(get_bucket([11, 20, 2], BUCKETS), (15, 60, 15))
+        self.assertEqual(get_bucket([5, 61, 2], BUCKETS), (20, 105, 20))
+        with self.assertRaises(ValueError):
+            get_bucket([21, 20, 2], BUCKETS)
+    
+    def test_pad_to_bucket(self):
+        # Graph padded to the global storage shape is moved to the smallest bucket
+        storage_graph = embed(jrand.PRNGKey(0), self.graph, [20, 105, 20])
+        self.assertEqual(get_effective_shape(storage_graph), 
+                        get_effective_shape(self.graph))
+        
+        bucket_graph = pad_to_bucket(storage_graph, BUCKETS)
+        self.assertEqual(bucket_graph.shape, (5, 41, 30))
+        self.assertTrue(jnp.all(bucket_graph == embed(jrand.PRNGKey(0), self.graph, [10, 30, 10])))
+        
+        for fn in (forward, reverse):
+            _, fmas = jax.jit(fn)(self.graph)
+            _, bucket_fmas = jax.jit(fn)(bucket_graph)
+            _, storage_fmas = jax.jit(fn)(storage_graph)
+            self.assertEqual(int(fmas), int(bucket_fmas))
+            self.assertEqual(int(fmas), int(storage_fmas))
+            
+    def test_sparse_effective_shape(self):
+        storage_graph = embed(jrand.PRNGKey(0), self.graph, [20, 105, 20])
+        partial_graph, _ = vertex_eliminate(2, storage_graph)
+        for graph in (self.graph, storage_graph, partial_graph):
+            for columnar in (False, True):
+                header, sparse_graph = sparsify(graph, columnar=columnar)
+                self.assertEqual(get_sparse_effective_shape(header, sparse_graph, columnar), 
+                                get_effective_shape(graph))
+
+
+if __name__ == '__main__':
+    unittest.main()
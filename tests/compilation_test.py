@@ -0,0 +1,43 @@
+import os
+import tempfile
+import unittest
+
+import jax
+import jax.numpy as jnp
+from jax.experimental.compilation_cache import compilation_cache
+import equinox as eqx
+
+from alphagrad.compilation import enable_compilation_cache, warmup
+from alphagrad.vertexgame import make_graph, forward, reverse
+
+
+def Scalar(a, b, c, d):
+    x = a*b + jnp.sin(c)
+    y = x / d - jnp.cos(a*c)
+    z = jnp.exp(y) * x
+    w = jnp.log(z*z + 1.) + y
+    return z, w, x*w
+
+
+class CompilationTest(unittest.TestCase):
+    def test_warmup(self):
+        graph = make_graph(Scalar, 1., 2., 3., 4.)
+        compile_times = warmup({"forward": (forward, (graph,)),
+                                "reverse": (jax.jit(reverse), (graph,)),
+                                "filter_jit": (eqx.filter_jit(lambda g, n: g*n), (graph, 2))},
+                                verbose=False)
+        self.assertEqual(set(compile_times.keys()), {"forward", "reverse", "filter_jit"})
+        self.assertTrue(all(t > 0. for t in compile_times.values()))
+        
+    def test_compilation_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            path = enable_compilation_cache(cache_dir, "Scalar", [4, 11, 3])
+            self.assertEqual(path, os.path.join(cache_dir, "Scalar_4_11_3"))
+            jax.jit(lambda x: jnp.sin(x)*2.)(jnp.ones(7))
+            self.assertGreater(len(os.listdir(path)), 0)
+            jax.config.update("jax_compilation_cache_dir", None)
+            compilation_cache.reset_cache()
+    
+    
+if __name__ == '__main__':
+    unittest.main()
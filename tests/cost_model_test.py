@@ -0,0 +1,119 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import jax
+import jax.numpy as jnp
+import jax.random as jrand
+
+from alphagrad.vertexgame import (make_graph, cross_country, forward, reverse,
+                                CostModel, get_cost_features, get_cost_features_batch)
+from alphagrad.vertexgame.cost_model import NUM_FEATURES, get_jacobian_sizes
+from alphagrad.vertexgame.runtime_game import RuntimeGame
+
+
+def Perceptron(x, W1, b1, W2, b2):
+    h = jnp.tanh(W1 @ x + b1)
+    o = W2 @ h + b2
+    return jnp.sum(o**2), jnp.log(h.sum())
+
+
+WEIGHTS = np.array([1e-6, 1e-5, 1e-7, 0., 0., 0., 0., 1e-4])
+
+
+class CostModelTest(unittest.TestCase):
+    def setUp(self):
+        self.xs = [jnp.ones(4), jnp.ones((8, 4)), jnp.ones(8), jnp.ones((3, 8)), jnp.ones(3)]
+        self.graph = make_graph(Perceptron, *self.xs)
+        num_v = self.graph.shape[-1]
+        keys = jrand.split(jrand.PRNGKey(42), 32)
+        self.orders = jax.vmap(lambda k: jrand.permutation(k, jnp.arange(1, num_v+1)))(keys)
+        
+    def test_jacobian_sizes(self):
+        # Dense, diagonal and Kronecker Jacobians of a (3, 1) x (3, 4) edge
+        edges = jnp.array([[1, 2, -2, 10], [3]*4, [1]*4, [3]*4, [4]*4]).reshape(5, 1, 4)
+        sizes = get_jacobian_sizes(edges)
+        self.assertTrue(jnp.all(sizes == jnp.array([[36., 12., 4., 1.]])))
+
+    def test_features(self):
+        features = get_cost_features_batch(self.orders, self.graph)
+        self.assertEqual(features.shape, (32, NUM_FEATURES))
+        
+        for order, _features in zip(self.orders[:4], features):
+            _, fmas = jax.jit(cross_country)(order, self.graph)
+            self.assertEqual(int(fmas), int(_features[0]))
+            self.assertTrue(jnp.allclose(get_cost_features(order, self.graph), _features))
+        
+        # The final graph does not depend on the order
+        self.assertTrue(jnp.all(features[:, 3:] == features[0, 3:]))
+        self.assertTrue(jnp.all(features[:, 1:3] > 0))
+        
+    def test_fit(self):
+        features = np.asarray(get_cost_features_batch(self.orders, self.graph))
+        runtimes = features @ WEIGHTS
+        
+        model = CostModel().fit(features, runtimes, l2=0.)
+        self.assertTrue(np.allclose(model.predict(features), runtimes, rtol=1e-6))
+        self.assertLess(model.variance, 1e-18)
+        
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, "cost_model.npz")
+            model.save(fname)
+            loaded = CostModel.load(fname)
+            self.assertTrue(np.allclose(loaded.predict(features), model.predict(features)))
+            
+        with self.assertRaises(ValueError):
+            CostModel().predict(features)
+
+    def test_cost_model_game(self):
+        game = RuntimeGame(5, Perceptron, *self.xs, reward_mode="cost_model")
+        graph = np.asarray(game.graph)
+        vertices = np.flatnonzero(graph[2, 0, :] == 0)
+        self.assertEqual(len(vertices), int(game.num_actions))
+        rng = np.random.default_rng(42)
+        act_seqs = np.stack([rng.permutation(vertices) for _ in range(16)]).astype(np.int32)
+        features = np.asarray(get_cost_features_batch(act_seqs + 1, graph))
+        runtimes = features @ WEIGHTS
+        
+        # Calibrate a new game from stored measurements
+        game.measurements = list(zip(act_seqs, runtimes))
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, "measurements.npz")
+            game.save_measurements(fname)
+            game = RuntimeGame(5, Perceptron, *self.xs, reward_mode="cost_model")
+            game.load_measurements(fname)
+        self.assertEqual(len(game.measurements), len(act_seqs))
+        game.calibrate_cost_model(l2=0.)
+        
+        rewards, variances = game.get_rewards(act_seqs, return_variance=True)
+        self.assertTrue(np.allclose(rewards, -runtimes, rtol=1e-5))
+        self.assertTrue(np.allclose(rewards, game.predict_rewards(act_seqs)))
+        self.assertTrue(np.all(variances == np.float32(game.cost_model.variance)))
+        
+        # Rewards are predicted when the episodes terminate
+        edges, act_seq = game.reset()
+        states = (jnp.stack([edges]*2), jnp.stack([act_seq]*2))
+        for t in range(len(vertices)):
+            states, step_rewards, dones, step_variances, failed = game.step_batch(states, act_seqs[:2, t])
+            self.assertEqual(bool(dones.all()), t == len(vertices)-1)
+        self.assertTrue(np.allclose(step_rewards, -runtimes[:2], rtol=1e-5))
+        self.assertTrue(np.all(np.isfinite(step_variances)))
+        self.assertFalse(np.any(failed))
+        
+        # Only the orders with the best predicted rewards are measured
+        measured = []
+        def measure_fn(act_seq=None, best_runtime=None):
+            idx = [np.array_equal(act_seq, a) for a in act_seqs].index(True)
+            measured.append(idx)
+            return np.full(5, runtimes[idx])
+        game.measure_fn = measure_fn
+        idxs, measured_rewards = game.measure_best(list(act_seqs), 3)
+        self.assertEqual(sorted(measured), sorted(np.argsort(runtimes)[:3].tolist()))
+        self.assertEqual(sorted(idxs.tolist()), sorted(measured))
+        self.assertTrue(np.allclose(measured_rewards, -runtimes[idxs], rtol=1e-5))
+    
+    
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+
+import jax
+import jax.numpy as jnp
+import jax.random as jrand
+
+from alphagrad.vertexgame import make_graph, cross_country, cross_country_batch
+
+
+def Perceptron(x, W1, b1, W2, b2):
+    h = jnp.tanh(W1 @ x + b1)
+    o = W2 @ h + b2
+    return jnp.sum(o**2), jnp.log(h.sum())
+
+
+class CrossCountryBatchTest(unittest.TestCase):
+    def test_cross_country_batch(self):
+        graph = make_graph(Perceptron, jnp.ones(4), jnp.ones((8, 4)), jnp.ones(8), 
+                            jnp.ones((3, 8)), jnp.ones(3))
+        num_v = graph.shape[-1]
+        keys = jrand.split(jrand.PRNGKey(42), 11)
+        orders = jax.vmap(lambda k: jrand.permutation(k, jnp.arange(1, num_v+1)))(keys)
+        
+        fmas, trace = cross_country_batch(orders, graph, chunk_size=4, return_trace=True)
+        self.assertEqual(fmas.shape, (11,))
+        self.assertEqual(trace.shape, (11, num_v))
+        self.assertTrue(jnp.all(trace.sum(axis=1) == fmas))
+        
+        for order, _fmas in zip(orders, fmas):
+            _, cc_fmas = jax.jit(cross_country)(order, graph)
+            self.assertEqual(int(cc_fmas), int(_fmas))
+    
+    
+if __name__ == '__main__':
+    unittest.main()
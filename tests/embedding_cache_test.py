@@ -0,0 +1,59 @@
+import unittest
+
+import jax.numpy as jnp
+import jax.random as jrand
+
+import equinox as eqx
+
+from alphagrad.utils import get_masked_logits, symlog, symexp
+from alphagrad.vertexgame import make_graph, step, get_graph_shape, get_max_degree
+from alphagrad.transformer.models import AlphaZeroModel
+from alphagrad.alphazero.environment_interaction import (make_recurrent_fn,
+                                                        make_environment_interaction)
+
+
+def Vector(a, b, c, d):
+    x = a*b + jnp.sin(c)
+    y = x / d - jnp.cos(a*c)
+    z = jnp.exp(y) * x
+    w = jnp.log(z*z + 1.) + y
+    return z, w, x*w
+
+
+class EmbeddingCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.graph = make_graph(Vector, jnp.ones(2), 2., 3., jnp.ones(2))
+        self.num_actions = self.graph.shape[-1]
+        self.model = AlphaZeroModel(get_graph_shape(self.graph), 32, 1, 2, 
+                                    key=jrand.PRNGKey(0))
+        self.recurrent_fn = make_recurrent_fn(symlog, symexp, self.model, 
+                                            step, get_masked_logits)
+        
+    def make_env_interaction(self, max_changed_columns, lookback=1):
+        return make_environment_interaction(symlog, symexp, self.num_actions, 
+                                            4, 1., 8, self.recurrent_fn, step,
+                                            max_changed_columns=max_changed_columns,
+                                            lookback=lookback)
+        
+    def test_cached_embeddings(self):
+        graphs = jnp.tile(self.graph[jnp.newaxis], (2, 1, 1, 1))
+        init_carry = (graphs, jnp.zeros(2), jrand.PRNGKey(42))
+        
+        max_changed = get_max_degree(self.graph) + 1
+        cached = eqx.filter_jit(self.make_env_interaction(max_changed))(self.model, init_carry)
+        fresh = eqx.filter_jit(self.make_env_interaction(0))(self.model, init_carry)
+        
+        # Same trajectories, rewards and value estimates up to float precision
+        final_state, num_muls, data = cached
+        _final_state, _num_muls, _data = fresh
+        self.assertTrue(jnp.all(final_state == _final_state))
+        self.assertTrue(jnp.all(num_muls == _num_muls))
+        self.assertTrue(jnp.allclose(data, _data, atol=1e-4, rtol=1e-4))
+        
+    def test_lookback(self):
+        with self.assertRaises(ValueError):
+            self.make_env_interaction(get_max_degree(self.graph) + 1, lookback=2)
+
+
+if __name__ == '__main__':
+    unittest.main()
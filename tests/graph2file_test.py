@@ -0,0 +1,96 @@
+import os
+import tempfile
+import unittest
+
+from concurrent.futures.process import BrokenProcessPool
+
+import h5py
+import numpy as np
+
+import jax.random as jrand
+
+from alphagrad.vertexgame import Graph2File, read
+from alphagrad.vertexgame.codegeneration.sampler import ComputationalGraphSampler
+
+
+class DummySampler(ComputationalGraphSampler):
+    """
+    Cheap sampler whose samples only depend on the key.
+    """
+    def sample(self, num_samples=1, key=None, **kwargs):
+        samples = []
+        for _ in range(num_samples):
+            key, subkey = jrand.split(key)
+            edges = np.asarray(jrand.randint(subkey, (7*3,), 0, 10))
+            header = np.full((5, self.storage_shape[1]), edges[0], dtype=np.int32)
+            samples.append((str(edges[0]), header, edges))
+        return samples
+
+
+class FailingSampler(DummySampler):
+    """
+    Sampler that fails on every batch.
+    """
+    def sample(self, num_samples=1, key=None, **kwargs):
+        raise ValueError("Sampling failed!")
+
+
+class KilledSampler(DummySampler):
+    """
+    Sampler whose process dies on every batch, e.g. because it runs out of memory.
+    """
+    def sample(self, num_samples=1, key=None, **kwargs):
+        os._exit(1)
+
+
+class Graph2FileTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.sampler = DummySampler(storage_shape=[5, 10, 5])
+        self.key = jrand.PRNGKey(42)
+        
+    def tearDown(self):
+        self.tmpdir.cleanup()
+        
+    def generate(self, name, num_samples=10, **kwargs):
+        gen = Graph2File(self.sampler, self.tmpdir.name, num_samples=num_samples,
+                        batchsize=3, storage_shape=[5, 10, 5], **kwargs)
+        fname = gen.generate(self.key, fname=os.path.join(self.tmpdir.name, name))
+        return read(fname, slice(0, num_samples))
+        
+    def assertSamplesEqual(self, a, b):
+        for x, y in zip(a, b):
+            self.assertEqual(len(x), len(y))
+            for _x, _y in zip(x, y):
+                self.assertTrue(np.array_equal(_x, _y))
+                
+    def test_parallel(self):
+        serial = self.generate("serial.hdf5")
+        parallel = self.generate("parallel.hdf5", num_workers=2, queue_size=2)
+        self.assertSamplesEqual(serial, parallel)
+        # Batches have to be different
+        self.assertFalse(np.array_equal(serial[2][0], serial[2][3]))
+        
+    def test_resume(self):
+        full = self.generate("full.hdf5")
+        # Simulate a crash after the first two batches
+        self.generate("resumed.hdf5")
+        with h5py.File(os.path.join(self.tmpdir.name, "resumed.hdf5"), "a") as file:
+            file["header"].attrs["current_idx"] = 6
+            file["data/graph_header"][6:] = 0
+        resumed = self.generate("resumed.hdf5", num_workers=2)
+        self.assertSamplesEqual(full, resumed)
+
+    def test_failing_worker(self):
+        self.sampler = FailingSampler(storage_shape=[5, 10, 5])
+        with self.assertRaises(ValueError):
+            self.generate("failed.hdf5", num_workers=2)
+            
+    def test_killed_worker(self):
+        self.sampler = KilledSampler(storage_shape=[5, 10, 5])
+        with self.assertRaises(BrokenProcessPool):
+            self.generate("killed.hdf5", num_workers=2)
+        
+
+if __name__ == '__main__':
+    unittest.main()
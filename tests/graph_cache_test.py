@@ -0,0 +1,82 @@
+import os
+import time
+import tempfile
+import unittest
+
+import jax
+import jax.numpy as jnp
+
+from alphagrad.vertexgame import make_graph
+from alphagrad.vertexgame.interpreter import (GraphCache, cached_make_graph, 
+                                            get_jaxpr_key, get_graph_key)
+from alphagrad.vertexgame.interpreter.graph_cache import _get_source_files
+
+
+def Scalar(a, b, c, d):
+    x = a*b + jnp.sin(c)
+    y = x / d - jnp.cos(a*c)
+    z = jnp.exp(y) * x
+    w = jnp.log(z*z + 1.) + y
+    return z, w, x*w
+
+
+def Perceptron(x, W, b):
+    return jnp.tanh(W @ x + b)
+
+
+class GraphCacheTest(unittest.TestCase):
+    def test_jaxpr_key(self):
+        jaxpr = jax.make_jaxpr(Scalar)(1., 2., 3., 4.)
+        key = get_jaxpr_key(jaxpr)
+        self.assertEqual(key, get_jaxpr_key(jax.make_jaxpr(Scalar)(5., 6., 7., 8.)))
+        
+        xs = [jnp.ones(4), jnp.ones((3, 4)), jnp.ones(3)]
+        self.assertNotEqual(key, get_jaxpr_key(jax.make_jaxpr(Perceptron)(*xs)))
+        xs = [jnp.ones(5), jnp.ones((3, 5)), jnp.ones(3)]
+        _key = get_jaxpr_key(jax.make_jaxpr(Perceptron)(*xs))
+        xs = [jnp.ones(4), jnp.ones((3, 4)), jnp.ones(3)]
+        self.assertNotEqual(_key, get_jaxpr_key(jax.make_jaxpr(Perceptron)(*xs)))
+        
+    def test_source_files(self):
+        # The baseline scores depend on the Markowitz and search code
+        names = [os.path.relpath(f, os.path.dirname(os.path.dirname(f))) 
+                for f in _get_source_files()]
+        for name in ["transforms/markowitz.py", "vertexgame/core.py", "vertexgame/search.py"]:
+            self.assertIn(name, names)
+        self.assertTrue(all(os.path.isfile(f) for f in _get_source_files()))
+        
+    def test_cached_make_graph(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = GraphCache(cache_dir)
+            graph = make_graph(Scalar, 1., 2., 3., 4.)
+            
+            miss = cached_make_graph(Scalar, 1., 2., 3., 4., cache=cache)
+            self.assertTrue(jnp.array_equal(graph, miss))
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+            
+            hit = cached_make_graph(Scalar, 1., 2., 3., 4., cache=cache)
+            self.assertTrue(jnp.array_equal(graph, hit))
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+            
+            key = get_graph_key(graph)
+            self.assertIsNone(cache.load(key))
+            cache.store(key, scores=jnp.array([1, 2, 3]))
+            self.assertTrue(jnp.array_equal(cache.load(key)["scores"], jnp.array([1, 2, 3])))
+            
+    def test_eviction(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = GraphCache(cache_dir)
+            for i in range(3):
+                cache.store(str(i), data=jnp.zeros(1000))
+                os.utime(os.path.join(cache_dir, f"{i}.npz"), (i, i))
+            # Reading an entry marks it as recently used
+            self.assertIsNotNone(cache.load("0"))
+            
+            cache.max_size = cache.size() - 1
+            cache.evict()
+            self.assertEqual(sorted(os.listdir(cache_dir)), ["0.npz", "2.npz"])
+            self.assertLessEqual(cache.size(), cache.max_size)
+            
+
+if __name__ == '__main__':
+    unittest.main()
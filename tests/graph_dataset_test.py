@@ -0,0 +1,66 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import jax.numpy as jnp
+import jax.random as jrand
+
+from torch.utils.data import DataLoader
+
+from alphagrad.vertexgame import make_graph, embed, create, write, sparsify, GraphDataset
+
+
+def Perceptron(x, W1, b1, W2, b2):
+    y1 = W1 @ x
+    z1 = y1 + b1
+    a1 = jnp.tanh(z1)
+    
+    y2 = W2 @ a1
+    z2 = y2 + b2
+    return 0.5*jnp.sum(jnp.tanh(z2)**2)
+
+
+class GraphDatasetTest(unittest.TestCase):
+    def setUp(self):
+        xs = [jnp.ones(4), jnp.ones((8, 4)), jnp.ones(8), jnp.ones((4, 8)), jnp.ones(4)]
+        graph = make_graph(Perceptron, *xs)
+        keys = jrand.split(jrand.PRNGKey(42), 7)
+        self.graphs = [np.asarray(embed(key, graph, [10, 30, 10])) for key in keys]
+        
+        self.tmpdir = tempfile.TemporaryDirectory()
+        # Two files with 3 and 4 samples
+        for name, graphs in (("a.hdf5", self.graphs[:3]), ("b.hdf5", self.graphs[3:])):
+            fname = os.path.join(self.tmpdir.name, name)
+            create(fname, len(graphs), [10, 30, 10])
+            write(fname, [(str(i), *sparsify(g)) for i, g in enumerate(graphs)])
+        self.dataset = GraphDataset(self.tmpdir.name, shape=[10, 30, 10])
+        order = np.argsort(self.dataset.files)
+        self.expected = [g for n in order for g in (self.graphs[:3], self.graphs[3:])[n]]
+        
+    def tearDown(self):
+        self.dataset.close()
+        self.tmpdir.cleanup()
+        
+    def test_getitem(self):
+        self.assertEqual(len(self.dataset), 7)
+        for idx in range(len(self.dataset)):
+            self.assertTrue(np.array_equal(self.dataset[idx], self.expected[idx]))
+        with self.assertRaises(IndexError):
+            self.dataset[7]
+            
+    def test_getitems(self):
+        idxs = [6, 2, 3, 0, 1, 4, 1]
+        samples = self.dataset.__getitems__(idxs)
+        for idx, sample in zip(idxs, samples):
+            self.assertTrue(np.array_equal(sample, self.expected[idx]))
+            
+    def test_dataloader(self):
+        loader = DataLoader(self.dataset, batch_size=4, num_workers=2)
+        batches = [batch.numpy() for batch in loader]
+        self.assertTrue(np.array_equal(np.concatenate(batches), np.stack(self.expected)))
+
+
+if __name__ == '__main__':
+    unittest.main()
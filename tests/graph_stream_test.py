@@ -0,0 +1,89 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import jax.numpy as jnp
+import jax.random as jrand
+
+from torch.utils.data import DataLoader
+
+from alphagrad.vertexgame import (make_graph, embed, create, write, sparsify, 
+                                GraphDataset, GraphStream)
+
+
+def Perceptron(x, W1, b1, W2, b2):
+    y1 = W1 @ x
+    z1 = y1 + b1
+    a1 = jnp.tanh(z1)
+    
+    y2 = W2 @ a1
+    z2 = y2 + b2
+    return 0.5*jnp.sum(jnp.tanh(z2)**2)
+
+
+def Scalar(a, b, c, d):
+    x = a*b + jnp.sin(c)
+    y = x / d - jnp.cos(a*c)
+    return jnp.exp(y) * x
+
+
+class GraphStreamTest(unittest.TestCase):
+    def setUp(self):
+        xs = [jnp.ones(4), jnp.ones((8, 4)), jnp.ones(8), jnp.ones((4, 8)), jnp.ones(4)]
+        perceptron = make_graph(Perceptron, *xs)
+        scalar = make_graph(Scalar, 1., 2., 3., 4.)
+        keys = jrand.split(jrand.PRNGKey(42), 20)
+        self.graphs = [np.asarray(embed(key, graph, [20, 105, 20])) 
+                        for key, graph in zip(keys, [perceptron, scalar]*10)]
+        
+        self.tmpdir = tempfile.TemporaryDirectory()
+        for name, graphs in (("a.hdf5", self.graphs[:12]), ("b.hdf5", self.graphs[12:])):
+            fname = os.path.join(self.tmpdir.name, name)
+            create(fname, len(graphs), [20, 105, 20])
+            write(fname, [("", *sparsify(g)) for g in graphs])
+        
+    def tearDown(self):
+        self.tmpdir.cleanup()
+        
+    def assertSameGraphs(self, graphs, expected):
+        self.assertEqual(sorted(g.tobytes() for g in graphs), 
+                        sorted(g.tobytes() for g in expected))
+        
+    def test_sequential(self):
+        stream = GraphStream(GraphDataset(self.tmpdir.name), blocksize=5, shuffle=False)
+        graphs = list(stream)
+        self.assertEqual(len(graphs), 20)
+        for graph, expected in zip(graphs, self.graphs):
+            self.assertTrue(np.array_equal(graph, expected))
+            
+    def test_shuffle(self):
+        stream = GraphStream(GraphDataset(self.tmpdir.name), blocksize=5, buffer_size=8)
+        graphs = list(stream)
+        self.assertSameGraphs(graphs, self.graphs)
+        self.assertFalse(all(np.array_equal(g, e) for g, e in zip(graphs, self.graphs)))
+        
+        stream.set_epoch(1)
+        self.assertSameGraphs(list(stream), self.graphs)
+        
+    def test_workers(self):
+        stream = GraphStream(GraphDataset(self.tmpdir.name), blocksize=3, buffer_size=4)
+        loader = DataLoader(stream, batch_size=4, num_workers=2)
+        graphs = [g for batch in loader for g in batch.numpy()]
+        self.assertSameGraphs(graphs, self.graphs)
+        
+    def test_bucket_batches(self):
+        buckets = [[4, 10, 5], [20, 105, 20]]
+        dataset = GraphDataset(self.tmpdir.name, buckets=buckets)
+        stream = GraphStream(dataset, blocksize=4, buffer_size=8, batchsize=3)
+        batches = list(stream)
+        self.assertEqual(sum(len(b) for b in batches), 20)
+        self.assertEqual({b.shape[1:] for b in batches}, {(5, 15, 10), (5, 126, 105)})
+        
+        stream.drop_last = True
+        self.assertTrue(all(len(b) == 3 for b in stream))
+        
+
+if __name__ == '__main__':
+    unittest.main()
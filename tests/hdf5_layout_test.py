@@ -0,0 +1,83 @@
+import os
+import tempfile
+import unittest
+
+import h5py
+import numpy as np
+
+import jax.numpy as jnp
+import jax.random as jrand
+
+from alphagrad.vertexgame import (make_graph, embed, create, write, compact, 
+                                sparsify, read, GraphDataset)
+from alphagrad.vertexgame.utils import read_file_size
+
+
+def Perceptron(x, W1, b1, W2, b2):
+    y1 = W1 @ x
+    z1 = y1 + b1
+    a1 = jnp.tanh(z1)
+    
+    y2 = W2 @ a1
+    z2 = y2 + b2
+    return 0.5*jnp.sum(jnp.tanh(z2)**2)
+
+
+class HDF5LayoutTest(unittest.TestCase):
+    def setUp(self):
+        xs = [jnp.ones(4), jnp.ones((8, 4)), jnp.ones(8), jnp.ones((4, 8)), jnp.ones(4)]
+        graph = make_graph(Perceptron, *xs)
+        keys = jrand.split(jrand.PRNGKey(42), 5)
+        self.graphs = [np.asarray(embed(key, graph, [10, 30, 10])) for key in keys]
+        self.samples = [(f"code {i}", *sparsify(g)) for i, g in enumerate(self.graphs)]
+        self.tmpdir = tempfile.TemporaryDirectory()
+        
+    def tearDown(self):
+        self.tmpdir.cleanup()
+        
+    def test_resizable(self):
+        fname = os.path.join(self.tmpdir.name, "resizable.hdf5")
+        create(fname, 100, [10, 30, 10], chunksize=2, compression="gzip", resizable=True)
+        self.assertEqual(read_file_size(fname), 0)
+        write(fname, self.samples[:3])
+        write(fname, self.samples[3:])
+        self.assertEqual(read_file_size(fname), 5)
+        
+        with h5py.File(fname, "r") as file:
+            self.assertEqual(file["data/graph_header"].chunks, (2, 5, 30))
+            self.assertEqual(file["data/graph_header"].compression, "gzip")
+            self.assertEqual(file["data/graph"].maxshape, (None,))
+        
+        dataset = GraphDataset(self.tmpdir.name, shape=[10, 30, 10])
+        for idx in range(len(dataset)):
+            self.assertTrue(np.array_equal(dataset[idx], self.graphs[idx]))
+        dataset.close()
+        
+    def test_compact(self):
+        fname = os.path.join(self.tmpdir.name, "preallocated.hdf5")
+        create(fname, 100, [10, 30, 10], columnar=True)
+        write(fname, self.samples)
+        codes, headers, graphs = read(fname, slice(0, 5))
+        
+        out_fname = compact(fname, os.path.join(self.tmpdir.name, "compact.hdf5"), 
+                            chunksize=4, compression="lzf")
+        self.assertLess(os.path.getsize(out_fname), os.path.getsize(fname))
+        with h5py.File(out_fname, "r") as file:
+            self.assertEqual(file["header"].attrs["num_samples"], 5)
+            self.assertEqual(file["header"].attrs["current_idx"], 5)
+            self.assertEqual(file["header"].attrs["layout"], "columnar")
+            self.assertEqual(file["data/graph"].compression, "lzf")
+            
+        _codes, _headers, _graphs = read(out_fname, slice(0, 5))
+        self.assertTrue(np.array_equal(codes, _codes))
+        self.assertTrue(np.array_equal(headers, _headers))
+        for graph, _graph in zip(graphs, _graphs):
+            self.assertTrue(np.array_equal(graph, _graph))
+        
+        # Compaction in-place
+        compact(fname)
+        self.assertEqual(read_file_size(fname), 5)
+        
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+
+import jax
+import jax.numpy as jnp
+import jax.random as jrand
+
+from alphagrad.vertexgame import make_graph, step, get_graph_shape, get_max_degree
+from alphagrad.transformer.models import AlphaZeroModel, PPOModel, PolicyNet, ValueNet
+
+
+def Vector(a, b, c, d):
+    x = a*b + jnp.sin(c)
+    y = x / d - jnp.cos(a*c)
+    z = jnp.exp(y) * x
+    w = jnp.log(z*z + 1.) + y
+    return z, w, x*w
+
+
+class IncrementalEmbeddingTest(unittest.TestCase):
+    def test_incremental_embedding(self):
+        graph = make_graph(Vector, jnp.ones(2), 2., 3., jnp.ones(2))
+        graph_shape = get_graph_shape(graph)
+        max_changed = get_max_degree(graph) + 1
+        key = jrand.PRNGKey(42)
+        models = [AlphaZeroModel(graph_shape, 32, 1, 2, key=key), 
+                PPOModel(graph_shape, 32, 1, 2, key=key),
+                PolicyNet(graph_shape, 32, 1, 2, key=key),
+                ValueNet(graph_shape, 32, 1, 2, key=key)]
+        actions = jrand.permutation(key, jnp.arange(graph.shape[-1]))
+        
+        for model in models:
+            embeddings = model.embed(graph)
+            state = graph
+            for action in actions:
+                if state[1, 0, action] > 0:
+                    continue
+                next_state, _, _ = step(state, action)
+                embeddings = model.update_embeddings(embeddings, state, next_state, max_changed)
+                state = next_state
+                
+                self.assertTrue(jnp.allclose(embeddings, model.embed(state), atol=1e-4, rtol=1e-4))
+            self.assertTrue(jnp.allclose(model(state, key, embeddings=embeddings), 
+                                        model(state, key), atol=1e-4, rtol=1e-4))
+
+
+if __name__ == '__main__':
+    unittest.main()
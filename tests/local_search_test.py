@@ -0,0 +1,53 @@
+import unittest
+
+import jax
+import jax.numpy as jnp
+import jax.random as jrand
+
+from alphagrad.vertexgame import (make_graph, forward, cross_country,
+                                simulated_annealing, genetic_algorithm)
+from alphagrad.vertexgame.local_search import mutate, order_crossover
+
+
+def Scalar(a, b, c, d):
+    x = a*b + jnp.sin(c)
+    y = x / d - jnp.cos(a*c)
+    z = jnp.exp(y) * x
+    w = jnp.log(z*z + 1.) + y
+    return z, w, x*w
+
+
+class LocalSearchTest(unittest.TestCase):
+    def setUp(self):
+        self.graph = make_graph(Scalar, 1., 2., 3., 4.)
+        self.num_v = self.graph.shape[-1]
+        
+    def test_moves(self):
+        order = jnp.arange(1, 13)
+        keys = jrand.split(jrand.PRNGKey(42), 64)
+        mutants = jax.vmap(mutate, in_axes=(0, None))(keys, order)
+        children = jax.vmap(order_crossover, in_axes=(0, None, None))(keys, order, order[::-1])
+        # All moves yield permutations
+        for perm in jnp.concatenate((mutants, children)):
+            self.assertTrue(jnp.all(jnp.sort(perm) == order))
+        self.assertTrue(jnp.any(mutants != order))
+        
+    def test_local_search(self):
+        _, fwd_fmas = jax.jit(forward)(self.graph)
+        fwd_order = list(range(1, self.num_v+1))
+        key = jrand.PRNGKey(123)
+        
+        sa = simulated_annealing(self.graph, key, num_chains=16, num_iters=100, init_order=fwd_order)
+        ga = genetic_algorithm(self.graph, key, population_size=16, num_generations=50, 
+                                num_elites=2, init_order=fwd_order)
+        for (order, fmas, trace), length in zip((sa, ga), (100, 50)):
+            self.assertEqual(trace.shape, (length,))
+            self.assertTrue(jnp.all(jnp.diff(trace) <= 0))
+            self.assertLess(int(fmas), int(fwd_fmas))
+            self.assertEqual(int(trace[-1]), int(fmas))
+            _, cc_fmas = jax.jit(cross_country)(order, self.graph)
+            self.assertEqual(int(cc_fmas), int(fmas))
+
+
+if __name__ == '__main__':
+    unittest.main()
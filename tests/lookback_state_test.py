@@ -0,0 +1,25 @@
+import unittest
+
+import jax.numpy as jnp
+
+from alphagrad.utils import make_lookback_state
+from alphagrad.vertexgame import make_graph
+
+
+def Helmholtz(x):
+    z = jnp.log(x / (1 + -jnp.sum(x)))
+    return jnp.sum(x*z)
+
+
+class LookbackStateTest(unittest.TestCase):
+    def test_lookback_state(self):
+        graph = make_graph(Helmholtz, jnp.ones(4))
+        self.assertTrue(jnp.all(make_lookback_state(graph, 1) == graph))
+        
+        # The edges of past states are not kept, so they cannot be stacked
+        with self.assertRaises(ValueError):
+            make_lookback_state(graph, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import jax.numpy as jnp
+import jax.random as jrand
+
+from torch.utils.data import DataLoader
+
+from alphagrad.vertexgame import (make_graph, embed, create, write, sparsify, 
+                                GraphDataset, MemmapWriter, MemmapGraphDataset, 
+                                convert_to_memmap)
+
+
+def Perceptron(x, W1, b1, W2, b2):
+    y1 = W1 @ x
+    z1 = y1 + b1
+    a1 = jnp.tanh(z1)
+    
+    y2 = W2 @ a1
+    z2 = y2 + b2
+    return 0.5*jnp.sum(jnp.tanh(z2)**2)
+
+
+class MemmapDatasetTest(unittest.TestCase):
+    def setUp(self):
+        xs = [jnp.ones(4), jnp.ones((8, 4)), jnp.ones(8), jnp.ones((4, 8)), jnp.ones(4)]
+        graph = make_graph(Perceptron, *xs)
+        keys = jrand.split(jrand.PRNGKey(42), 5)
+        self.graphs = [np.asarray(embed(key, graph, [10, 30, 10])) for key in keys]
+        self.samples = [(f"code {i}", *sparsify(g)) for i, g in enumerate(self.graphs)]
+        self.tmpdir = tempfile.TemporaryDirectory()
+        
+    def tearDown(self):
+        self.tmpdir.cleanup()
+        
+    def test_writer(self):
+        for columnar in (False, True):
+            path = os.path.join(self.tmpdir.name, str(columnar))
+            os.makedirs(path)
+            with MemmapWriter(os.path.join(path, "test.graphs"), [10, 30, 10], columnar) as writer:
+                writer.write(self.samples[:2])
+                writer.write(self.samples[2:])
+                
+            dataset = MemmapGraphDataset(path, include_code=True, shape=[10, 30, 10])
+            self.assertEqual(len(dataset), 5)
+            for idx in range(len(dataset)):
+                code, graph = dataset[idx]
+                self.assertEqual(code.decode("utf-8"), f"code {idx}")
+                self.assertTrue(np.array_equal(graph, self.graphs[idx]))
+            samples = dataset.__getitems__([4, 1, 2])
+            self.assertEqual([code.decode("utf-8") for code, _ in samples], 
+                            ["code 4", "code 1", "code 2"])
+            
+    def test_convert(self):
+        for columnar in (False, True):
+            fname = os.path.join(self.tmpdir.name, f"test_{columnar}.hdf5")
+            create(fname, len(self.samples), [10, 30, 10], columnar=columnar)
+            write(fname, self.samples)
+            convert_to_memmap(fname)
+        
+        dataset = GraphDataset(self.tmpdir.name, shape=[10, 30, 10])
+        memmap_dataset = MemmapGraphDataset(self.tmpdir.name, shape=[10, 30, 10])
+        self.assertEqual(dataset.files, [f[:-len(".graphs")] + ".hdf5" for f in memmap_dataset.files])
+        self.assertEqual(dataset.file_layouts, memmap_dataset.file_layouts)
+        
+        loader = DataLoader(memmap_dataset, batch_size=3, num_workers=2)
+        batches = np.concatenate([batch.numpy() for batch in loader])
+        for idx in range(len(dataset)):
+            self.assertTrue(np.array_equal(dataset[idx], batches[idx]))
+        dataset.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import tempfile
+import unittest
+
+import numpy as np
+import jax.numpy as jnp
+
+from alphagrad.vertexgame import (make_graph, make_wavefronts,
+                                RuntimeCache, get_order_key)
+
+
+def Scalar(a, b, c, d):
+    x = a*b + jnp.sin(c)
+    y = x / d - jnp.cos(a*c)
+    z = jnp.exp(y) * x
+    w = jnp.log(z*z + 1.) + y
+    return z, w, x*w
+
+
+class RuntimeCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.graph = np.asarray(make_graph(Scalar, 1., 2., 3., 4.))
+        self.num_actions = int(self.graph[0, 0, 1])
+
+    def test_order_key(self):
+        act_seq = list(range(self.num_actions))
+        key = get_order_key(act_seq, self.graph)
+        self.assertEqual(key, get_order_key(np.array(act_seq), self.graph))
+        self.assertEqual(get_order_key("fwd", self.graph), get_order_key("fwd", self.graph))
+        self.assertNotEqual(get_order_key("fwd", self.graph), get_order_key("rev", self.graph))
+        self.assertNotEqual(key, get_order_key(act_seq[::-1], self.graph))
+
+        # Permuting the vertices of a wavefront yields the same key
+        order = [a+1 for a in act_seq]
+        wavefronts = make_wavefronts(order, self.graph)
+        self.assertTrue(any((w > 0).sum() > 1 for w in wavefronts))
+        permuted = [int(v)-1 for w in wavefronts for v in w[::-1] if v > 0]
+        self.assertNotEqual(permuted, act_seq)
+        self.assertEqual(key, get_order_key(permuted, self.graph))
+
+    def test_lru(self):
+        cache = RuntimeCache(capacity=2)
+        cache.put("a", np.ones(10))
+        cache.put("b", 2*np.ones(10))
+        self.assertTrue(np.all(cache.get("a") == 1.))
+
+        # "b" is the least recently used entry
+        cache.put("c", 3*np.ones(10))
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("c"))
+
+        stats = cache.stats()
+        self.assertEqual(stats["runtime cache hits"], 2)
+        self.assertEqual(stats["runtime cache misses"], 1)
+        self.assertAlmostEqual(stats["runtime cache hit rate"], 2/3)
+        self.assertEqual(stats["runtime cache size"], 2)
+
+    def test_disk_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = RuntimeCache(capacity=0, path=cache_dir)
+            cache.put("a", np.arange(10.))
+            self.assertEqual(len(cache), 0)
+
+            # Runtimes persist between instances
+            runtimes = RuntimeCache(path=cache_dir).get("a")
+            self.assertTrue(np.all(runtimes == np.arange(10.)))
+
+
+if __name__ == '__main__':
+    unittest.main()
+
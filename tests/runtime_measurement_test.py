@@ -0,0 +1,64 @@
+import time
+import unittest
+
+import numpy as np
+
+from alphagrad.vertexgame.runtime_measurement import RuntimeEstimator
+
+
+class RuntimeEstimatorTest(unittest.TestCase):
+    def test_estimators(self):
+        rng = np.random.default_rng(0)
+        runtimes = 1e-3 + 1e-5*rng.standard_normal(1000)
+        # A few outliers, e.g. due to interrupts
+        runtimes[:10] = 1e-2
+        
+        for name in ("median", "trimmed_mean"):
+            runtime, var = RuntimeEstimator(name).estimate(runtimes)
+            self.assertAlmostEqual(runtime, 1e-3, delta=2e-6)
+            self.assertLess(var, 1e-12)
+        
+        # The mean is not robust against outliers
+        runtime, _ = RuntimeEstimator("mean").estimate(runtimes)
+        self.assertGreater(runtime, 1.05e-3)
+        
+        # The variance decreases with the number of samples
+        _, var = RuntimeEstimator().estimate(runtimes[:100])
+        _, _var = RuntimeEstimator().estimate(runtimes)
+        self.assertGreater(var, _var)
+        
+        with self.assertRaises(ValueError):
+            RuntimeEstimator("mode")
+        
+    def test_early_stopping(self):
+        estimator = RuntimeEstimator(min_samples=5, rtol=.01)
+        rng = np.random.default_rng(0)
+        precise = 1e-3 + 1e-7*rng.standard_normal(5)
+        noisy = 1e-3 + 5e-4*rng.standard_normal(5)
+        self.assertTrue(estimator.is_done(precise))
+        self.assertFalse(estimator.is_done(precise[:4]))
+        self.assertFalse(estimator.is_done(noisy))
+        # Clearly slower than the best runtime
+        self.assertTrue(estimator.is_done(noisy + 1e-2, best_runtime=1e-3))
+        self.assertFalse(estimator.is_done(noisy, best_runtime=1e-3))
+        
+    def test_measure(self):
+        calls = []
+        def fn():
+            # The first calls are slow like a compilation
+            time.sleep(.02 if len(calls) < 2 else .001)
+            calls.append(1)
+            
+        estimator = RuntimeEstimator(min_samples=5, rtol=.5)
+        runtimes = estimator.measure(fn, max_samples=50)
+        self.assertGreaterEqual(len(runtimes), 5)
+        self.assertLess(len(runtimes), 50)
+        self.assertGreaterEqual(len(calls) - len(runtimes), 3)
+        self.assertLess(np.max(runtimes), .01)
+        
+        runtimes = RuntimeEstimator(min_samples=5, rtol=0.).measure(fn, max_samples=20)
+        self.assertEqual(len(runtimes), 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
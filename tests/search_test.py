@@ -0,0 +1,58 @@
+import itertools
+import unittest
+
+import jax
+import jax.numpy as jnp
+
+from alphagrad.vertexgame import (make_graph, forward, reverse, cross_country,
+                                beam_search, branch_and_bound)
+
+
+def Scalar(a, b, c, d):
+    x = a*b + jnp.sin(c)
+    y = x / d - jnp.cos(a*c)
+    z = jnp.exp(y) * x
+    w = jnp.log(z*z + 1.) + y
+    return z, w, x*w
+
+
+def Small(x, y):
+    a = x*y
+    b = jnp.sin(a) + x
+    c = b * jnp.cos(y)
+    return c*a, b
+
+
+class SearchTest(unittest.TestCase):
+    def test_beam_search(self):
+        graph = make_graph(Scalar, 1., 2., 3., 4.)
+        _, fwd_fmas = jax.jit(forward)(graph)
+        _, rev_fmas = jax.jit(reverse)(graph)
+        
+        for markowitz_weight in (0., 1.):
+            order, fmas = beam_search(graph, 4, markowitz_weight)
+            self.assertLessEqual(int(fmas), min(int(fwd_fmas), int(rev_fmas)))
+            # The order eliminates every remaining vertex exactly once
+            num_remaining = int((graph[1, 0] == 0).sum())
+            self.assertEqual(len(set(order.tolist())), num_remaining)
+            _, cc_fmas = jax.jit(cross_country)(order, graph)
+            self.assertEqual(int(cc_fmas), int(fmas))
+        
+    def test_branch_and_bound(self):
+        graph = make_graph(Small, jnp.ones(3), jnp.ones(3))
+        vertices = [v for v in range(1, graph.shape[-1]+1) if graph[1, 0, v-1] == 0]
+        _cross_country = jax.jit(cross_country)
+        optimum = min(int(_cross_country(list(order), graph)[1]) 
+                        for order in itertools.permutations(vertices))
+        
+        order, fmas, is_optimal = branch_and_bound(graph, beam_width=1)
+        self.assertTrue(is_optimal)
+        self.assertEqual(fmas, optimum)
+        self.assertEqual(int(_cross_country(order, graph)[1]), optimum)
+        
+        _, beam_fmas = beam_search(graph, 1)
+        self.assertLessEqual(fmas, int(beam_fmas))
+        
+        
+if __name__ == '__main__':
+    unittest.main()
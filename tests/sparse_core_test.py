@@ -0,0 +1,85 @@
+import unittest
+
+import numpy as np
+
+import jax
+import jax.numpy as jnp
+import jax.random as jrand
+
+from alphagrad.vertexgame import make_graph, forward, reverse, cross_country
+from alphagrad.vertexgame import sparse_core
+
+
+def Helmholtz(x):
+    e = jnp.sum(x)
+    f = 1. + -e
+    w = x / f
+    z = jnp.log(w)
+    return x*z
+
+
+def Perceptron(x, W1, b1, W2, b2):
+    h = jnp.tanh(W1 @ x + b1)
+    o = W2 @ h + b2
+    return jnp.sum(o**2), jnp.log(h.sum())
+
+
+def Attention(x, WQ, WK, WV):
+    q, k, v = WQ @ x, WK @ x, WV @ x
+    a = jnp.exp(q.T @ k)
+    a = a / jnp.sum(a)
+    out = v @ a
+    return jnp.sum(out, axis=0), jnp.tanh(out)
+
+
+def Scalar(a, b, c, d):
+    x = a*b + jnp.sin(c)
+    y = x / d - jnp.cos(a*c)
+    z = jnp.exp(y) * x
+    w = jnp.log(z*z + 1.) + y
+    return z, w, x*w
+
+
+GRAPHS = [make_graph(Helmholtz, jnp.ones(4)),
+        make_graph(Perceptron, jnp.ones(4), jnp.ones((8, 4)), jnp.ones(8), 
+                    jnp.ones((3, 8)), jnp.ones(3)),
+        make_graph(Attention, jnp.ones((4, 3)), jnp.ones((4, 4)), 
+                    jnp.ones((4, 4)), jnp.ones((4, 4))),
+        make_graph(Scalar, 1., 2., 3., 4.)]
+
+
+class SparseCoreTest(unittest.TestCase):
+    def assertSameResult(self, dense_output, sparse_output):
+        dense_graph, dense_fmas = dense_output
+        sparse_graph, sparse_fmas = sparse_output
+        self.assertEqual(int(dense_fmas), int(sparse_fmas))
+        self.assertTrue(jnp.all(sparse_core.to_graph(sparse_graph) == dense_graph))
+
+    def test_conversion(self):
+        for graph in GRAPHS:
+            edge_list = sparse_core.make_edge_list(graph)
+            self.assertTrue(jnp.all(sparse_core.to_graph(edge_list) == graph))
+            num_edges = np.count_nonzero(np.asarray(graph[0, 1:, :]))
+            self.assertEqual(int(sparse_core.get_num_edges(edge_list)), num_edges)
+
+    def test_forward_reverse(self):
+        for graph in GRAPHS:
+            edge_list = sparse_core.make_edge_list(graph)
+            self.assertSameResult(jax.jit(forward)(graph), 
+                                jax.jit(sparse_core.forward)(edge_list))
+            self.assertSameResult(jax.jit(reverse)(graph), 
+                                jax.jit(sparse_core.reverse)(edge_list))
+
+    def test_cross_country(self):
+        key = jrand.PRNGKey(42)
+        for graph in GRAPHS:
+            edge_list = sparse_core.make_edge_list(graph)
+            for _ in range(4):
+                key, subkey = jrand.split(key)
+                order = jrand.permutation(subkey, jnp.arange(1, graph.shape[-1]+1))
+                self.assertSameResult(jax.jit(cross_country)(order, graph), 
+                                    jax.jit(sparse_core.cross_country)(order, edge_list))
+    
+    
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import jax
+import jax.numpy as jnp
+import jax.random as jrand
+
+from alphagrad.vertexgame import (make_graph, embed, create, write, sparsify, 
+                                densify, to_columnar, GraphDataset)
+
+
+def Perceptron(x, W1, b1, W2, b2):
+    y1 = W1 @ x
+    z1 = y1 + b1
+    a1 = jnp.tanh(z1)
+    
+    y2 = W2 @ a1
+    z2 = y2 + b2
+    return 0.5*jnp.sum(jnp.tanh(z2)**2)
+
+
+class SparsifyTest(unittest.TestCase):
+    def setUp(self):
+        xs = [jnp.ones(4), jnp.ones((8, 4)), jnp.ones(8), jnp.ones((4, 8)), jnp.ones(4)]
+        graph = make_graph(Perceptron, *xs)
+        self.graph = np.asarray(embed(jrand.PRNGKey(42), graph, [10, 30, 10]))
+        
+    def test_interleaved(self):
+        header, sparse_edges = sparsify(self.graph)
+        
+        # Reference implementation with one edge at a time
+        entries = []
+        for i, j in zip(*np.nonzero(self.graph[0, 1:, :])):
+            entries.extend([i, j, *self.graph[:, i+1, j]])
+        self.assertTrue(np.array_equal(sparse_edges, entries))
+        self.assertTrue(np.array_equal(header, self.graph[:, 0, :]))
+        
+        dense_edges = densify(header, sparse_edges, shape=[10, 30, 10])
+        self.assertTrue(np.array_equal(dense_edges, self.graph))
+        
+    def test_columnar(self):
+        header, sparse_edges = sparsify(self.graph, columnar=True)
+        _, interleaved_edges = sparsify(self.graph)
+        self.assertTrue(np.array_equal(sparse_edges, to_columnar(interleaved_edges)))
+        
+        dense_edges = densify(header, sparse_edges, shape=[10, 30, 10], columnar=True)
+        self.assertTrue(np.array_equal(dense_edges, self.graph))
+        
+    def test_dataset(self):
+        header, sparse_edges = sparsify(self.graph)
+        samples = [("code", header, sparse_edges)]*2
+        with tempfile.TemporaryDirectory() as path:
+            create(os.path.join(path, "interleaved.hdf5"), 2, [10, 30, 10])
+            write(os.path.join(path, "interleaved.hdf5"), samples)
+            create(os.path.join(path, "columnar.hdf5"), 2, [10, 30, 10], columnar=True)
+            write(os.path.join(path, "columnar.hdf5"), samples)
+            
+            dataset = GraphDataset(path, shape=[10, 30, 10])
+            self.assertEqual(sorted(dataset.file_layouts), [False, True])
+            for idx in range(len(dataset)):
+                self.assertTrue(np.array_equal(dataset[idx], self.graph))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+from functools import partial
+
+import numpy as np
+
+import jax
+import jax.lax as lax
+import jax.numpy as jnp
+
+from alphagrad.vertexgame.core import (sparsity_fmas_map, MUL_SPARSITY_MAP, 
+                                        CONTRACTION_MAP, OFFSET)
+
+
+@partial(jax.vmap, in_axes=(1, None))
+def cond_sparsity_fmas_map(in_edge, out_edge):
+    # Reference implementation with a per-edge cond
+    i = in_edge[0].astype(jnp.int32) + OFFSET
+    j = out_edge[0].astype(jnp.int32) + OFFSET
+
+    new_sparsity_type = MUL_SPARSITY_MAP[i, j]
+    contraction_map = CONTRACTION_MAP[:, i, j]
+
+    factors = jnp.concatenate((out_edge[1:3], jnp.abs(out_edge[3:]), in_edge[3:]))
+    masked_factors = lax.cond(jnp.sum(contraction_map) > 0,
+                                lambda a: jnp.where(contraction_map > 0, a, 1),
+                                lambda a: jnp.zeros_like(a, dtype=jnp.int32),
+                                factors)
+    masked_factors = jnp.where(masked_factors >= 0, masked_factors, 1)
+    
+    fmas = jnp.prod(masked_factors)
+    fmas = lax.select(jnp.logical_and(jnp.abs(i) == 10+OFFSET, jnp.abs(j) == 10+OFFSET), 1, fmas)
+    return new_sparsity_type, fmas
+
+
+class SparsityFmasTest(unittest.TestCase):
+    def test_sparsity_fmas_map(self):
+        # Check all combinations of sparsity types, negative shapes are 
+        # replicating dimensions
+        rng = np.random.default_rng(42)
+        sparsity_types = np.arange(-10, 12)
+        for out_type in sparsity_types:
+            in_edges = rng.choice([-5, -3, 2, 3, 5, 7], size=(5, len(sparsity_types)))
+            in_edges[0] = sparsity_types
+            out_edge = rng.choice([-5, 2, 3, 5, 7, 11], size=5)
+            out_edge[0] = out_type
+            in_edges, out_edge = jnp.array(in_edges), jnp.array(out_edge)
+            
+            new_sparsity, fmas = sparsity_fmas_map(in_edges, out_edge)
+            ref_sparsity, ref_fmas = cond_sparsity_fmas_map(in_edges, out_edge)
+            self.assertTrue(jnp.all(new_sparsity == ref_sparsity))
+            self.assertTrue(jnp.all(fmas == ref_fmas))
+    
+    
+if __name__ == '__main__':
+    unittest.main()
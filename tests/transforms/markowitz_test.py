@@ -0,0 +1,77 @@
+import unittest
+
+import jax
+import jax.lax as lax
+import jax.numpy as jnp
+
+from alphagrad.vertexgame import make_graph, vertex_eliminate
+from alphagrad.vertexgame.transforms.markowitz import (minimal_markowitz, 
+                                                        get_minimal_markowitz,
+                                                        markowitz_degrees,
+                                                        calc_markowitz_degree)
+
+
+def Perceptron(x, W1, b1, W2, b2):
+    h = jnp.tanh(W1 @ x + b1)
+    o = W2 @ h + b2
+    return jnp.sum(o**2), jnp.log(h.sum())
+
+
+def Scalar(a, b, c, d):
+    x = a*b + jnp.sin(c)
+    y = x / d - jnp.cos(a*c)
+    z = jnp.exp(y) * x
+    w = jnp.log(z*z + 1.) + y
+    return z, w, x*w
+
+
+def Deep(x, W):
+    for _ in range(6):
+        x = jnp.tanh(W @ x) + jnp.sin(x)*x
+    return x.sum()
+
+
+GRAPHS = [make_graph(Perceptron, jnp.ones(4), jnp.ones((8, 4)), jnp.ones(8), 
+                    jnp.ones((3, 8)), jnp.ones(3)),
+        make_graph(Scalar, 1., 2., 3., 4.),
+        make_graph(Deep, jnp.ones(4), jnp.ones((4, 4)))]
+
+
+@jax.jit
+def rescanning_minimal_markowitz(edges):
+    # Recomputes the Markowitz degrees of all vertices after every elimination
+    def loop_fn(_edges, _):
+        _, vertex = get_minimal_markowitz(_edges)
+        _edges, _ = vertex_eliminate(vertex, _edges)
+        return _edges, vertex
+    
+    vertices = jnp.arange(1, edges.shape[-1]+1)
+    _, order = lax.scan(loop_fn, edges, vertices)
+    return order
+
+
+class MarkowitzTest(unittest.TestCase):
+    def test_incremental_minimal_markowitz(self):
+        for graph in GRAPHS:
+            num_v = int(graph.at[0, 0, 1].get())
+            order = [int(v) for v in minimal_markowitz(graph, num_v)]
+            ref_order = [int(v) for v in rescanning_minimal_markowitz(graph)][:num_v]
+            self.assertEqual(order, ref_order)
+    
+    def test_markowitz_degrees(self):
+        # Compare against the per-vertex implementation, also for partially
+        # eliminated graphs
+        for graph in GRAPHS:
+            num_v = graph.shape[-1]
+            edges = graph
+            for vertex in range(1, num_v+1, 2):
+                degrees = markowitz_degrees(edges)
+                ref_degrees = [-1 if edges[1, 0, v-1] == 1 
+                                else int(calc_markowitz_degree(v, edges)) 
+                                for v in range(1, num_v+1)]
+                self.assertEqual([int(d) for d in degrees], ref_degrees)
+                edges, _ = vertex_eliminate(vertex, edges)
+    
+    
+if __name__ == '__main__':
+    unittest.main()
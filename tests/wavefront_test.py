@@ -0,0 +1,59 @@
+import unittest
+
+import jax
+import jax.numpy as jnp
+import jax.random as jrand
+
+from alphagrad.vertexgame import (make_graph, cross_country, make_wavefronts, 
+                                wavefront_cross_country)
+
+
+def Perceptron(x, W1, b1, W2, b2):
+    h = jnp.tanh(W1 @ x + b1)
+    o = W2 @ h + b2
+    return jnp.sum(o**2), jnp.log(h.sum())
+
+
+def Deep(x, W):
+    for _ in range(6):
+        x = jnp.tanh(W @ x) + jnp.sin(x)*x
+    return x.sum()
+
+
+class WavefrontTest(unittest.TestCase):
+    def test_wavefront_cross_country(self):
+        graphs = [make_graph(Perceptron, jnp.ones(4), jnp.ones((8, 4)), jnp.ones(8), 
+                            jnp.ones((3, 8)), jnp.ones(3)),
+                make_graph(Deep, jnp.ones(4), jnp.ones((4, 4)))]
+        for graph in graphs:
+            num_v = graph.shape[-1]
+            keys = jrand.split(jrand.PRNGKey(42), 4)
+            orders = [jnp.arange(1, num_v+1), jnp.arange(num_v, 0, -1)]
+            orders += [jrand.permutation(key, jnp.arange(1, num_v+1)) for key in keys]
+            for order in orders:
+                wavefronts = make_wavefronts(order, graph)
+                self.assertLessEqual(wavefronts.shape[0], num_v)
+                # Already eliminated vertices are skipped
+                vertices = [v for v in range(1, num_v+1) if graph[1, 0, v-1] == 0]
+                self.assertEqual(sorted(wavefronts[wavefronts > 0].tolist()), vertices)
+                
+                cc_graph, cc_fmas = jax.jit(cross_country)(order, graph)
+                wf_graph, wf_fmas = jax.jit(wavefront_cross_country)(wavefronts, graph)
+                self.assertEqual(int(cc_fmas), int(wf_fmas))
+                self.assertTrue(jnp.all(cc_graph == wf_graph))
+                
+    def test_max_width(self):
+        graph = make_graph(Perceptron, jnp.ones(4), jnp.ones((8, 4)), jnp.ones(8), 
+                            jnp.ones((3, 8)), jnp.ones(3))
+        num_v = graph.shape[-1]
+        order = jrand.permutation(jrand.PRNGKey(0), jnp.arange(1, num_v+1))
+        wavefronts = make_wavefronts(order, graph, max_width=2)
+        self.assertEqual(wavefronts.shape[1], 2)
+        
+        _, cc_fmas = jax.jit(cross_country)(order, graph)
+        _, wf_fmas = jax.jit(wavefront_cross_country)(wavefronts, graph)
+        self.assertEqual(int(cc_fmas), int(wf_fmas))
+    
+    
+if __name__ == '__main__':
+    unittest.main()